@@ -1,34 +1,236 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Optional
+import json
 import logging
 
+from pydantic import ValidationError
+
+from app.core.admission import Overloaded, RateLimited, admission, admission_control, admitted_topic
+from app.core.chat_sockets import ChatConnection, SlowConsumer, chat_sockets
+from app.core.config import settings
 from app.models.ai_models import (
-    HealthChatRequest, HealthChatResponse
+    HealthChatRequest, HealthChatResponse, HealthConversationPage, HealthTopic,
+    HealthChatBatchRequest, HealthChatBatchResponse, HealthChatBatchItem
 )
 from app.services.ai_services import HealthChatService
+from app.services.context_builder import context_builder
+from app.services.conversation_store import ConversationStore, conversation_store
+from app.services.response_cache import response_cache
+from app.services.service_registry import service_registry
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Create router
+# Create routers; the chat endpoints pass admission control (rate limit, concurrency, load shedding),
+# the stats endpoints stay reachable when the chat endpoints are saturated
 router = APIRouter()
+chat_router = APIRouter(dependencies=[Depends(admission_control)])
 
 # Service dependencies
-def get_health_chat_service():
-    """Dependency for Health Chat service."""
-    return HealthChatService(model_name="health-gpt-3.5-turbo")
+async def get_health_chat_service() -> HealthChatService:
+    """Dependency for Health Chat service; returns the shared instance from the registry."""
+    # Requests that arrive during a cold start wait for warm-up instead of racing it
+    await service_registry.wait_ready()
+    return await service_registry.get()
+
+def get_conversation_store() -> ConversationStore:
+    """Dependency for the shared conversation store."""
+    if not settings.CONVERSATION_STORE_ENABLED:
+        raise HTTPException(status_code=404, detail="Conversation history is disabled")
+    return conversation_store
 
 # Health Chatbot endpoint
-@router.post("/health-chat", response_model=HealthChatResponse)
+@chat_router.post("/health-chat", response_model=HealthChatResponse)
 async def health_chat(
     request: HealthChatRequest,
-    health_chat_service: HealthChatService = Depends(get_health_chat_service)
+    health_chat_service: HealthChatService = Depends(get_health_chat_service),
+    topic: Optional[HealthTopic] = Depends(admitted_topic)
 ):
     """Health chatbot endpoint for health-related conversations."""
     try:
-        return await health_chat_service.generate_response(request)
+        return await health_chat_service.generate_response(request, topic)
     except Exception as e:
-        logger.error(f"Error in health chat endpoint: {str(e)}")
+        logger.error("Error in health chat endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch variant of the health chatbot endpoint
+@chat_router.post("/health-chat/batch", response_model=HealthChatBatchResponse)
+async def health_chat_batch(
+    batch: HealthChatBatchRequest,
+    health_chat_service: HealthChatService = Depends(get_health_chat_service)
+):
+    """Answer a list of health chat requests; errors are reported per item."""
+    if len(batch.requests) > settings.HEALTH_CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {settings.HEALTH_CHAT_BATCH_MAX_ITEMS} requests are allowed"
+        )
+    max_concurrency = min(
+        batch.max_concurrency or settings.HEALTH_CHAT_BATCH_CONCURRENCY,
+        settings.HEALTH_CHAT_BATCH_CONCURRENCY
+    )
+    results = await health_chat_service.generate_batch(batch.requests, max_concurrency)
+    return HealthChatBatchResponse(results=[
+        HealthChatBatchItem(index=i, error=str(result))
+        if isinstance(result, Exception)
+        else HealthChatBatchItem(index=i, response=result)
+        for i, result in enumerate(results)
+    ])
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+# Streaming variant of the health chatbot endpoint
+@chat_router.post("/health-chat/stream")
+async def health_chat_stream(
+    request: HealthChatRequest,
+    health_chat_service: HealthChatService = Depends(get_health_chat_service),
+    topic: Optional[HealthTopic] = Depends(admitted_topic)
+):
+    """Health chatbot endpoint that streams the answer as Server-Sent Events.
+
+    The body is produced lazily: each event is generated only after the
+    previous one was handed to the server, which waits while the client's
+    socket buffer is full. When the client disconnects the server cancels the
+    body iterator and `aclosing` stops the service's generator immediately.
+    """
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async with aclosing(health_chat_service.stream_response(request, topic)) as events:
+                async for event, data in events:
+                    yield _sse_event(event, data)
+        except Exception as e:
+            logger.error("Error in health chat stream: %s", e)
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _answer_over_socket(
+    connection: ChatConnection,
+    service: HealthChatService,
+    request: HealthChatRequest,
+    stream: bool,
+    topic: Optional[HealthTopic] = None,
+) -> str:
+    """Send the answer to one message and return the conversation id it was recorded under."""
+    if not stream:
+        response = await service.generate_response(request, topic)
+        await connection.send({"type": "response", **response.model_dump(mode="json")})
+        return response.conversation_id
+    conversation_id = request.conversation_id
+    async with aclosing(service.stream_response(request, topic)) as events:
+        async for event, data in events:
+            if event == "metadata":
+                conversation_id = data["conversation_id"]
+            await connection.send({"type": event, **data})
+    return conversation_id
+
+# WebSocket variant of the health chatbot endpoint
+@chat_router.websocket("/health-chat/ws")
+async def health_chat_socket(
+    websocket: WebSocket,
+    conversation_id: Optional[str] = None,
+    stream: bool = False
+):
+    """Health chat over one WebSocket per conversation.
+
+    Client frames are JSON: {"message": ..., "user_info": ..., "stream": bool}
+    ("stream" overrides the query parameter for one message), plus
+    {"type": "pong"} in answer to the server's {"type": "ping"}. The
+    conversation id from the query string, or the one assigned to the first
+    answer, is bound to the connection and used for every message. Answers are
+    {"type": "response", ...} (the HealthChatResponse fields) or, streamed,
+    "metadata", "chunk" and "done" frames with the same data as the SSE
+    endpoint; failures are {"type": "error", "status", "detail"} and leave the
+    connection open. Each message passes admission control on its own.
+    """
+    connection = await chat_sockets.accept(websocket)
+    if connection is None:
+        return
+    client = admission.client_key(websocket)
+    try:
+        await service_registry.wait_ready()
+        service = await service_registry.get()
+        await connection.send({"type": "ready", "conversation_id": conversation_id})
+        while True:
+            try:
+                payload = await connection.receive()
+                request = HealthChatRequest(
+                    message=payload.get("message") if isinstance(payload, dict) else None,
+                    conversation_id=conversation_id,
+                    user_info=payload.get("user_info") if isinstance(payload, dict) else None,
+                )
+            except ValidationError as e:
+                errors = [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()]
+                await connection.send({"type": "error", "status": 422, "detail": errors})
+                continue
+            except ValueError as e:  # Not JSON, or too large
+                await connection.send({"type": "error", "status": 400, "detail": str(e)})
+                continue
+
+            try:
+                with connection.answering():
+                    async with admission.admit(client, request.message) as topic:
+                        conversation_id = await _answer_over_socket(
+                            connection, service, request, payload.get("stream", stream) is True, topic
+                        )
+            except Overloaded as e:
+                status = 429 if isinstance(e, RateLimited) else 503
+                await connection.send({"type": "error", "status": status, "detail": str(e), "retry_after": round(e.retry_after, 3)})
+            except (WebSocketDisconnect, SlowConsumer):
+                raise
+            except Exception as e:
+                logger.error("Error in health chat socket: %s", e)
+                await connection.send({"type": "error", "status": 500, "detail": str(e)})
+    except (WebSocketDisconnect, SlowConsumer):
+        pass
+    finally:
+        chat_sockets.release(connection)
+
+@router.get("/health-chat/sockets")
+async def health_chat_socket_stats():
+    """Open, refused and reaped WebSocket chat connections of this worker."""
+    return chat_sockets.stats()
+
+@router.get("/health-chat/cache")
+async def health_chat_cache_stats():
+    """Hit, miss and eviction counters for the health chat response cache."""
+    return response_cache.stats()
+
+@router.get("/health-chat/context")
+async def health_chat_context_stats():
+    """Conversation history kept for model prompts in this worker: contexts, rebuilds and folded turns."""
+    return context_builder.stats()
+
+@router.get("/admission")
+async def admission_stats():
+    """Rate limiter and concurrency limiter counters of this worker."""
+    return admission.stats()
+
+@chat_router.get("/conversations/{conversation_id}/messages", response_model=HealthConversationPage)
+async def conversation_history(
+    conversation_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[int] = Query(None, ge=0, description="Return messages older than this seq"),
+    store: ConversationStore = Depends(get_conversation_store)
+):
+    """Paginated conversation history, newest page first."""
+    messages, next_before = await store.get_history(conversation_id, limit=limit, before=before)
+    if not messages and before is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return HealthConversationPage(
+        conversation_id=conversation_id,
+        messages=[message.to_model() for message in messages],
+        next_before=next_before
+    )
+
+router.include_router(chat_router)
+
 # Keep other endpoints (chat, analyze, recommend, detect-fraud) as they were...
\ No newline at end of file
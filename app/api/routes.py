@@ -1,5 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api import ai_routes
+from app.core.logging_config import logging_stats
+from app.core.metrics import metrics
+from app.core.startup_profiler import startup_profiler
+from app.services.service_registry import service_registry
 
 # Create router
 router = APIRouter()
@@ -12,4 +17,26 @@ async def ping_pong():
     """A simple ping endpoint."""
     return {"message": "pong!"}
 
+@router.get('/ready')
+async def readiness():
+    """Readiness probe; returns 503 until shared services have been warmed up."""
+    if not service_registry.ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"ready": False})
+    return {"ready": True}
+
+@router.get('/logging')
+async def logging_pipeline_stats():
+    """Queue depth, dropped and sampled-out counters for the logging pipeline."""
+    return logging_stats()
+
+@router.get('/startup')
+async def startup_profile():
+    """Per-phase (and with STARTUP_PROFILE=1, per-import) timings of this process's startup."""
+    return startup_profiler.report()
+
+@router.get('/metrics', response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Request, topic and queue metrics of all workers in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Add additional API routes here using the @router decorator
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from .core.startup_profiler import startup_profiler
+
+with startup_profiler.phase("import_framework"):
+    from fastapi import FastAPI
+
+# Import core components
+with startup_profiler.phase("import_core"):
+    from .core.config import settings
+    from .core.admission import admission
+    from .core.chat_sockets import chat_sockets
+    from .core.logging_config import get_logger, logging_stats, start_logging, stop_logging
+    from .core.metrics import MetricsMiddleware, metrics
+    from .core.profiling import ProfilingMiddleware, profiling_configured
+    from .core.server import private_bytes, rss_bytes
+    from .core.error_handling import register_exception_handlers
+    from .core.static_assets import PrecompressedStaticFiles
+    from .core.templating import add_template_global, first_non_empty_dir
+    from .services.conversation_store import conversation_store
+    from .services.response_cache import response_cache
+    from .services.service_registry import service_registry
+    from .services.shared_state import shared_state
+
+# Initialize main application logger
+logger = get_logger("app")
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_DIR = os.path.dirname(_APP_DIR)
+
+
+def _open_metrics(app: FastAPI) -> None:
+    # Queue depths are sampled periodically rather than on every request
+    metrics.add_gauge("app_log_queue_depth", "Log records waiting for the writer thread.", lambda: logging_stats()["queued"])
+    metrics.add_gauge("app_log_records_dropped", "Log records dropped because the queue was full.", lambda: logging_stats()["dropped"])
+    metrics.add_gauge("conversation_store_pending_writes", "Messages waiting to be written to the database.", lambda: conversation_store.stats()["pending_writes"])
+    metrics.add_gauge("admission_waiting", "Requests waiting for an /api/ai slot.", lambda: admission.limiter.waiting)
+    metrics.add_gauge("admission_shed", "Requests shed with 503 since startup.", lambda: admission.limiter.shed)
+    metrics.add_gauge("admission_rate_limited", "Requests rejected with 429 since startup.", lambda: admission.rate_limited)
+    metrics.add_gauge("chat_sockets_open", "Open health chat WebSocket connections.", lambda: len(chat_sockets))
+    metrics.add_gauge("response_cache_entries", "Entries in the health chat response cache.", lambda: response_cache.stats()["size"])
+    metrics.add_gauge("process_resident_memory_bytes", "Resident memory of each worker process.", rss_bytes, per_process=True)
+    metrics.add_gauge("process_private_memory_bytes", "Resident memory of each worker not shared with other processes.", private_bytes, per_process=True)
+    metrics.open(app.routes)
+
+
+# --- Startup and Shutdown ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_logging()
+    logger.info("Starting %s v%s (%s)", settings.APP_NAME, settings.APP_VERSION, settings.APP_ENV)
+    if settings.METRICS_ENABLED:
+        _open_metrics(app)
+    # Warm shared services in the background so the server accepts requests right away;
+    # /api/ready reports when warm-up is done and health chat requests wait for it
+    warm_up = service_registry.start_in_background(settings.HEALTH_CHAT_MODELS)
+    warm_up.add_done_callback(lambda task: task.cancelled() or logger.info("%s", startup_profiler.format_report()))
+    startup_profiler.mark("serving")
+    try:
+        yield
+    finally:
+        logger.info("Shutting down %s", settings.APP_NAME)
+        await chat_sockets.shutdown()
+        await service_registry.shutdown()
+        if shared_state is not None:
+            shared_state.close()  # Finishes background cache writes
+        metrics.close()
+        # Write out queued records before the process exits
+        stop_logging()
+
+
+with startup_profiler.phase("create_app"):
+    app = FastAPI(
+        title=settings.APP_NAME, # Use setting for title
+        description="Enterprise-ready FastAPI application base.",
+        version="1.0.0",
+        debug=settings.DEBUG, # Use setting for debug mode
+        lifespan=lifespan,
+    )
+
+    # Mount static files directory
+    # Prefer app/static, then the project root static directory. Assets built by
+    # setup_deployment.py are served precompressed with immutable cache headers.
+    static_dir = first_non_empty_dir(os.path.join(_APP_DIR, 'static'), os.path.join(_PROJECT_DIR, 'static'))
+    static_files: Optional[PrecompressedStaticFiles] = None
+    if static_dir:
+        static_files = PrecompressedStaticFiles(directory=static_dir)
+        app.mount("/static", static_files, name="static")
+        # Templates link fingerprinted names: url_for('static', path=asset_path('style.css'))
+        add_template_global("asset_path", static_files.asset_path)
+        logger.info("Using static directory at %s", static_dir)
+    else:
+        logger.warning("No static files found in %s or %s", os.path.join(_APP_DIR, 'static'), os.path.join(_PROJECT_DIR, 'static'))
+
+
+# Import and include routers after app creation
+with startup_profiler.phase("include_routers"):
+    from .api import routes as api_routes
+    from .frontend import routes as frontend_routes
+
+    from .core.generated_features import generated_features
+
+    # Routes registered eagerly in app/generated/__init__.py, if any
+    try:
+        from .generated import router as generated_router
+        has_generated_routes = bool(generated_router.routes)
+    except ImportError:
+        logger.warning("Could not import app.generated")
+        has_generated_routes = False
+
+    # Include routers
+    app.include_router(api_routes.router, prefix="/api", tags=["api"])
+    app.include_router(frontend_routes.router, tags=["frontend"])
+    if has_generated_routes:
+        app.include_router(generated_router, prefix="/generated", tags=["generated"])
+    # Feature modules are only imported when one of their routes is requested
+    app.mount("/generated", generated_features, name="generated")
+    logger.info("Found %d generated feature modules in %s", len(generated_features.scan()), generated_features.directory)
+
+    # Register custom exception handlers
+    register_exception_handlers(app)
+
+    if profiling_configured():
+        app.add_middleware(ProfilingMiddleware)
+        logger.info("Request profiling enabled, writing to %s", settings.PROFILING_DIR)
+
+    # Outermost, so latency covers the whole stack including error handling
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+# Add root endpoint (optional)
+@app.get("/")
+async def read_root():
+    logger.info("Root endpoint accessed.")
+    return {"message": "Welcome to the FastAPI application!"}
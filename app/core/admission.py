@@ -0,0 +1,265 @@
+"""
+Admission control for the /api/ai endpoints.
+
+Three layers, applied in order by the `admission_control` dependency:
+  * Rate limiting: every client has a token bucket (ADMISSION_RATE per second,
+    up to ADMISSION_BURST) in a bounded LRU table. An empty bucket is
+    answered with 429 and a Retry-After of when the next token arrives.
+  * Concurrency: at most ADMISSION_MAX_CONCURRENCY requests run at once; the
+    rest wait in a queue.
+  * Load shedding: a routine request that finds ADMISSION_MAX_QUEUE requests
+    already waiting, or waits longer than ADMISSION_MAX_WAIT, is answered
+    with 503 and a Retry-After estimated from the recent service time.
+
+Messages the topic classifier files under first aid go to a priority lane:
+they are admitted ahead of every routine waiter and are never shed for wait
+time. The lane holds at most ADMISSION_MAX_PRIORITY_QUEUE waiters, so a flood
+of first-aid messages is shed like routine traffic instead of starving it.
+They are still rate limited. The topic is left on request.state for the
+endpoint (see admitted_topic), so the message is classified once.
+
+WebSocket chats are admitted per message rather than per connection
+(AdmissionController.admit), with the same buckets and slots.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+from app.models.ai_models import HealthTopic
+from app.services.topic_classifier import get_topic_classifier
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketTable:
+    """Per-client token buckets in an LRU table of at most max_clients entries.
+
+    An evicted client starts again with a full bucket, so the table size
+    bounds memory, not fairness.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Take one token for key; returns 0 if allowed, else seconds until a token is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        tokens, updated_at = self._buckets.pop(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated_at) * self.rate)
+        wait = 0.0
+        if tokens >= 1.0:
+            tokens -= 1.0
+        else:
+            wait = (1.0 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; carries the suggested Retry-After in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class RateLimited(Overloaded):
+    """Raised by AdmissionController.admit when the client's bucket is empty."""
+
+
+class ConcurrencyLimiter:
+    """At most max_concurrency holders, with a bounded routine queue and a bounded priority lane."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait: float, max_priority_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_priority_queue = max_priority_queue
+        self.active = 0
+        self._priority: Deque[asyncio.Future] = deque()
+        self._routine: Deque[asyncio.Future] = deque()
+        self._service_time = 0.1  # Moving average of seconds a slot is held, for Retry-After
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._priority) + len(self._routine)
+
+    def _retry_after(self) -> float:
+        # Time for the requests ahead to drain through the available slots
+        return (self.waiting + 1) * self._service_time / self.max_concurrency
+
+    def _release(self) -> None:
+        for lane in (self._priority, self._routine):
+            while lane:
+                waiter = lane.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)  # The slot passes straight to the waiter
+                    return
+        self.active -= 1
+
+    async def _wait(self, priority: bool) -> None:
+        lane = self._priority if priority else self._routine
+        waiter = asyncio.get_running_loop().create_future()
+        lane.append(waiter)
+        try:
+            if priority:
+                await waiter
+            else:
+                await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # Handed a slot just as we gave up; pass it on
+            elif waiter in lane:
+                lane.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed += 1
+                raise Overloaded("queue wait exceeded", self._retry_after()) from None
+            raise
+
+    @asynccontextmanager
+    async def slot(self, priority: bool = False) -> AsyncIterator[None]:
+        """Hold one of the slots for the duration of the block."""
+        if self.active < self.max_concurrency and not self.waiting:
+            self.active += 1
+        else:
+            lane, limit = (self._priority, self.max_priority_queue) if priority else (self._routine, self.max_queue)
+            if len(lane) >= limit:
+                self.shed += 1
+                raise Overloaded("priority queue full" if priority else "queue full", self._retry_after())
+            await self._wait(priority)
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - start)
+            self._release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "waiting_priority": len(self._priority),
+            "waiting_routine": len(self._routine),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "service_time_ms": round(self._service_time * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """Rate limiter and concurrency limiter shared by all /api/ai requests of a process."""
+
+    def __init__(self):
+        self.buckets = TokenBucketTable(settings.ADMISSION_RATE, settings.ADMISSION_BURST, settings.ADMISSION_MAX_CLIENTS)
+        self.limiter = ConcurrencyLimiter(
+            settings.ADMISSION_MAX_CONCURRENCY,
+            settings.ADMISSION_MAX_QUEUE,
+            settings.ADMISSION_MAX_WAIT,
+            settings.ADMISSION_MAX_PRIORITY_QUEUE,
+        )
+        self.client_ip_header = settings.ADMISSION_CLIENT_IP_HEADER.lower()
+        self.rate_limited = 0
+
+    def client_key(self, connection: HTTPConnection) -> str:
+        # Behind Fly's proxy every connection comes from the proxy; the real client is in a header
+        if self.client_ip_header:
+            forwarded = connection.headers.get(self.client_ip_header)
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        return connection.client.host if connection.client else "unknown"
+
+    @staticmethod
+    def classify(message: str) -> HealthTopic:
+        return get_topic_classifier().classify(message).topic
+
+    @staticmethod
+    async def message_topic(request: Request) -> Optional[HealthTopic]:
+        """Topic of a chat request's message, or None for requests without one."""
+        if request.method != "POST" or "json" not in request.headers.get("content-type", ""):
+            return None
+        try:
+            body = await request.json()  # Parsed once by FastAPI and cached on the request
+        except ValueError:
+            return None
+        message = body.get("message") if isinstance(body, dict) else None
+        if not isinstance(message, str):
+            return None
+        return AdmissionController.classify(message)
+
+    @asynccontextmanager
+    async def admit(self, client: str, message: str) -> AsyncIterator[Optional[HealthTopic]]:
+        """Rate limit one chat message and hold a slot while it is answered; raises Overloaded.
+
+        Yields the message's topic for the service to reuse (None when admission control is off).
+        """
+        if not settings.ADMISSION_ENABLED:
+            yield None
+            return
+        wait = self.buckets.take(client)
+        if wait:
+            self.rate_limited += 1
+            raise RateLimited("too many requests", wait)
+        topic = self.classify(message)
+        async with self.limiter.slot(topic is HealthTopic.FIRST_AID):
+            yield topic
+
+    def stats(self) -> Dict[str, float]:
+        return {"clients": len(self.buckets), "rate_limited": self.rate_limited, **self.limiter.stats()}
+
+
+admission = AdmissionController()
+
+
+def _retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+async def admission_control(request: HTTPConnection) -> AsyncIterator[None]:
+    """Router dependency: rate limit, then hold a concurrency slot until the response is sent.
+
+    WebSocket routes pass through; they admit each message with admission.admit().
+    """
+    if not settings.ADMISSION_ENABLED or not isinstance(request, Request):
+        yield
+        return
+
+    wait = admission.buckets.take(admission.client_key(request))
+    if wait:
+        admission.rate_limited += 1
+        raise HTTPException(status_code=429, detail="Too many requests", headers=_retry_after_header(wait))
+
+    topic = await admission.message_topic(request)
+    request.state.topic = topic
+    try:
+        async with admission.limiter.slot(topic is HealthTopic.FIRST_AID):
+            yield
+    except Overloaded as e:
+        logger.warning("Shedding %s %s: %s", request.method, request.url.path, e)
+        raise HTTPException(status_code=503, detail="Server busy", headers=_retry_after_header(e.retry_after))
+
+
+def admitted_topic(request: Request) -> Optional[HealthTopic]:
+    """Endpoint dependency: the topic admission_control classified the message as, if it ran."""
+    return getattr(request.state, "topic", None)
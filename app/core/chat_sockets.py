@@ -0,0 +1,224 @@
+"""
+Bookkeeping for the health chat WebSocket connections of a worker.
+
+Each open socket costs one ChatConnection (slotted, a few timestamps) and
+the endpoint's own task; heartbeats and reaping for all of them are done by
+a single hub task that runs while any connection is open. Every
+WS_HEARTBEAT_INTERVAL / 2 it:
+  * closes connections without a chat message for WS_IDLE_TIMEOUT (1000),
+  * closes connections that sent nothing at all, not even a pong, for two
+    heartbeat intervals (1001; the client is gone),
+  * sends {"type": "ping"} to connections that were sent nothing for a
+    heartbeat interval, which also keeps proxies from dropping them.
+Connections busy answering a message are skipped.
+
+All frames for a socket, pings and pongs included, go through its
+ChatConnection.send, one at a time. The server stops accepting writes for a
+socket once its write buffer is full (the client is not reading), so a send
+that stays blocked for WS_SEND_TIMEOUT closes the connection instead of
+holding a slot and the buffered reply forever, and so does queueing more
+than WS_SEND_BUFFER_BYTES of encoded frames behind it.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from .config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class SlowConsumer(Exception):
+    """Raised by ChatConnection.send when the client stopped reading; the connection is closed."""
+
+
+class ChatConnection:
+    """One accepted chat socket and its activity timestamps."""
+
+    __slots__ = (
+        "websocket", "send_timeout", "send_buffer", "pending_bytes", "_send_lock",
+        "last_received", "last_message", "last_sent", "busy", "closed",
+    )
+
+    def __init__(self, websocket: WebSocket, send_timeout: float, send_buffer: int = 256 * 1024):
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self.send_buffer = send_buffer
+        self.pending_bytes = 0  # Encoded frames being sent or waiting for their turn
+        self._send_lock = asyncio.Lock()
+        now = time.monotonic()
+        self.last_received = now  # Any frame, including pongs
+        self.last_message = now  # Chat messages only
+        self.last_sent = now
+        self.busy = False
+        self.closed = False
+
+    async def send(self, data: Dict[str, Any]) -> None:
+        """Send one JSON frame after the ones already queued; raises SlowConsumer if the client is not reading."""
+        text = json.dumps(data, separators=(",", ":"))
+        size = len(text.encode("utf-8"))
+        # A single frame larger than the buffer still goes out when nothing is queued
+        if self.pending_bytes and self.pending_bytes + size > self.send_buffer:
+            await self.close(1008, "Client is not reading")
+            raise SlowConsumer()
+        self.pending_bytes += size
+        try:
+            async with self._send_lock:
+                if self.closed:
+                    raise SlowConsumer()  # Closed while this frame waited for its turn
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(text), self.send_timeout)
+                except asyncio.TimeoutError:
+                    await self.close(1008, "Client is not reading")
+                    raise SlowConsumer() from None
+        finally:
+            self.pending_bytes -= size
+        self.last_sent = time.monotonic()
+
+    async def receive(self) -> Any:
+        """The next chat message as decoded JSON; answers pings and swallows pongs.
+
+        Raises WebSocketDisconnect when the client is gone and ValueError for a
+        frame that is not JSON text or is too large.
+        """
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            self.last_received = time.monotonic()
+            text = message.get("text")
+            if text is None:
+                raise ValueError("Messages must be JSON text frames")
+            # A character is at most 4 bytes in UTF-8; only encode texts that may be over the limit
+            limit = settings.WS_MAX_MESSAGE_BYTES
+            if len(text) > limit or (len(text) * 4 > limit and len(text.encode("utf-8")) > limit):
+                raise ValueError(f"Messages are limited to {settings.WS_MAX_MESSAGE_BYTES} bytes")
+            payload = json.loads(text)
+            kind = payload.get("type") if isinstance(payload, dict) else None
+            if kind == "pong":
+                continue
+            if kind == "ping":
+                await self.send({"type": "pong"})
+                continue
+            self.last_message = self.last_received
+            return payload
+
+    @contextmanager
+    def answering(self) -> Iterator[None]:
+        """Mark the connection busy while a message is answered; the hub leaves it alone."""
+        self.busy = True
+        try:
+            yield
+        finally:
+            self.busy = False
+            # Frames sent meanwhile are still unread; do not count the answer time as silence
+            self.last_received = time.monotonic()
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.websocket.close(code, reason)
+        except Exception:
+            pass  # Already gone
+
+
+class ChatSocketHub:
+    """Tracks the open chat connections of this worker and runs their heartbeats."""
+
+    def __init__(
+        self,
+        max_connections: int,
+        heartbeat_interval: float,
+        idle_timeout: float,
+        send_timeout: float,
+        send_buffer: int = 256 * 1024,
+    ):
+        self.max_connections = max_connections
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.send_buffer = send_buffer
+        self._connections: Set[ChatConnection] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.accepted = 0
+        self.refused = 0
+        self.reaped_idle = 0
+        self.reaped_dead = 0
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    async def accept(self, websocket: WebSocket) -> Optional[ChatConnection]:
+        """Accept the socket, or refuse it (returns None) if the worker is at its limit."""
+        if len(self._connections) >= self.max_connections:
+            self.refused += 1
+            # Accepted first so the client sees the close code (1013: try again later) rather than a 403
+            await websocket.accept()
+            await websocket.close(1013, "Too many connections")
+            return None
+        await websocket.accept()
+        connection = ChatConnection(websocket, self.send_timeout, self.send_buffer)
+        self._connections.add(connection)
+        self.accepted += 1
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        return connection
+
+    def release(self, connection: ChatConnection) -> None:
+        connection.closed = True
+        self._connections.discard(connection)
+
+    async def _heartbeat(self) -> None:
+        while self._connections:
+            await asyncio.sleep(self.heartbeat_interval / 2)
+            now = time.monotonic()
+            actions = []
+            for connection in self._connections:
+                if connection.busy or connection.closed:
+                    continue
+                if now - connection.last_message >= self.idle_timeout:
+                    self.reaped_idle += 1
+                    actions.append(connection.close(1000, "Idle timeout"))
+                elif now - connection.last_received >= 2 * self.heartbeat_interval:
+                    self.reaped_dead += 1
+                    actions.append(connection.close(1001, "Heartbeat timeout"))
+                elif now - connection.last_sent >= self.heartbeat_interval:
+                    actions.append(connection.send({"type": "ping"}))
+            if actions:
+                # Concurrently, so one slow client cannot delay the others (each send has its own timeout)
+                await asyncio.gather(*actions, return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        """Close every connection (1001, going away) and stop the heartbeat."""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await asyncio.gather(*(c.close(1001, "Server shutting down") for c in list(self._connections)), return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "open": len(self._connections),
+            "busy": sum(1 for c in self._connections if c.busy),
+            "accepted": self.accepted,
+            "refused": self.refused,
+            "reaped_idle": self.reaped_idle,
+            "reaped_dead": self.reaped_dead,
+        }
+
+
+chat_sockets = ChatSocketHub(
+    settings.WS_MAX_CONNECTIONS,
+    settings.WS_HEARTBEAT_INTERVAL,
+    settings.WS_IDLE_TIMEOUT,
+    settings.WS_SEND_TIMEOUT,
+    settings.WS_SEND_BUFFER_BYTES,
+)
@@ -0,0 +1,212 @@
+"""
+Composite ASGI application: the API and the frontends in one process.
+
+FRAMEWORK=composite serves the FastAPI application at / and every frontend
+in COMPOSITE_FRONTENDS under its own path prefix (by default the NiceGUI
+chat page at /chat and the ReactPy app at /reactpy). They all run on one
+event loop and share one HealthChatService registry, response cache and
+conversation store, so another UI costs its own code and objects rather
+than another machine with another copy of the service stack.
+
+A frontend is imported on its first request, and its lifespan (startup and
+shutdown handlers) runs then; a frontend nobody opens costs nothing. The
+resident memory of the process is measured around each import and startup,
+and GET /api/frontends reports it per frontend with the load time. The
+figure is approximate, since other requests keep running meanwhile. A
+frontend that fails to load answers 503 until the process restarts; the API
+and the other frontends are not affected. On shutdown the frontends are
+stopped before the API, which owns the shared services.
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .config import settings
+from .server import private_bytes, rss_bytes
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def import_app(path: str) -> ASGIApp:
+    """Import an ASGI application given as "package.module:attribute"."""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "app")
+
+
+class LifespanRunner:
+    """Runs the ASGI lifespan protocol of an application that is not the server's top-level app."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    async def _run(self) -> None:
+        scope = {"type": "lifespan", "asgi": {"version": "3.0", "spec_version": "2.0"}, "state": {}}
+        try:
+            await self.app(scope, self._to_app.get, self._from_app.put)
+        except Exception as e:
+            await self._from_app.put({"type": "lifespan.error", "message": repr(e)})
+        else:
+            await self._from_app.put({"type": "lifespan.returned"})
+
+    async def startup(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        await self._to_app.put({"type": "lifespan.startup"})
+        message = await self._from_app.get()
+        if message["type"] == "lifespan.startup.complete":
+            self._running = True
+        elif message["type"] != "lifespan.returned":  # Returning early means no lifespan support
+            raise RuntimeError(f"Lifespan startup failed: {message.get('message', '')}")
+
+    async def shutdown(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+        await self._to_app.put({"type": "lifespan.shutdown"})
+        message = await self._from_app.get()
+        if message["type"] != "lifespan.shutdown.complete":
+            logger.error("Lifespan shutdown of %r failed: %s", self.app, message.get("message", ""))
+        await self._task
+
+
+class LazyASGIApp:
+    """ASGI app that imports the real application, and starts its lifespan, on the first request."""
+
+    def __init__(self, name: str, import_path: str):
+        self.name = name
+        self.import_path = import_path
+        self._app: Optional[ASGIApp] = None
+        self._lifespan: Optional[LifespanRunner] = None
+        self._lock = asyncio.Lock()
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.memory_bytes: Optional[int] = None
+        self.requests = 0
+
+    async def load(self) -> ASGIApp:
+        if self._app is not None:
+            return self._app
+        async with self._lock:
+            if self._app is not None or self.error is not None:
+                return self._app
+            rss_before = rss_bytes()
+            started = time.perf_counter()
+            try:
+                # Imports can be slow (and run module code); keep them off the event loop
+                app = await asyncio.to_thread(import_app, self.import_path)
+                lifespan = LifespanRunner(app)
+                await lifespan.startup()
+            except Exception as e:
+                self.error = repr(e)
+                logger.exception("Could not load frontend %s from %s", self.name, self.import_path)
+                return None
+            self.load_seconds = time.perf_counter() - started
+            self.memory_bytes = max(0, rss_bytes() - rss_before)
+            self._app, self._lifespan = app, lifespan
+            logger.info(
+                "Loaded frontend %s from %s in %.2f s (+%.1f MB resident)",
+                self.name, self.import_path, self.load_seconds, self.memory_bytes / _MB,
+            )
+            return app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        app = await self.load()
+        if app is None:
+            if scope["type"] == "http":
+                await PlainTextResponse(f"Frontend '{self.name}' is unavailable", status_code=503)(scope, receive, send)
+            elif scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1011})
+            return
+        self.requests += 1
+        await app(scope, receive, send)
+
+    async def aclose(self) -> None:
+        if self._lifespan is not None:
+            await self._lifespan.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "module": self.import_path,
+            "loaded": self._app is not None,
+            "load_seconds": self.load_seconds,
+            "memory_bytes": self.memory_bytes,
+            "requests": self.requests,
+            "error": self.error,
+        }
+
+
+class CompositeApp:
+    """Sends requests under a frontend's prefix to that frontend and everything else to the API."""
+
+    def __init__(self, api: ASGIApp, frontends: Mapping[str, LazyASGIApp]):
+        self.api = api
+        # Longest prefix first, so /chat/admin could be mounted next to /chat
+        self.frontends: List[Tuple[str, LazyASGIApp]] = sorted(
+            ((prefix.rstrip("/"), frontend) for prefix, frontend in frontends.items()), key=lambda item: -len(item[0])
+        )
+        self._rss_at_start = rss_bytes()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self.api(scope, self._receive_lifespan(receive), send)
+            return
+        root_path = scope.get("root_path", "")
+        path = scope["path"]
+        route_path = path[len(root_path):] if path.startswith(root_path) else path
+        for prefix, frontend in self.frontends:
+            if route_path == prefix or route_path.startswith(prefix + "/"):
+                # Like a Starlette Mount: the frontend sees the prefix as part of its root path
+                await frontend({**scope, "root_path": root_path + prefix}, receive, send)
+                return
+        await self.api(scope, receive, send)
+
+    def _receive_lifespan(self, receive: Receive) -> Receive:
+        async def wrapped() -> Dict[str, Any]:
+            message = await receive()
+            if message["type"] == "lifespan.shutdown":
+                # Frontends first: they use the services the API's lifespan shuts down
+                for _, frontend in self.frontends:
+                    try:
+                        await frontend.aclose()
+                    except Exception as e:
+                        logger.error("Error stopping frontend %s: %s", frontend.name, e)
+            return message
+        return wrapped
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory of the process and what each frontend added to it."""
+        return {
+            "process": {
+                "resident_bytes": rss_bytes(),
+                "private_bytes": private_bytes(),
+                "resident_bytes_at_start": self._rss_at_start,
+            },
+            "frontends": {frontend.name: {"prefix": prefix, **frontend.stats()} for prefix, frontend in self.frontends},
+        }
+
+
+def create_composite_app(frontends: Optional[Mapping[str, str]] = None) -> CompositeApp:
+    """The FastAPI application with the frontends (prefix -> "module:attribute") mounted lazily."""
+    from app.application import app
+
+    frontends = settings.COMPOSITE_FRONTENDS if frontends is None else frontends
+    composite = CompositeApp(
+        app, {prefix: LazyASGIApp(prefix.strip("/"), path) for prefix, path in frontends.items()}
+    )
+    app.add_api_route(
+        "/api/frontends", composite.stats, methods=["GET"], tags=["api"],
+        summary="Frontends mounted in this process, with their load time and memory cost",
+    )
+    return composite
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, List, Optional
 import os
+import tempfile
 
 class Settings(BaseSettings):
     APP_NAME: str = "My Enterprise App"
@@ -8,6 +10,126 @@ class Settings(BaseSettings):
     DEBUG: bool = False
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./default.db")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "a_very_secret_key")
+
+    # Logging (records are queued and written by a background thread)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_JSON: bool = False  # One JSON object per line instead of LOG_FORMAT
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped and counted
+    LOG_INFO_SAMPLE_RATE: float = 1.0  # Fraction of INFO records kept
+    LOG_ANALYTICS_STATE_PATH: str = os.getenv("LOG_ANALYTICS_STATE_PATH", "logs/analytics_state.json")  # Offsets and totals of incremental runs
+
+    # Metrics: each worker maps a file here and /api/metrics sums the files of all workers
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: str = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "app-metrics"))
+    METRICS_SAMPLE_INTERVAL: float = 5.0  # Seconds between samples of queue-depth gauges
+
+    # Preforking production server (gunicorn.conf.py, see app/core/server.py)
+    SERVER_WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "2"))
+    SERVER_MAX_REQUESTS: int = 10000  # Requests before a worker is recycled; 0 disables
+    SERVER_MAX_REQUESTS_JITTER: int = 1000  # Random extra requests so workers are not recycled together
+    SERVER_MAX_RSS_MB: float = 96.0  # Workers whose private (unshared) resident memory exceeds this are recycled; 0 disables
+    SERVER_RSS_CHECK_INTERVAL: float = 10.0  # Seconds between resident size checks
+    SERVER_GRACEFUL_TIMEOUT: int = 4  # Seconds a recycled worker may finish its requests (Fly's kill_timeout is 5)
+
+    # Admission control for /api/ai (see app/core/admission.py); limits are per worker process
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_RATE: float = 2.0  # Requests per second per client; 0 disables rate limiting
+    ADMISSION_BURST: int = 10  # Requests a client may send at once after being idle
+    ADMISSION_MAX_CLIENTS: int = 10000  # Clients tracked by the rate limiter (least recently seen are dropped)
+    ADMISSION_MAX_CONCURRENCY: int = 4  # Requests handled at once
+    ADMISSION_MAX_QUEUE: int = 32  # Routine requests waiting for a slot before new ones get 503
+    ADMISSION_MAX_WAIT: float = 5.0  # Seconds a routine request may wait for a slot
+    ADMISSION_MAX_PRIORITY_QUEUE: int = 16  # First-aid requests waiting for a slot before new ones get 503
+    ADMISSION_CLIENT_IP_HEADER: str = os.getenv("ADMISSION_CLIENT_IP_HEADER", "Fly-Client-IP")  # Set by the proxy
+
+    # Health chat WebSocket (/api/ai/health-chat/ws, see app/core/chat_sockets.py); limits are per worker process
+    WS_MAX_CONNECTIONS: int = 5000  # Further connections are closed right away with code 1013 (try again later)
+    WS_HEARTBEAT_INTERVAL: float = 30.0  # Quiet clients are pinged this often; no reply for two intervals closes them
+    WS_IDLE_TIMEOUT: float = 600.0  # Connections without a chat message for this long are closed
+    WS_SEND_TIMEOUT: float = 10.0  # A send blocked this long (client not reading, write buffer full) closes the connection
+    WS_MAX_MESSAGE_BYTES: int = 64 * 1024
+    WS_SEND_BUFFER_BYTES: int = 256 * 1024  # Encoded frames queued for one connection beyond this close it (1008)
+
+    # NiceGUI health chat page (FRAMEWORK=nicegui, see app/frontend/nicegui_app.py)
+    NICEGUI_MAX_MESSAGES: int = 40  # Chat bubbles kept on a page; older ones are removed (history stays in the conversation store)
+    NICEGUI_STREAM_FLUSH_INTERVAL: float = 0.05  # Seconds between page updates while an answer streams
+    NICEGUI_RECONNECT_TIMEOUT: float = 3.0  # A tab's state is dropped this long after its browser disconnects
+
+    # Frontends served next to the API with FRAMEWORK=composite (path prefix -> "module:attribute", see app/core/composite.py)
+    COMPOSITE_FRONTENDS: Dict[str, str] = {
+        "/chat": "app.frontend.nicegui_app:app",
+        "/reactpy": "app.frontend.reactpy_app:app",
+    }
+
+    # Per-request profiling (off unless a token or a sample rate is set); see app/core/profiling.py
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")  # Requests sending X-Profile-Token: <token> are profiled
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of all requests profiled
+    PROFILING_DIR: str = os.getenv("PROFILING_DIR", "logs/profiles")
+    PROFILING_MAX_BYTES: int = 50 * 1024 * 1024  # Oldest profiles are deleted beyond this
+
+    # Templates: compiled bytecode is cached on disk (default: a per-user temp directory)
+    TEMPLATE_BYTECODE_CACHE_DIR: str = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR", "")
+    TEMPLATE_CHECK_INTERVAL: float = 1.0  # Seconds between template file change checks for cached pages
+    PAGE_CACHE_MAXSIZE: int = 64
+
+    # Generated feature modules in app/generated, served lazily under /generated/<module>/
+    GENERATED_HOT_RELOAD: bool = True  # Re-import a feature when its source file changes
+    GENERATED_CHECK_INTERVAL: float = 1.0  # Seconds between change checks of a feature's source
+
+    # Health chat topic classification (relative paths resolve against the app package)
+    TOPIC_RULES_PATH: str = os.getenv("TOPIC_RULES_PATH", "data/topic_rules.json")
+    TOPIC_FUZZY_MAX_DISTANCE: int = 2  # Typos tolerated per keyword (one per 4 letters, up to this); 0 disables fuzzy matching
+    TOPIC_FUZZY_MIN_LENGTH: int = 6  # Shorter keywords only match exactly (one typo turns "would" into "wound")
+    TOPIC_FUZZY_MAX_TOKENS: int = 200  # Words at the start of a message looked up for typos; the rest only match exactly
+
+    # Health knowledge base (build with: python -m app.services.knowledge_base build)
+    KNOWLEDGE_BASE_ENABLED: bool = True
+    KNOWLEDGE_BASE_CORPUS_PATH: str = os.getenv("KNOWLEDGE_BASE_CORPUS_PATH", "data/health_passages.jsonl")
+    KNOWLEDGE_BASE_INDEX_DIR: str = os.getenv("KNOWLEDGE_BASE_INDEX_DIR", "data/kb_index")
+    KNOWLEDGE_BASE_TOP_K: int = 3
+    KNOWLEDGE_BASE_MIN_SCORE: float = 0.05
+
+    # Health chat models created and warmed at startup; the first one is the default
+    HEALTH_CHAT_MODELS: List[str] = ["health-gpt-3.5-turbo"]
+
+    # Model backend (OpenAI-compatible /chat/completions); empty URL keeps keyword answers only
+    LLM_BACKEND_URL: str = os.getenv("LLM_BACKEND_URL", "")
+    LLM_API_KEY: Optional[str] = os.getenv("LLM_API_KEY")
+    LLM_TIMEOUT: float = 10.0  # Seconds per backend call
+    LLM_CONNECT_TIMEOUT: float = 2.0
+    LLM_MAX_CONNECTIONS: int = 20  # Size of the per-process connection pool
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures before the circuit opens
+    LLM_BREAKER_RESET_TIMEOUT: float = 30.0  # Seconds before a trial call is allowed
+
+    # Batch health chat endpoint
+    HEALTH_CHAT_BATCH_MAX_ITEMS: int = 500
+    HEALTH_CHAT_BATCH_CONCURRENCY: int = 8  # Default and upper bound for max_concurrency
+
+    # Health chat response cache (entries expire after RESPONSE_CACHE_TTL seconds)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAXSIZE: int = 2048
+    RESPONSE_CACHE_TTL: float = 600.0
+
+    # State shared by the worker processes of this machine (SQLite in WAL mode; see app/services/shared_state.py)
+    SHARED_STATE_ENABLED: bool = True
+    SHARED_STATE_PATH: str = os.getenv("SHARED_STATE_PATH", os.path.join(tempfile.gettempdir(), "app-shared-state.db"))
+    SHARED_STATE_POLL_INTERVAL: float = 0.1  # Seconds a near-cached response may lag another worker's change
+    SHARED_STATE_CONVERSATION_TTL: float = 86400.0  # Idle conversations' tails are dropped after this
+
+    # Conversation store: in-memory hot tier with a byte cap, batched writes to DATABASE_URL
+    CONVERSATION_STORE_ENABLED: bool = True
+    CONVERSATION_HOT_MAX_BYTES: int = 16 * 1024 * 1024
+    CONVERSATION_HOT_MESSAGES: int = 50  # Newest messages kept in memory per conversation
+    CONVERSATION_WRITE_BATCH_SIZE: int = 200
+    CONVERSATION_FLUSH_INTERVAL: float = 0.5  # Seconds between write-behind flushes
+
+    # Conversation history in model prompts: newest turns verbatim, older ones in a rolling summary (see app/services/context_builder.py)
+    CONTEXT_ENABLED: bool = True
+    CONTEXT_MAX_TOKENS: int = 2000  # Estimated tokens of history (summary plus verbatim turns) per prompt
+    CONTEXT_SUMMARY_MAX_TOKENS: int = 400  # The summary's oldest lines are dropped beyond this
+    CONTEXT_SUMMARY_LINE_WORDS: int = 24  # Words kept of each message folded into the summary
+    CONTEXT_MAX_CONVERSATIONS: int = 10000  # Least recently used conversations' contexts are rebuilt on next use
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+
+from .config import settings
+
+
+class Base(DeclarativeBase):
+    """Declarative base for all ORM models."""
+
+
+def _create_engine(url: str) -> Engine:
+    connect_args = {}
+    if url.startswith("sqlite"):
+        # Sessions are used from worker threads so the event loop never waits on disk
+        connect_args["check_same_thread"] = False
+    return create_engine(url, connect_args=connect_args, pool_pre_ping=True)
+
+
+engine = _create_engine(settings.DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def init_db() -> None:
+    """Create tables for all registered models if they do not exist yet."""
+    from app.models import db_models  # noqa: F401  (registers the models on Base)
+    Base.metadata.create_all(bind=engine)
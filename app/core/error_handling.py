@@ -1,3 +1,5 @@
+import logging
+
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
@@ -9,34 +11,37 @@ from .logging_config import get_logger
 logger = get_logger(__name__)
 
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    logger.error(f"HTTPException: {exc.status_code} {exc.detail} for {request.method} {request.url.path}")
+    logger.error("HTTPException: %s %s for %s %s", exc.status_code, exc.detail, request.method, request.url.path)
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None),  # e.g. Retry-After on 429/503
     )
 
 async def request_validation_exception_handler(request: Request, exc: RequestValidationError):
-    error_messages = []
-    for error in exc.errors():
-        field = ".".join(str(loc) for loc in error["loc"])
-        message = error["msg"]
-        error_messages.append(f"Field '{field}': {message}")
-    
-    logger.warning(f"RequestValidationError: {error_messages} for {request.method} {request.url.path} - Body: {await request.body()}")
+    # Building the message means reading the body, so skip it unless it will be logged
+    if logger.isEnabledFor(logging.WARNING):
+        error_messages = []
+        for error in exc.errors():
+            field = ".".join(str(loc) for loc in error["loc"])
+            message = error["msg"]
+            error_messages.append(f"Field '{field}': {message}")
+
+        logger.warning("RequestValidationError: %s for %s %s - Body: %s", error_messages, request.method, request.url.path, await request.body())
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": "Validation Error", "errors": exc.errors()},
     )
 
 async def pydantic_validation_exception_handler(request: Request, exc: ValidationError):
-    logger.warning(f"Pydantic ValidationError: {exc.errors()} for {request.method} {request.url.path}")
+    logger.warning("Pydantic ValidationError: %s for %s %s", exc.errors(), request.method, request.url.path)
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": "Pydantic Validation Error", "errors": exc.errors()},
     )
 
 async def unhandled_exception_handler(request: Request, exc: Exception):
-    logger.critical(f"Unhandled exception: {exc} for {request.method} {request.url.path}", exc_info=True)
+    logger.critical("Unhandled exception: %s for %s %s", exc, request.method, request.url.path, exc_info=True)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "An unexpected internal server error occurred."},
@@ -0,0 +1,206 @@
+"""
+Lazily imported, hot-swappable generated feature modules.
+
+Every module (or package) in app/generated that defines an APIRouter named
+`router` is a feature, served under /generated/<module name>/. Features are
+found by listing the directory, not by importing them, so startup cost does
+not grow with the number of installed features. A feature is imported the
+first time one of its routes is requested; GET /generated/ lists them.
+
+With GENERATED_HOT_RELOAD, the source of a loaded feature is stat'ed at most
+once per GENERATED_CHECK_INTERVAL. A changed file is imported into a fresh
+module object and swapped in once it has imported successfully; requests
+already running keep the previous module until they finish, and if the new
+version fails to import the previous one stays in service. New files are
+picked up when their name is first requested, deleted ones stop being
+served.
+
+The feature routers are not part of the application's OpenAPI schema; routes
+that need to be documented can still be included eagerly through the
+package's own router (app/generated/__init__.py).
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import sys
+import time
+from types import ModuleType
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+
+from .config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+GENERATED_PACKAGE = "app.generated"
+GENERATED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "generated")
+
+
+class LoadedFeature(NamedTuple):
+    module: ModuleType
+    router: APIRouter
+    signature: Tuple[int, int]  # (mtime_ns, size) of the source that was imported
+
+
+def _signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class GeneratedFeatures:
+    """ASGI app, mounted at /generated, that imports feature routers on first use."""
+
+    def __init__(self, directory: str, package: str = GENERATED_PACKAGE, check_interval: float = 1.0, hot_reload: bool = True):
+        self.directory = directory
+        self.package = package
+        self.check_interval = check_interval
+        self.hot_reload = hot_reload
+        self._sources: Dict[str, str] = {}  # feature name -> file to import
+        self._scanned_at = float("-inf")
+        self._loaded: Dict[str, LoadedFeature] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.imports = 0
+        self.reloads = 0
+        self.failures = 0
+
+    # --- Discovery ---
+    def scan(self) -> Dict[str, str]:
+        """Find the feature modules in the directory without importing them."""
+        sources: Dict[str, str] = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    name, ext = os.path.splitext(entry.name)
+                    if name.startswith("_") or not name.isidentifier():
+                        continue
+                    if ext == ".py" and entry.is_file():
+                        sources[name] = entry.path
+                    elif not ext and entry.is_dir() and os.path.isfile(os.path.join(entry.path, "__init__.py")):
+                        sources[name] = os.path.join(entry.path, "__init__.py")
+        except FileNotFoundError:
+            pass
+        self._sources = sources
+        self._scanned_at = time.monotonic()
+        return sources
+
+    def _source(self, name: str) -> Optional[str]:
+        # Unknown names (new files, or just bad URLs) rescan the directory at most once per interval
+        if name not in self._sources and time.monotonic() - self._scanned_at >= self.check_interval:
+            self.scan()
+        return self._sources.get(name)
+
+    # --- Loading ---
+    def _import(self, name: str, path: str) -> LoadedFeature:
+        signature = _signature(path)
+        qualified = f"{self.package}.{name}"
+        search = [os.path.dirname(path)] if os.path.basename(path) == "__init__.py" else None
+        spec = importlib.util.spec_from_file_location(qualified, path, submodule_search_locations=search)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot import {path}")
+        # Always a new module object, never importlib.reload(): the old one must stay intact for running requests
+        module = importlib.util.module_from_spec(spec)
+        previous = sys.modules.get(qualified)
+        sys.modules[qualified] = module  # Needed by the module's own relative imports
+        try:
+            spec.loader.exec_module(module)
+            router = getattr(module, "router", None)
+            if not isinstance(router, APIRouter):
+                raise ImportError(f"{qualified} does not define an APIRouter named 'router'")
+        except BaseException:
+            if previous is not None:
+                sys.modules[qualified] = previous
+            else:
+                sys.modules.pop(qualified, None)
+            raise
+        return LoadedFeature(module, router, signature)
+
+    def _due(self, name: str) -> bool:
+        return self.hot_reload and time.monotonic() - self._checked_at.get(name, float("-inf")) >= self.check_interval
+
+    async def get(self, name: str) -> Optional[LoadedFeature]:
+        """The current version of a feature, importing or re-importing it if needed; None if there is none."""
+        feature = self._loaded.get(name)
+        if feature is not None and not self._due(name):
+            return feature
+        path = self._source(name)
+        if path is None:
+            return None
+
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            feature = self._loaded.get(name)
+            if feature is not None and not self._due(name):
+                return feature  # Loaded or checked by the request we waited for
+            self._checked_at[name] = time.monotonic()
+            try:
+                signature = _signature(path)
+            except FileNotFoundError:
+                logger.info("Generated feature %s was removed", name)
+                self._sources.pop(name, None)
+                self._loaded.pop(name, None)
+                return None
+            if feature is not None and signature == feature.signature:
+                return feature
+
+            try:
+                # Imports can be slow (and run module code); keep them off the event loop
+                loaded = await asyncio.to_thread(self._import, name, path)
+            except Exception:
+                self.failures += 1
+                logger.exception("Could not import generated feature %s from %s", name, path)
+                if feature is None:
+                    raise HTTPException(status_code=500, detail=f"Generated feature '{name}' failed to load")
+                return feature  # Keep serving the version that worked
+
+            if feature is None:
+                self.imports += 1
+                logger.info("Loaded generated feature %s (%d routes)", name, len(loaded.router.routes))
+            else:
+                self.reloads += 1
+                logger.info("Reloaded generated feature %s (%d routes)", name, len(loaded.router.routes))
+            self._loaded[name] = loaded
+            return loaded
+
+    # --- ASGI ---
+    async def __call__(self, scope, receive, send) -> None:
+        root_path = scope.get("root_path", "")
+        path = scope["path"]
+        route_path = path[len(root_path):] if path.startswith(root_path) else path
+        name, _, _ = route_path.lstrip("/").partition("/")
+
+        if not name:
+            if scope["type"] == "http":
+                await JSONResponse(self.stats())(scope, receive, send)
+                return
+            raise HTTPException(status_code=404)
+        feature = await self.get(name)
+        if feature is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        # The feature's routes are relative to /generated/<name>; a reload only affects later requests
+        await feature.router({**scope, "root_path": f"{root_path}/{name}"}, receive, send)
+
+    def stats(self) -> Dict[str, Any]:
+        if time.monotonic() - self._scanned_at >= self.check_interval:
+            self.scan()
+        features = {}
+        for name in sorted(self._sources):
+            loaded = self._loaded.get(name)
+            routes = [getattr(route, "path", "") for route in loaded.router.routes] if loaded else []
+            features[name] = {"loaded": loaded is not None, "routes": routes}
+        return {
+            "features": features,
+            "imports": self.imports,
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
+
+
+# Mounted by the application at /generated
+generated_features = GeneratedFeatures(
+    GENERATED_DIR, check_interval=settings.GENERATED_CHECK_INTERVAL, hot_reload=settings.GENERATED_HOT_RELOAD
+)
@@ -0,0 +1,333 @@
+"""
+Streaming analytics over the application log and its rotated backups.
+
+Reads logs/app.log and every backup the RotatingFileHandler keeps (oldest
+first) line by line through a fixed-size read buffer, parses each line with
+a regex compiled from LOG_FORMAT (JSON lines from LOG_JSON are understood
+too), and folds the records into time-bucketed counts with pandas a batch
+at a time, so memory depends on the number of buckets, not on the size of
+the logs. Continuation lines, such as tracebacks, are counted as unparsed.
+
+Counts, per bucket:
+  level    records per level
+  topic    health chat answers per topic (HealthChatService)
+  status   error responses per status code (error_handling.py)
+  path     error responses per "METHOD /path"
+  chat     chat traffic: answers, batched requests, LLM fallbacks,
+           failures, and requests shed by admission control
+With LOG_INFO_SAMPLE_RATE below 1, INFO-level counts are samples.
+
+With --incremental, the read offset of every file and the counts so far
+are kept in LOG_ANALYTICS_STATE_PATH, so a rerun only reads lines appended
+since the previous one. Offsets are keyed by inode, which a file keeps when
+it is rotated to app.log.1; a file that is smaller than its offset, or
+whose first bytes changed (a reused inode), is read again from the start.
+A trailing line without a newline is still being written and is left for
+the next run.
+
+Usage:
+    python -m app.core.log_analytics [--bucket 1h] [--incremental] [--csv DIR]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .config import settings
+from .logging_config import DATE_FORMAT, LOG_FORMAT, file_handler, start_logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+READ_BUFFER = 1024 * 1024
+BATCH_RECORDS = 50000  # Records parsed before they are folded into the counts
+HEAD_BYTES = 64  # Leading bytes remembered per file to detect a reused inode
+
+METRICS = ("level", "topic", "status", "path", "chat")
+
+Row = Tuple[str, str, str, str]  # (asctime, levelname, logger name, message)
+
+_FIELD_PATTERNS = {
+    "asctime": r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:,\d{3})?",
+    "levelname": r"[A-Z]+",
+    "lineno": r"\d+",
+    "message": r".*",
+}
+
+
+def compile_log_format(fmt: str) -> "re.Pattern[str]":
+    """Regex matching one line written with a %-style logging format; fields become named groups."""
+    parts = []
+    seen = set()
+    position = 0
+    for match in re.finditer(r"%\((\w+)\)[-#0 +]*\d*(?:\.\d+)?[sdifr]", fmt):
+        name = match.group(1)
+        parts.append(re.escape(fmt[position:match.start()]))
+        if name in seen:
+            parts.append(f"(?P={name})")
+        else:
+            parts.append(f"(?P<{name}>{_FIELD_PATTERNS.get(name, r'.*?')})")
+            seen.add(name)
+        position = match.end()
+    parts.append(re.escape(fmt[position:]))
+    return re.compile("".join(parts) + r"\Z")
+
+
+LOG_LINE = compile_log_format(LOG_FORMAT)
+
+
+def parse_line(line: str) -> Optional[Row]:
+    """The fields of one log line, or None for a line that is not the start of a record."""
+    line = line.rstrip("\r\n")
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+            # JSON times are UTC; bucket them in local time like LOG_FORMAT lines
+            created = datetime.fromisoformat(entry["time"]).astimezone().strftime(DATE_FORMAT)
+            return created, entry["level"], entry["logger"], entry["message"]
+        except (ValueError, KeyError, TypeError):
+            return None
+    match = LOG_LINE.match(line)
+    if match is None:
+        return None
+    return match.group("asctime")[:19], match.group("levelname"), match.group("name"), match.group("message")
+
+
+def log_files(path: str, backups: int) -> List[str]:
+    """The log file and its rotated backups that exist, oldest first."""
+    candidates = [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]
+    return [candidate for candidate in candidates if os.path.isfile(candidate)]
+
+
+def read_batches(f: BinaryIO, offset: int, batch_size: int = BATCH_RECORDS) -> Iterator[Tuple[List[Row], int, int]]:
+    """Parse complete lines from offset on; yields (records, offset after them, unparsed lines) per batch."""
+    f.seek(offset)
+    rows: List[Row] = []
+    unparsed = 0
+    for line in f:
+        if not line.endswith(b"\n"):
+            break  # Still being written
+        offset += len(line)
+        row = parse_line(line.decode("utf-8", "replace"))
+        if row is None:
+            unparsed += 1
+        else:
+            rows.append(row)
+            if len(rows) >= batch_size:
+                yield rows, offset, unparsed
+                rows, unparsed = [], 0
+    yield rows, offset, unparsed
+
+
+def _tally(bucket: pd.Series, metric: str, keys: pd.Series, weights: Any = 1) -> pd.Series:
+    present = keys.notna()
+    if not present.any():
+        return pd.Series(dtype="int64")
+    frame = pd.DataFrame({"bucket": bucket[present], "metric": metric, "key": keys[present].astype(str)})
+    frame["n"] = weights[present] if isinstance(weights, pd.Series) else weights
+    return frame.groupby(["bucket", "metric", "key"])["n"].sum()
+
+
+class LogAggregates:
+    """Time-bucketed record counts, as a Series indexed by (bucket, metric, key)."""
+
+    def __init__(self, bucket: str = "1h"):
+        self.bucket = bucket
+        self.counts = pd.Series(dtype="int64")
+        self.records = 0
+        self.unparsed = 0
+
+    def add(self, rows: List[Row], unparsed: int = 0) -> None:
+        """Fold a batch of parsed records into the counts."""
+        self.unparsed += unparsed
+        if not rows:
+            return
+        self.records += len(rows)
+        frame = pd.DataFrame(rows, columns=["time", "level", "logger", "message"])
+        bucket = pd.to_datetime(frame["time"], format=DATE_FORMAT, errors="coerce").dt.floor(self.bucket)
+        message = frame["message"]
+
+        topic = message.str.extract(r"^Generated health response for topic: (\w+)$", expand=False)
+
+        handled = frame["logger"] == "app.core.error_handling"
+        status = message.str.extract(r"^HTTPException: (\d{3}) ", expand=False)
+        status = status.mask(message.str.startswith(("RequestValidationError:", "Pydantic ValidationError:")), "422")
+        status = status.mask(message.str.startswith("Unhandled exception:"), "500")
+        status = status.where(handled)
+        path = message.str.extract(r" for ([A-Z]+ /\S*)", expand=False).where(status.notna())
+
+        chat = pd.Series(None, index=frame.index, dtype=object)
+        chat = chat.mask(topic.notna(), "answered")
+        chat = chat.mask(message.str.startswith("LLM backend unavailable"), "llm_fallback")
+        chat = chat.mask(message.str.startswith(("Error generating health chat response", "Error in health chat")), "failed")
+        chat = chat.mask((frame["logger"] == "app.core.admission") & message.str.startswith("Shedding "), "shed")
+        batched = pd.to_numeric(
+            message.str.extract(r"^Answered health chat batch of (\d+) requests", expand=False), errors="coerce"
+        )
+
+        parts = [
+            self.counts,
+            _tally(bucket, "level", frame["level"]),
+            _tally(bucket, "topic", topic),
+            _tally(bucket, "status", status),
+            _tally(bucket, "path", path),
+            _tally(bucket, "chat", chat),
+            _tally(bucket, "chat", pd.Series("batched", index=frame.index).where(batched.notna()), batched),
+        ]
+        parts = [part for part in parts if len(part)]
+        self.counts = pd.concat(parts).groupby(level=[0, 1, 2]).sum().astype("int64")
+
+    def table(self, metric: str) -> pd.DataFrame:
+        """Counts of one metric with a row per bucket and a column per key."""
+        if not len(self.counts) or metric not in self.counts.index.get_level_values(1):
+            return pd.DataFrame()
+        return self.counts.xs(metric, level=1).unstack(fill_value=0).sort_index()
+
+    def error_rates(self) -> pd.DataFrame:
+        """Per bucket: records, the share at WARNING or above, and error responses per minute."""
+        levels = self.table("level")
+        if levels.empty:
+            return pd.DataFrame()
+        rates = pd.DataFrame({"records": levels.sum(axis=1)})
+        severe = [level for level in ("WARNING", "ERROR", "CRITICAL") if level in levels.columns]
+        rates["warning_or_worse"] = levels[severe].sum(axis=1) / rates["records"]
+        statuses = self.table("status").reindex(levels.index, fill_value=0)
+        minutes = pd.Timedelta(self.bucket) / pd.Timedelta(minutes=1)
+        rates["errors_per_minute"] = statuses.sum(axis=1) / minutes
+        for code in statuses.columns:
+            rates[f"{code}_per_minute"] = statuses[code] / minutes
+        return rates
+
+    # --- Persistence (incremental mode) ---
+    def to_records(self) -> List[List[Any]]:
+        return [[bucket.isoformat(), metric, key, int(n)] for (bucket, metric, key), n in self.counts.items()]
+
+    def load_records(self, records: List[List[Any]]) -> None:
+        if records:
+            frame = pd.DataFrame(records, columns=["bucket", "metric", "key", "n"])
+            frame["bucket"] = pd.to_datetime(frame["bucket"])
+            self.counts = frame.set_index(["bucket", "metric", "key"])["n"].astype("int64")
+
+
+def _file_key(f: BinaryIO) -> str:
+    stat = os.fstat(f.fileno())
+    return f"{stat.st_dev}:{stat.st_ino}"
+
+
+def _head(f: BinaryIO, length: int) -> str:
+    f.seek(0)
+    return f.read(length).hex()
+
+
+def scan(paths: List[str], aggregates: LogAggregates, offsets: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """Add the records of the files past their saved offsets; returns the new offsets by inode."""
+    offsets = offsets or {}
+    new_offsets: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        try:
+            f = open(path, "rb", buffering=READ_BUFFER)
+        except FileNotFoundError:
+            continue  # Rotated away since it was listed; its inode is read under the new name
+        with f:
+            key = _file_key(f)
+            saved = offsets.get(key)
+            start = 0
+            if saved and saved["offset"] <= os.fstat(f.fileno()).st_size and _head(f, len(saved["head"]) // 2) == saved["head"]:
+                start = saved["offset"]
+            offset = start
+            for rows, offset, unparsed in read_batches(f, start):
+                aggregates.add(rows, unparsed)
+            new_offsets[key] = {"path": path, "offset": offset, "head": _head(f, min(offset, HEAD_BYTES))}
+            if offset > start:
+                logger.debug("Read %s bytes of %s from offset %s", offset - start, path, start)
+    return new_offsets
+
+
+def load_state(path: str, bucket: str) -> Tuple[LogAggregates, Dict[str, Dict[str, Any]]]:
+    """Counts and offsets saved by a previous incremental run (empty if there is none)."""
+    aggregates = LogAggregates(bucket)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return aggregates, {}
+    if state.get("bucket") != bucket:
+        raise ValueError(f"{path} holds {state.get('bucket')} buckets; rerun with that --bucket or --full")
+    aggregates.load_records(state.get("counts", []))
+    aggregates.records = state.get("records", 0)
+    aggregates.unparsed = state.get("unparsed", 0)
+    return aggregates, state.get("files", {})
+
+
+def save_state(path: str, aggregates: LogAggregates, offsets: Dict[str, Dict[str, Any]]) -> None:
+    state = {
+        "bucket": aggregates.bucket,
+        "records": aggregates.records,
+        "unparsed": aggregates.unparsed,
+        "files": offsets,
+        "counts": aggregates.to_records(),
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temporary, path)  # Never leave a half-written state behind
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=file_handler.baseFilename, help="Current log file; backups are <log>.1 ...")
+    parser.add_argument("--backups", type=int, default=file_handler.backupCount, help="Rotated backups to read")
+    parser.add_argument("--bucket", default="1h", help="Bucket width as a pandas frequency (1min, 15min, 1h, 1D)")
+    parser.add_argument("--incremental", action="store_true", help="Only read new lines; keep totals in --state")
+    parser.add_argument("--full", action="store_true", help="With --incremental, discard the saved state first")
+    parser.add_argument("--state", default=settings.LOG_ANALYTICS_STATE_PATH)
+    parser.add_argument("--csv", metavar="DIR", help="Also write one CSV per table to DIR")
+    args = parser.parse_args()
+    start_logging()
+
+    try:
+        pd.Timedelta(args.bucket)
+    except ValueError:
+        parser.error(f"Invalid bucket width: {args.bucket}")
+
+    offsets: Dict[str, Dict[str, Any]] = {}
+    aggregates = LogAggregates(args.bucket)
+    if args.incremental and not args.full:
+        try:
+            aggregates, offsets = load_state(args.state, args.bucket)
+        except ValueError as e:
+            parser.error(str(e))
+    records_before = aggregates.records
+
+    paths = log_files(args.log, args.backups)
+    offsets = scan(paths, aggregates, offsets)
+    if args.incremental:
+        save_state(args.state, aggregates, offsets)
+
+    print(f"Read {aggregates.records - records_before} new records from {len(paths)} files "
+          f"({aggregates.records} in total, {aggregates.unparsed} unparsed lines)")
+    tables = {metric: aggregates.table(metric) for metric in METRICS}
+    tables["error_rates"] = aggregates.error_rates()
+    with pd.option_context("display.width", 200, "display.max_columns", 30, "display.float_format", "{:.3f}".format):
+        for name, table in tables.items():
+            if not table.empty:
+                print(f"\n{name} per {args.bucket}:\n{table.to_string()}")
+    if args.csv:
+        os.makedirs(args.csv, exist_ok=True)
+        for name, table in tables.items():
+            table.to_csv(os.path.join(args.csv, f"{name}.csv"))
+
+
+if __name__ == "__main__":
+    # Run as app.core.log_analytics, not __main__, so records reach the "app" logger and its handlers
+    from app.core.log_analytics import main
+
+    main()
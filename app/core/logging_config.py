@@ -1,33 +1,155 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from .config import settings
 
 # Define log format
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(funcName)s:%(lineno)d - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.module}:{record.funcName}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "sample":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of INFO (and lower) records; warnings and errors always pass.
+
+    Pass extra={"sample": False} to exempt an individual INFO record.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno > logging.INFO or not getattr(record, "sample", True):
+            return True
+        if random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller: records are dropped when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the arguments into the message, but leave formatting to the listener's handlers.
+
+        QueueHandler.prepare formats the record here and clears exc_info, so
+        tracebacks ended up inside the message and JsonFormatter could not
+        report them in their own field.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+
+def _make_formatter() -> logging.Formatter:
+    return JsonFormatter() if settings.LOG_JSON else logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+
+
 # Create a custom logger
 logger = logging.getLogger("app")
-logger.setLevel(logging.INFO) # Default level, can be overridden by config
+logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
 
-# Create handlers
+# Create handlers; they run on the listener thread, never on the request path
 console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+console_handler.setFormatter(_make_formatter())
 
 # File handler (optional, but good for production)
 # Creates a logs directory if it doesn't exist
-import os
 if not os.path.exists('logs'):
     os.makedirs('logs')
 file_handler = RotatingFileHandler('logs/app.log', maxBytes=1024*1024*5, backupCount=5, encoding='utf-8') # 5MB per file, 5 backup files
-file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+file_handler.setFormatter(_make_formatter())
+
+# The app logger only enqueues; a background listener does the formatting and I/O
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
+sampling_filter = SamplingFilter(settings.LOG_INFO_SAMPLE_RATE)
+queue_handler.addFilter(sampling_filter)
+logger.addHandler(queue_handler)
+
+_listener: Optional[QueueListener] = None
+
+
+def start_logging() -> None:
+    """Start the background thread that writes queued records to the handlers."""
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        _listener.start()
+
+
+def stop_logging() -> None:
+    """Write out everything still queued and stop the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, int]:
+    """Counters for monitoring the logging pipeline."""
+    return {
+        "queued": log_queue.qsize(),
+        "queue_size": log_queue.maxsize,
+        "dropped": queue_handler.dropped,
+        "sampled_out": sampling_filter.sampled_out,
+    }
+
 
-# Add handlers to the logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+# Started by the application lifespan, the gunicorn hooks and the command-line entry points, not on import
+atexit.register(stop_logging)
 
 def get_logger(name: str) -> logging.Logger:
     """Returns a logger instance with the specified name, inheriting base config."""
     return logging.getLogger(name)
 
-# End of logging configuration
\ No newline at end of file
+# End of logging configuration
@@ -0,0 +1,486 @@
+"""
+Low-overhead request and service metrics in Prometheus text format.
+
+Every worker process keeps its metrics in a fixed array of doubles backed by
+a memory-mapped file in METRICS_DIR (one file per worker). The layout of the
+array is decided once, when the application starts (open()), and written as
+a JSON header at the start of the file, so recording a value is an index
+lookup and an in-place add; nothing is allocated per request. /api/metrics
+reads the files of all sibling workers (same parent process) and sums them,
+so the numbers are correct no matter which worker answers the scrape. When a
+worker exits, the master folds its counters into one aggregate file
+(metrics-<master pid>-0.bin, same format, listing the folded pids) and
+deletes the worker's file (fold(), from gunicorn's child_exit hook), so
+recycled workers do not leave a growing number of files to read.
+
+Recorded series:
+  http_requests_total{method, route, status}     counter
+  http_request_duration_seconds{method, route}   histogram
+  http_requests_in_flight                        gauge
+  health_chat_topic_total{topic}                 counter
+  plus process gauges registered with add_gauge() (queue depths etc.),
+  sampled at most once per METRICS_SAMPLE_INTERVAL. Gauges registered with
+  per_process=True (e.g. resident memory) are not summed; each worker's
+  value is reported with a pid label.
+"""
+
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from app.models.ai_models import HealthTopic
+
+from .config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATUS_CODES: Tuple[int, ...] = (
+    200, 201, 204, 206, 301, 302, 304, 400, 401, 403, 404, 405, 409, 413, 422, 429, 500, 502, 503, 504,
+)
+TOPICS: Tuple[str, ...] = tuple(topic.value for topic in HealthTopic)
+
+# name -> (type, help); the order here is the exposition order
+FAMILIES: Dict[str, Tuple[str, str]] = {
+    "http_requests_total": ("counter", "HTTP requests by route and status code."),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route, until the response is complete."),
+    "http_requests_in_flight": ("gauge", "HTTP requests currently being handled."),
+    "health_chat_topic_total": ("counter", "Health chat answers by chosen topic."),
+}
+
+_UNMATCHED = ("OTHER", "unmatched")
+_HEADER = struct.Struct("<I")  # Length of the JSON header that precedes the values
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _walk_routes(routes: Iterable[Any], prefix: str = "") -> Iterable[Tuple[Hashable, List[str], str]]:
+    """Yield (endpoint, methods, full path template) for every HTTP route, following mounts."""
+    for route in routes:
+        if hasattr(route, "effective_candidates"):
+            # Routers included lazily by newer FastAPI versions carry their own prefix
+            yield from _walk_routes(route.effective_candidates(), prefix)
+        elif hasattr(route, "routes") and hasattr(route, "app") and not hasattr(route, "methods"):
+            # Mount: the mounted app is the endpoint for anything it serves directly
+            path = prefix + route.path
+            yield route.app, ["*"], path
+            yield from _walk_routes(route.routes or [], path)
+        elif getattr(route, "methods", None) and hasattr(route, "path_format"):
+            yield route.endpoint, sorted(route.methods), prefix + route.path_format
+
+
+class _Schema:
+    """Maps every series to its slot in the value array."""
+
+    def __init__(self, route_labels: List[Tuple[str, str]], gauges: List[str]):
+        self.keys: List[Tuple[str, Labels]] = []
+        self.route_base: Dict[Tuple[str, str], int] = {}
+        for method, route in route_labels:
+            self.route_base[(method, route)] = len(self.keys)
+            labels = (("method", method), ("route", route))
+            for le in LATENCY_BUCKETS:
+                self.keys.append(("http_request_duration_seconds_bucket", labels + (("le", repr(le)),)))
+            self.keys.append(("http_request_duration_seconds_bucket", labels + (("le", "+Inf"),)))
+            self.keys.append(("http_request_duration_seconds_sum", labels))
+            for code in STATUS_CODES:
+                self.keys.append(("http_requests_total", labels + (("status", str(code)),)))
+            self.keys.append(("http_requests_total", labels + (("status", "other"),)))
+        self.in_flight = len(self.keys)
+        self.keys.append(("http_requests_in_flight", ()))
+        self.topic_base = len(self.keys)
+        for topic in TOPICS:
+            self.keys.append(("health_chat_topic_total", (("topic", topic),)))
+        self.gauge_slots: Dict[str, int] = {}
+        for name in gauges:
+            self.gauge_slots[name] = len(self.keys)
+            self.keys.append((name, ()))
+
+
+class Metrics:
+    """Per-process metric store; see the module docstring."""
+
+    _SUM_OFFSET = len(LATENCY_BUCKETS) + 1
+    _STATUS_OFFSET = _SUM_OFFSET + 1
+
+    def __init__(self, directory: str, sample_interval: float = 5.0):
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._per_process: Set[str] = set()
+        self._slots: Dict[Tuple[Hashable, str], int] = {}
+        self._status_index = {code: i for i, code in enumerate(STATUS_CODES)}
+        self._topic_index = {topic: i for i, topic in enumerate(TOPICS)}
+        # Until open() only the topic counters are recorded, in memory
+        self._schema = _Schema([], [])
+        self._values = memoryview(bytearray(8 * len(self._schema.keys))).cast("d")
+        self._mmap: Optional[mmap.mmap] = None
+        self._path: Optional[str] = None
+        self._last_sample = 0.0
+        self._header_cache: Dict[str, Tuple[int, int, List[Tuple[str, Labels]]]] = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self._mmap is not None
+
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], float], per_process: bool = False) -> None:
+        """Register a process gauge (e.g. a queue depth); must be called before open().
+
+        Per-process gauges are reported for each worker instead of summed.
+        """
+        self._gauges[name] = (help_text, read)
+        if per_process:
+            self._per_process.add(name)
+
+    # --- Lifecycle ---
+    def open(self, routes: Iterable[Any]) -> None:
+        """Lay out slots for the application's routes and map this worker's file."""
+        if self._mmap is not None:
+            return
+        route_labels: List[Tuple[str, str]] = []
+        endpoints: Dict[Tuple[Hashable, str], Tuple[str, str]] = {}
+        for endpoint, methods, path in _walk_routes(routes):
+            for method in methods:
+                label = (method, path)
+                if (endpoint, method) not in endpoints:
+                    endpoints[(endpoint, method)] = label
+                    if label not in route_labels:
+                        route_labels.append(label)
+        route_labels.append(_UNMATCHED)
+        schema = _Schema(route_labels, list(self._gauges))
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_stale_files()
+        header = json.dumps({"pid": os.getpid(), "keys": schema.keys}).encode("utf-8")
+        header_size = (_HEADER.size + len(header) + 7) // 8 * 8
+        path = os.path.join(self.directory, f"metrics-{os.getppid()}-{os.getpid()}.bin")
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(len(header)) + header)
+            f.write(b"\0" * (header_size - _HEADER.size - len(header) + 8 * len(schema.keys)))
+        with open(path, "r+b") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0)
+        self._switch(schema, memoryview(self._mmap)[header_size:].cast("d"))
+        self._slots = {key: schema.route_base[label] for key, label in endpoints.items()}
+        self._path = path
+        logger.info("Metrics for %s routes recorded in %s", len(route_labels), path)
+
+    def close(self) -> None:
+        """Unmap this worker's file; it stays on disk so its counters keep adding up until the master folds it."""
+        if self._mmap is not None:
+            mapped = self._values
+            self._switch(_Schema([], []), memoryview(bytearray(8 * len(self._schema.keys))).cast("d"))
+            mapped.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def _switch(self, schema: _Schema, values: memoryview) -> None:
+        """Move to a new layout, carrying over every series both layouts have."""
+        new_index = {key: i for i, key in enumerate(schema.keys)}
+        for i, key in enumerate(self._schema.keys):
+            if key in new_index:
+                values[new_index[key]] = self._values[i]
+        self._schema = schema
+        self._values = values
+
+    def _remove_stale_files(self) -> None:
+        # Files from earlier runs (parent process gone) would otherwise be summed forever
+        for path in glob.glob(os.path.join(self.directory, "metrics-*-*.bin")):
+            try:
+                ppid = int(os.path.basename(path).split("-")[1])
+            except (IndexError, ValueError):
+                continue
+            if ppid != os.getppid() and not _pid_alive(ppid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # --- Hot path ---
+    def request_started(self) -> None:
+        self._values[self._schema.in_flight] += 1
+
+    def request_finished(self, endpoint: Optional[Hashable], method: str, status: int, duration: float) -> None:
+        values = self._values
+        schema = self._schema
+        values[schema.in_flight] -= 1
+        if self._mmap is None:
+            return
+        base = self._slots.get((endpoint, method))
+        if base is None:
+            base = self._slots.get((endpoint, "*"), schema.route_base[_UNMATCHED])
+        values[base + bisect_left(LATENCY_BUCKETS, duration)] += 1
+        values[base + self._SUM_OFFSET] += duration
+        values[base + self._STATUS_OFFSET + self._status_index.get(status, len(STATUS_CODES))] += 1
+
+        if self._gauges:
+            now = time.monotonic()
+            if now - self._last_sample >= self.sample_interval:
+                self._last_sample = now
+                self.sample_gauges()
+
+    def count_topic(self, topic: str) -> None:
+        index = self._topic_index.get(topic)
+        if index is not None:
+            self._values[self._schema.topic_base + index] += 1
+
+    def sample_gauges(self) -> None:
+        for name, slot in self._schema.gauge_slots.items():
+            try:
+                self._values[slot] = float(self._gauges[name][1]())
+            except Exception as e:
+                logger.debug("Could not sample gauge %s: %s", name, e)
+
+    # --- Aggregation and exposition ---
+    def _read_file(self, path: str) -> Optional[Tuple[int, List[Tuple[str, Labels]], memoryview]]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        (length,) = _HEADER.unpack_from(data)
+        stat_key = (length, len(data))
+        cached = self._header_cache.get(path)
+        if cached is not None and cached[:2] == stat_key:
+            keys = cached[2]
+        else:
+            meta = _parse_header(data, length)
+            if meta is None:
+                return None
+            keys = meta["keys"]
+            self._header_cache[path] = (*stat_key, keys)
+        header_size = (_HEADER.size + length + 7) // 8 * 8
+        values = memoryview(data)[header_size:header_size + 8 * len(keys)].cast("d")
+        pid = int(os.path.basename(path).rsplit("-", 1)[1].split(".")[0])
+        return pid, keys, values
+
+    def _aggregate_path(self, master: int) -> str:
+        return os.path.join(self.directory, f"metrics-{master}-0.bin")
+
+    def fold(self, pid: int) -> None:
+        """Master: add an exited worker's counters to the aggregate file, then delete the worker's file.
+
+        Gauges are left out; an exited worker has nothing in flight. The
+        aggregate is replaced atomically and lists the pids of folded workers
+        whose files still exist, so a scrape that finds one does not count it twice.
+        """
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}-{pid}.bin")
+        read = self._read_file(path)
+        self._header_cache.pop(path, None)
+        if read is None:
+            return
+        _, keys, values = read
+        aggregate_path = self._aggregate_path(os.getpid())
+        totals, folded = _read_aggregate(aggregate_path) or ({}, [])
+        for i, key in enumerate(keys):
+            if values[i] and _is_cumulative(key[0]):
+                totals[key] = totals.get(key, 0.0) + values[i]
+        # Earlier pids stay listed for as long as a scrape could still find their files
+        folded = [
+            folded_pid for folded_pid in folded
+            if os.path.exists(os.path.join(self.directory, f"metrics-{os.getpid()}-{folded_pid}.bin"))
+        ]
+        _write_aggregate(aggregate_path, totals, folded + [pid])
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("Could not remove metrics file %s: %s", path, e)
+
+    def collect(self) -> Dict[Tuple[str, Labels], float]:
+        """Sum the series of every worker that shares this process's parent."""
+        if self._gauges:
+            self.sample_gauges()
+        gauge_names = {name for name, (kind, _) in FAMILIES.items() if kind == "gauge"} | set(self._gauges)
+        totals: Dict[Tuple[str, Labels], float] = {}
+        if self._mmap is None:
+            # Not serving (e.g. a script); report this process only
+            return {key: self._values[i] for i, key in enumerate(self._schema.keys)}
+        # Read before the worker files: a worker folded meanwhile is then still counted from its own file
+        aggregate_path = self._aggregate_path(os.getppid())
+        totals, folded = _read_aggregate(aggregate_path) or ({}, [])
+        for path in glob.glob(os.path.join(self.directory, f"metrics-{os.getppid()}-*.bin")):
+            if path == aggregate_path:
+                continue
+            read = self._read_file(path)
+            if read is None:
+                continue
+            pid, keys, values = read
+            if pid in folded:
+                continue
+            alive = pid == os.getpid() or _pid_alive(pid)
+            for i, key in enumerate(keys):
+                if key[0] in gauge_names and not alive:
+                    continue  # A dead worker has nothing in flight
+                if key[0] in self._per_process:
+                    key = (key[0], key[1] + (("pid", str(pid)),))
+                totals[key] = totals.get(key, 0.0) + values[i]
+        return totals
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format (version 0.0.4)."""
+        totals = self.collect()
+        by_family: Dict[str, List[Tuple[str, Labels, float]]] = {}
+        for (name, labels), value in totals.items():
+            family = name
+            for suffix in ("_bucket", "_sum"):
+                if name.endswith(suffix) and name[: -len(suffix)] in FAMILIES:
+                    family = name[: -len(suffix)]
+            by_family.setdefault(family, []).append((name, labels, value))
+
+        families = dict(FAMILIES)
+        families.update({name: ("gauge", help_text) for name, (help_text, _) in self._gauges.items()})
+        lines: List[str] = []
+        for family, (kind, help_text) in families.items():
+            series = by_family.get(family)
+            if not series:
+                continue
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            if kind == "histogram":
+                lines.extend(_render_histogram(family, series))
+            else:
+                lines.extend(
+                    f"{name}{_format_labels(labels)} {_format_value(value)}"
+                    for name, labels, value in series
+                    # Most route/status combinations never happen; leave them out
+                    if value or name != "http_requests_total"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(family: str, series: List[Tuple[str, Labels, float]]) -> List[str]:
+    """Turn stored per-bucket counts into cumulative buckets plus _sum and _count."""
+    buckets: Dict[Labels, List[Tuple[str, float]]] = {}
+    sums: Dict[Labels, float] = {}
+    for name, labels, value in series:
+        if name.endswith("_bucket"):
+            base = tuple(pair for pair in labels if pair[0] != "le")
+            le = dict(labels)["le"]
+            buckets.setdefault(base, []).append((le, value))
+        else:
+            sums[labels] = value
+    lines = []
+    for base, counts in buckets.items():
+        counts.sort(key=lambda item: float("inf") if item[0] == "+Inf" else float(item[0]))
+        if not any(count for _, count in counts):
+            continue  # Route never called
+        cumulative = 0.0
+        for le, count in counts:
+            cumulative += count
+            lines.append(f"{family}_bucket{_format_labels(base + (('le', le),))} {_format_value(cumulative)}")
+        lines.append(f"{family}_sum{_format_labels(base)} {_format_value(sums.get(base, 0.0))}")
+        lines.append(f"{family}_count{_format_labels(base)} {_format_value(cumulative)}")
+    return lines
+
+
+def _is_cumulative(name: str) -> bool:
+    """Whether a series only ever grows (counters and histogram parts), so it can be summed after a worker exits."""
+    for suffix in ("_bucket", "_sum"):
+        if name.endswith(suffix) and name[: -len(suffix)] in FAMILIES:
+            name = name[: -len(suffix)]
+    return FAMILIES.get(name, ("gauge",))[0] in ("counter", "histogram")
+
+
+def _parse_header(data: bytes, length: int) -> Optional[Dict[str, Any]]:
+    try:
+        meta = json.loads(data[_HEADER.size:_HEADER.size + length])
+    except ValueError:
+        return None
+    meta["keys"] = [(name, tuple(tuple(pair) for pair in labels)) for name, labels in meta["keys"]]
+    return meta
+
+
+def _read_aggregate(path: str) -> Optional[Tuple[Dict[Tuple[str, Labels], float], List[int]]]:
+    """Series and folded pids of a master's aggregate file, if it has one."""
+    # Not cached: the master rewrites it whenever a worker exits, and it only holds non-zero series
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    (length,) = _HEADER.unpack_from(data)
+    meta = _parse_header(data, length)
+    if meta is None:
+        return None
+    header_size = (_HEADER.size + length + 7) // 8 * 8
+    values = memoryview(data)[header_size:header_size + 8 * len(meta["keys"])].cast("d")
+    return dict(zip(meta["keys"], values)), meta.get("folded", [])
+
+
+def _write_aggregate(path: str, totals: Dict[Tuple[str, Labels], float], folded: List[int]) -> None:
+    keys = list(totals)
+    header = json.dumps({"pid": 0, "folded": folded, "keys": keys}).encode("utf-8")
+    header_size = (_HEADER.size + len(header) + 7) // 8 * 8
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(len(header)) + header)
+        f.write(b"\0" * (header_size - _HEADER.size - len(header)))
+        f.write(struct.pack(f"={len(keys)}d", *totals.values()))  # Native order, like the mapped files
+    os.replace(tmp, path)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# One store per process, shared by the middleware and the services
+metrics = Metrics(settings.METRICS_DIR, sample_interval=settings.METRICS_SAMPLE_INTERVAL)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and in-flight counts per route."""
+
+    def __init__(self, app, store: Optional[Metrics] = None):
+        self.app = app
+        self.metrics = store or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        status = 500  # Reported if the app fails before starting a response
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.request_started()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.request_finished(scope.get("endpoint"), scope["method"], status, time.perf_counter() - start)
+
@@ -0,0 +1,137 @@
+"""
+On-demand per-request profiling.
+
+ProfilingMiddleware runs cProfile around a request when either
+  * the request carries `X-Profile-Token: <PROFILING_TOKEN>`, or
+  * it falls in the random PROFILING_SAMPLE_RATE fraction of requests.
+
+The profile covers everything below the middleware: routing, validation, the
+endpoint and the service it calls, and the HTTPException/validation handlers
+of error_handling.py. Each profile is written to PROFILING_DIR as a .pstats
+file named after the request, and the response gets an X-Profile header
+with the file name. Read one with:
+    python -m pstats logs/profiles/<file>.pstats
+
+Only one request is profiled at a time per process (cProfile is per thread
+and cannot nest), and since it profiles the event loop thread, functions of
+other requests that run while the profiled one awaits show up as well.
+The oldest files are deleted when the directory grows past
+PROFILING_MAX_BYTES. The middleware is only installed when a token or a
+sample rate is configured; unsampled requests cost one header scan.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import random
+import re
+import time
+from typing import Optional
+
+from .config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_SUFFIX = ".pstats"
+
+
+def profiling_configured() -> bool:
+    return bool(settings.PROFILING_TOKEN) or settings.PROFILING_SAMPLE_RATE > 0
+
+
+def _prune(directory: str, max_bytes: int) -> None:
+    """Delete the oldest profiles until the directory is within max_bytes."""
+    profiles = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(PROFILE_SUFFIX) and entry.is_file():
+                stat = entry.stat()
+                profiles.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in profiles)
+    for _, size, path in sorted(profiles):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _write_profile(profiler: cProfile.Profile, directory: str, filename: str, max_bytes: int) -> None:
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, filename))
+    _prune(directory, max_bytes)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles authenticated or sampled requests."""
+
+    def __init__(
+        self,
+        app,
+        token: Optional[str] = None,
+        sample_rate: Optional[float] = None,
+        directory: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.app = app
+        token = settings.PROFILING_TOKEN if token is None else token
+        self.token = token.encode() if token else None
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.directory = directory or settings.PROFILING_DIR
+        self.max_bytes = settings.PROFILING_MAX_BYTES if max_bytes is None else max_bytes
+        self._active = False
+        self._sequence = itertools.count(1)
+
+    def _wants_profile(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_TOKEN_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")[:60] or "root"
+        filename = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}-{scope['method']}-{slug}{PROFILE_SUFFIX}"
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile", filename.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = cProfile.Profile()
+        self._active = True
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiler (e.g. a debugger) is active on this thread
+            self._active = False
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self._active = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                await asyncio.to_thread(_write_profile, profiler, self.directory, filename, self.max_bytes)
+                logger.info("Profiled %s %s (%.1f ms) -> %s", scope["method"], scope["path"], elapsed_ms, filename)
+            except OSError as e:
+                logger.error("Could not write profile %s: %s", filename, e)
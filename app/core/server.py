@@ -0,0 +1,164 @@
+"""
+Preforking production server: a gunicorn master with uvicorn workers.
+
+The master imports the application once (preload_app) and then forks the
+workers, so modules, compiled rules and indexes loaded before the fork are
+shared copy-on-write instead of being loaded again by every worker. The
+master also compiles the topic classifier and opens the knowledge base
+index, which each worker would otherwise build for itself on warm-up. To
+keep those pages shared, gc.freeze() moves everything allocated so far into the
+permanent generation before each fork; otherwise the first collection in a
+worker writes to every object header and copies the pages it touches.
+
+Workers are recycled gracefully (in-flight requests finish, the master
+starts a replacement) after SERVER_MAX_REQUESTS requests, with jitter so
+they do not all restart at once, or when their private resident memory
+exceeds SERVER_MAX_RSS_MB. The limit leaves out the pages still shared with
+the master: they are not freed by recycling, and counting them would
+recycle a worker that has not grown at all. Each worker's total and private
+resident memory is exported on /api/metrics as
+process_resident_memory_bytes{pid="..."} and process_private_memory_bytes.
+
+gunicorn.conf.py in the project root installs the hooks below, so plain
+`gunicorn main:app` uses them; run.py and main.py start this mode with
+APP_SERVER=prefork.
+"""
+
+import gc
+import importlib
+import logging
+import os
+import signal
+import sys
+import threading
+from typing import Callable, Optional
+
+from .config import settings
+from .logging_config import start_logging, stop_logging
+from .metrics import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONFIG_PATH = os.path.join(PROJECT_DIR, "gunicorn.conf.py")
+
+# Imported by the master so every worker shares them (numpy, scipy and the services)
+PRELOAD_MODULES = ("app.services.knowledge_base", "app.services.service_registry")
+
+_MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of a process (default: this one), or 0 if it cannot be read."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    if pid is not None:
+        return 0
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    # No /proc (macOS): the peak rather than the current size; bytes on macOS, kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def private_bytes() -> int:
+    """Resident memory of this process that is not shared with other processes (falls back to RSS)."""
+    try:
+        with open("/proc/self/smaps_rollup", "rb") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rss_bytes()
+    # Values are in kB
+    return 1024 * sum(int(line.split()[1]) for line in lines if line.startswith((b"Private_Clean:", b"Private_Dirty:")))
+
+
+class RssWatchdog:
+    """Daemon thread that calls on_exceeded once this process's private memory goes above max_bytes."""
+
+    def __init__(self, max_bytes: int, interval: float, on_exceeded: Callable[[], None]):
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.on_exceeded = on_exceeded
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="rss-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            private = private_bytes()
+            if private > self.max_bytes:
+                logger.warning(
+                    "Worker %s uses %.0f MB of private memory (RSS %.0f MB), above the %.0f MB limit; recycling it",
+                    os.getpid(), private / _MB, rss_bytes() / _MB, self.max_bytes / _MB,
+                )
+                self.on_exceeded()
+                return
+
+
+def _exit_gracefully() -> None:
+    # uvicorn handles SIGTERM by finishing in-flight requests; the master then forks a replacement
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+# --- gunicorn server hooks (installed by gunicorn.conf.py) ---
+def when_ready(server) -> None:
+    """Master, after the application is loaded: build the shared structures and freeze the heap."""
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    # The workers' registries pick these up from the same caches instead of building their own
+    from app.services.topic_classifier import get_topic_classifier
+
+    get_topic_classifier()
+    if settings.KNOWLEDGE_BASE_ENABLED:
+        from app.services.knowledge_base import get_knowledge_base
+
+        get_knowledge_base()
+    gc.collect()
+    gc.freeze()
+    # Threads do not survive fork; the log writer is stopped around each fork and restarted in both processes
+    os.register_at_fork(after_in_parent=start_logging)
+    server.log.info("Application preloaded: %d objects frozen, master RSS %.0f MB", gc.get_freeze_count(), rss_bytes() / _MB)
+
+
+def pre_fork(server, worker) -> None:
+    # Stopping drains the queue, so the child does not inherit the writer thread's lock or its backlog
+    stop_logging()
+    gc.freeze()  # Objects allocated since the last fork (e.g. while replacing a worker)
+
+
+def post_fork(server, worker) -> None:
+    start_logging()
+
+
+def post_worker_init(worker) -> None:
+    if settings.SERVER_MAX_RSS_MB > 0:
+        RssWatchdog(int(settings.SERVER_MAX_RSS_MB * _MB), settings.SERVER_RSS_CHECK_INTERVAL, _exit_gracefully).start()
+
+
+def child_exit(server, worker) -> None:
+    """Master, after a worker exits: keep its counters in the aggregate file and remove its own."""
+    try:
+        metrics.fold(worker.pid)
+    except OSError as e:
+        server.log.warning("Could not fold the metrics of worker %s: %s", worker.pid, e)
+
+
+def run_prefork(app_uri: str, host: str, port: int) -> None:
+    """Replace this process with a gunicorn master serving app_uri."""
+    argv = [
+        sys.executable, "-m", "gunicorn",
+        "--config", CONFIG_PATH, "--chdir", PROJECT_DIR, "--bind", f"{host}:{port}", app_uri,
+    ]
+    # exec rather than a child process: no idle interpreter left holding memory
+    os.execv(sys.executable, argv)
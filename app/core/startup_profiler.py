@@ -0,0 +1,142 @@
+"""
+Startup profiler for cold starts.
+
+Records how long each init phase takes and, when STARTUP_PROFILE=1 is set in
+the environment, how long every module import takes (self time, excluding
+nested imports). The report is logged once services are warm and served at
+/api/startup.
+
+This module only uses the standard library so it can be imported before
+anything else in the app package.
+"""
+
+import importlib.abc
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wraps a module loader and records how long exec_module takes."""
+
+    def __init__(self, loader: importlib.abc.Loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        profiler = self._profiler
+        stack = profiler._import_stack
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            profiler.imports[module.__name__] = (elapsed - nested, elapsed)
+
+    def __getattr__(self, name: str) -> Any:
+        # Keep get_resource_reader, is_package, etc. working
+        return getattr(self._loader, name)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path finder that defers to the real finders and times the loaders they return."""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self._profiler)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    """Collects per-phase and per-import timings from process start to readiness."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: List[Tuple[str, float, float]] = []  # (name, offset, duration)
+        self.marks: Dict[str, float] = {}
+        self.imports: Dict[str, Tuple[float, float]] = {}  # module -> (self, cumulative)
+        self._import_stack: List[float] = []
+        self._timer: Optional[_ImportTimer] = None
+
+    @property
+    def import_timing(self) -> bool:
+        return self._timer is not None
+
+    def enable_import_timing(self) -> None:
+        """Start timing every module imported from now on."""
+        if self._timer is None:
+            self._timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._timer)
+
+    def disable_import_timing(self) -> None:
+        if self._timer is not None:
+            sys.meta_path.remove(self._timer)
+            self._timer = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block of startup work."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.phases.append((name, start - self.started_at, end - start))
+
+    def mark(self, name: str) -> None:
+        """Record when a milestone (e.g. 'serving', 'ready') was reached."""
+        self.marks.setdefault(name, time.perf_counter() - self.started_at)
+
+    def report(self, top: int = 20) -> Dict[str, Any]:
+        """Phase timings, milestones and the slowest imports, in milliseconds."""
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return {
+            "phases": [
+                {"name": name, "start_ms": round(offset * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+                for name, offset, duration in self.phases
+            ],
+            "marks_ms": {name: round(offset * 1000, 1) for name, offset in self.marks.items()},
+            "import_timing": self.import_timing,
+            "modules_imported": len(self.imports),
+            "slowest_imports": [
+                {"module": module, "self_ms": round(own * 1000, 1), "cumulative_ms": round(total * 1000, 1)}
+                for module, (own, total) in slowest
+            ],
+        }
+
+    def format_report(self, top: int = 10) -> str:
+        report = self.report(top)
+        lines = ["Startup profile:"]
+        lines += [f"  {p['name']:<24} +{p['start_ms']:>8.1f} ms  {p['duration_ms']:>8.1f} ms" for p in report["phases"]]
+        lines += [f"  {name:<24} at {offset:>8.1f} ms" for name, offset in report["marks_ms"].items()]
+        if report["slowest_imports"]:
+            lines.append(f"  slowest of {report['modules_imported']} imports (self / cumulative):")
+            lines += [
+                f"    {i['module']:<40} {i['self_ms']:>7.1f} / {i['cumulative_ms']:>7.1f} ms"
+                for i in report["slowest_imports"]
+            ]
+        return "\n".join(lines)
+
+
+# Created when the app package is first imported, before any framework import
+startup_profiler = StartupProfiler()
+if os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes"):
+    startup_profiler.enable_import_timing()
@@ -0,0 +1,243 @@
+"""
+Fingerprinted, precompressed static assets.
+
+The build step (run by setup_deployment.py and the Dockerfile) writes, next
+to every file in the static directory:
+  * a copy whose name contains a content hash, e.g. style.3f2a9c1be07d.css
+  * .gz and .br variants of that copy (.br needs the brotli package from
+    requirements.txt; without it the build warns and writes only .gz)
+  * asset-manifest.json mapping logical names to fingerprinted ones
+
+PrecompressedStaticFiles serves fingerprinted names with immutable cache
+headers and picks the precompressed variant from Accept-Encoding, so nothing
+is compressed per request. Templates use `asset_path('style.css')` to link
+the fingerprinted name.
+
+Build manually:
+    python -m app.core.static_assets [--src static] [--out app/static]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from .logging_config import start_logging
+
+try:
+    import brotli
+except ImportError:  # Optional; only gzip variants are written without it
+    brotli = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "asset-manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Text-like assets worth compressing; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = frozenset({
+    ".css", ".js", ".mjs", ".map", ".json", ".html", ".htm", ".svg", ".txt", ".xml", ".wasm", ".ico",
+})
+MIN_COMPRESS_SIZE = 256  # Bytes; smaller files gain nothing from compression
+
+# Content-Encoding name -> file suffix, in server preference order
+ENCODINGS: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _fingerprint(path: str, digest: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def _compress(data: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def build_assets(src_dir: str, out_dir: str) -> Dict[str, dict]:
+    """Fingerprint and precompress every file in src_dir into out_dir and write the manifest.
+
+    src_dir and out_dir may be the same directory; outputs of an earlier build
+    are recognised from its manifest and replaced.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    old_manifest = load_manifest(out_dir)
+    old_outputs = set()
+    for entry in old_manifest.values():
+        old_outputs.add(entry["path"])
+        old_outputs.update(entry["path"] + suffix for name, suffix in ENCODINGS if name in entry["encodings"])
+
+    assets: Dict[str, dict] = {}
+    for root, _, files in os.walk(src_dir):
+        for filename in sorted(files):
+            full_path = os.path.join(root, filename)
+            logical = os.path.relpath(full_path, src_dir).replace(os.sep, "/")
+            if logical == MANIFEST_NAME or logical in old_outputs:
+                continue
+            with open(full_path, "rb") as f:
+                data = f.read()
+
+            hashed = _fingerprint(logical, hashlib.sha256(data).hexdigest()[:12])
+            target = os.path.join(out_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(data)
+            if os.path.abspath(src_dir) != os.path.abspath(out_dir):
+                # Keep the plain name available for links that do not use the manifest
+                shutil.copy2(full_path, os.path.join(out_dir, logical))
+
+            encodings: List[str] = []
+            if os.path.splitext(logical)[1].lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+                for encoding, suffix in ENCODINGS:
+                    compressed = _compress(data, encoding)
+                    if compressed is not None and len(compressed) < len(data):
+                        with open(target + suffix, "wb") as f:
+                            f.write(compressed)
+                        encodings.append(encoding)
+            assets[logical] = {"path": hashed, "size": len(data), "encodings": encodings}
+
+    # Drop fingerprinted files from earlier builds that are no longer referenced
+    new_outputs = set()
+    for entry in assets.values():
+        new_outputs.add(entry["path"])
+        new_outputs.update(entry["path"] + suffix for name, suffix in ENCODINGS if name in entry["encodings"])
+    for stale in old_outputs - new_outputs:
+        try:
+            os.remove(os.path.join(out_dir, stale))
+        except FileNotFoundError:
+            pass
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "assets": assets}, f, indent=2, sort_keys=True)
+    if brotli is None:
+        logger.warning("brotli is not installed; built only gzip variants of the static assets")
+    logger.info("Built %s static assets into %s (brotli %s)", len(assets), out_dir, "on" if brotli else "off")
+    return assets
+
+
+def load_manifest(directory: str) -> Dict[str, dict]:
+    """Return the asset entries of the manifest in directory ({} if there is none)."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("assets", {})
+    except FileNotFoundError:
+        return {}
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}."""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def _media_type(path: str) -> str:
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return media_type + "; charset=utf-8" if media_type.startswith("text/") else media_type
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves build-time compressed variants of fingerprinted assets.
+
+    Fingerprinted names (from the manifest) get immutable cache headers since
+    their content can never change; every other file must be revalidated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._manifest: Optional[Dict[str, dict]] = None
+        self._fingerprinted: Dict[str, dict] = {}
+
+    def _load_manifest(self) -> None:
+        # Read on first use so it costs nothing at import time
+        if self._manifest is None:
+            self._manifest = load_manifest(self.directory) if self.directory else {}
+            self._fingerprinted = {entry["path"]: entry for entry in self._manifest.values()}
+
+    @property
+    def manifest(self) -> Dict[str, dict]:
+        self._load_manifest()
+        return self._manifest
+
+    def asset_path(self, path: str) -> str:
+        """Fingerprinted name for a logical asset path (unchanged if it was not built)."""
+        entry = self.manifest.get(path.lstrip("/"))
+        return entry["path"] if entry else path
+
+    def _choose_encoding(self, scope: Scope, entry: dict) -> Optional[Tuple[str, str]]:
+        if not entry["encodings"]:
+            return None
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        best, best_q = None, 0.0
+        for encoding, suffix in ENCODINGS:
+            if encoding in entry["encodings"]:
+                q = accepted.get(encoding, accepted.get("*", 0.0))
+                if q > best_q:
+                    best, best_q = (encoding, suffix), q
+        return best
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        self._load_manifest()
+        entry = self._fingerprinted.get(path.replace(os.sep, "/"))
+        if entry is None:
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("cache-control", REVALIDATE_CACHE_CONTROL)
+            return response
+
+        chosen = self._choose_encoding(scope, entry)
+        response = await super().get_response(path + chosen[1] if chosen else path, scope)
+        if chosen and response.status_code in (200, 304):
+            response.headers["content-encoding"] = chosen[0]
+            if "content-type" in response.headers:
+                # FileResponse guessed the type from the variant's name
+                response.headers["content-type"] = _media_type(path)
+        if entry["encodings"]:
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress static assets")
+    parser.add_argument("--src", default=os.path.join(base_dir, "static"))
+    parser.add_argument("--out", default=os.path.join(base_dir, "app", "static"))
+    args = parser.parse_args()
+    start_logging()
+    assets = build_assets(args.src, args.out)
+    for logical, entry in sorted(assets.items()):
+        print(f"{logical} -> {entry['path']} ({entry['size']} bytes; {', '.join(entry['encodings']) or 'uncompressed'})")
+
+
+if __name__ == "__main__":
+    # Run as app.core.static_assets, not __main__, so records reach the "app" logger and its handlers
+    from app.core.static_assets import main
+
+    main()
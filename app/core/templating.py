@@ -0,0 +1,176 @@
+"""
+Shared Jinja2 template environment and a rendered-page cache.
+
+Every part of the app renders through get_templates(), so templates are
+compiled once per process and their bytecode is kept in a persistent
+FileSystemBytecodeCache across restarts.
+
+PageCache is for pages whose output depends only on deploy-time data (the
+template files and a fixed context). It keeps the rendered bytes with a
+strong ETag and answers matching If-None-Match requests with 304. An entry
+is re-rendered as soon as the page's template, or any template it extends or
+includes, changes on disk.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Set
+
+from cachetools import LRUCache
+
+from .config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PROJECT_DIR = os.path.dirname(_APP_DIR)
+
+# Template globals registered before the environment exists (e.g. asset_path)
+_template_globals: Dict[str, Any] = {}
+
+
+def first_non_empty_dir(*candidates: str) -> Optional[str]:
+    """Return the first candidate directory that has at least one entry."""
+    for path in candidates:
+        if os.path.isdir(path):
+            # Stops at the first entry instead of listing the whole directory
+            with os.scandir(path) as entries:
+                if next(entries, None) is not None:
+                    return path
+    return None
+
+
+def add_template_global(name: str, value: Any) -> None:
+    """Make value available to every template, whether or not the environment exists yet."""
+    _template_globals[name] = value
+    if get_templates.cache_info().currsize:
+        templates = get_templates()
+        if templates is not None:
+            templates.env.globals[name] = value
+
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """Jinja2 templates (app/templates, then the project root), created on first use."""
+    candidates = (os.path.join(_APP_DIR, 'templates'), os.path.join(_PROJECT_DIR, 'templates'))
+    templates_dir = first_non_empty_dir(*candidates)
+    if not templates_dir:
+        logger.warning("No templates found in %s or %s", *candidates)
+        return None
+
+    import jinja2
+    from fastapi.templating import Jinja2Templates
+
+    cache_dir = settings.TEMPLATE_BYTECODE_CACHE_DIR or None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(templates_dir),
+        autoescape=jinja2.select_autoescape(),
+        # Compiled templates survive restarts; auto_reload recompiles when a file changes
+        bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir),
+        auto_reload=True,
+    )
+    env.globals.update(_template_globals)
+    env.globals.setdefault("asset_path", lambda path: path)
+    logger.info("Using templates directory at %s", templates_dir)
+    return Jinja2Templates(env=env)
+
+
+class RenderedPage(NamedTuple):
+    body: bytes
+    etag: str
+    checked_at: float
+    uptodate: List[Callable[[], bool]]  # From the loader, one per template file used
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    # If-None-Match uses the weak comparison
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class PageCache:
+    """Caches fully rendered pages and serves them with strong ETags."""
+
+    def __init__(self, maxsize: int = 64, check_interval: float = 1.0):
+        self._pages: "LRUCache[tuple, RenderedPage]" = LRUCache(maxsize=maxsize)
+        self.check_interval = check_interval
+        self.hits = 0
+        self.renders = 0
+
+    @staticmethod
+    def _template_files(env, name: str, seen: Optional[Set[str]] = None) -> List[Callable[[], bool]]:
+        """Up-to-date checks for a template and everything it extends, includes or imports."""
+        from jinja2 import meta
+
+        seen = seen if seen is not None else set()
+        if name in seen:
+            return []
+        seen.add(name)
+        source, _, uptodate = env.loader.get_source(env, name)
+        checks = [uptodate] if uptodate is not None else []
+        for child in meta.find_referenced_templates(env.parse(source)):
+            if child is not None:  # None means a dynamic name we cannot follow
+                checks.extend(PageCache._template_files(env, child, seen))
+        return checks
+
+    def render(self, request, name: str, context: Optional[Mapping[str, Any]] = None) -> RenderedPage:
+        """Return the cached rendering of a template, rendering it if missing or stale.
+
+        `context` must be JSON-serializable and must not vary per user; the
+        request is only used for url_for, so its base URL is part of the key.
+        """
+        context = dict(context or {})
+        key = (name, str(request.base_url), json.dumps(context, sort_keys=True, default=str))
+        page = self._pages.get(key)
+        if page is not None:
+            # Stat the template files at most once per check_interval
+            now = time.monotonic()
+            fresh = now - page.checked_at < self.check_interval
+            if not fresh and all(check() for check in page.uptodate):
+                fresh = True
+                page = self._pages[key] = page._replace(checked_at=now)
+            if fresh:
+                self.hits += 1
+                return page
+
+        templates = get_templates()
+        body = templates.get_template(name).render({"request": request, **context}).encode("utf-8")
+        page = RenderedPage(
+            body=body,
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            checked_at=time.monotonic(),
+            uptodate=self._template_files(templates.env, name),
+        )
+        self._pages[key] = page
+        self.renders += 1
+        return page
+
+    def response(self, request, name: str, context: Optional[Mapping[str, Any]] = None):
+        """HTMLResponse for a cached page, or 304 Not Modified if the client has it."""
+        from fastapi.responses import HTMLResponse, Response
+
+        page = self.render(request, name, context)
+        headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, page.etag):
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(content=page.body, headers=headers)
+
+    def clear(self) -> None:
+        self._pages.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"pages": len(self._pages), "hits": self.hits, "renders": self.renders}
+
+
+# Shared by every route that serves deploy-time pages
+page_cache = PageCache(maxsize=settings.PAGE_CACHE_MAXSIZE, check_interval=settings.TEMPLATE_CHECK_INTERVAL)
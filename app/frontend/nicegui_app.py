@@ -1,77 +1,195 @@
-from nicegui import ui, app
-import logging
+"""
+NiceGUI health chat page (FRAMEWORK=nicegui).
+
+The page runs in the same process and on the same event loop as the shared
+HealthChatService, and calls it directly: a message costs no loopback HTTP
+request, JSON encoding or request validation. Messages still pass admission
+control, keyed by the browser's address like the API routes.
+
+Each browser tab gets a ChatSession holding its conversation id and the
+answer in progress. Only the last NICEGUI_MAX_MESSAGES chat bubbles stay on
+the page; older ones are removed, and the full history stays in the
+conversation store. A session is dropped, and its answer cancelled, when
+NiceGUI deletes the client, NICEGUI_RECONNECT_TIMEOUT seconds after the
+browser disconnected. Streamed answers are pushed to the browser at most
+once per NICEGUI_STREAM_FLUSH_INTERVAL rather than once per chunk.
+"""
+
 import asyncio
+import logging
+from contextlib import aclosing, asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import FastAPI
+from nicegui import Client, ui
+
+from app.core.admission import Overloaded, RateLimited, admission
+from app.core.config import settings
+from app.core.logging_config import start_logging, stop_logging
+from app.models.ai_models import HealthChatRequest, HealthTopic
+from app.services.ai_services import HealthChatService
+from app.services.service_registry import service_registry
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
-# Initialize counter for demo
-count = 0
-
-# Define the main page
-@ui.page('/')
-def main_page():
-    """Main page of the NiceGUI application."""
-    with ui.card().classes('w-full max-w-3xl mx-auto'):
-        ui.label('NiceGUI Application').classes('text-2xl font-bold')
-        ui.markdown('''
-        Welcome to the NiceGUI application! NiceGUI allows you to create web UIs with Python.
-        
-        Features:
-        - Build UIs with pure Python
-        - Real-time updates
-        - Easy integration with FastAPI
-        - Interactive components
-        ''')
-        
-        # Counter demo
-        with ui.row().classes('items-center'):
-            ui.label('Counter:').classes('mr-2')
-            label = ui.label(str(count)).classes('text-lg font-bold')
-            
-            def increment():
-                global count
-                count += 1
-                label.text = str(count)
-                logger.info(f"Counter incremented to {count}")
-            
-            def decrement():
-                global count
-                count -= 1
-                label.text = str(count)
-                logger.info(f"Counter decremented to {count}")
-            
-            ui.button('Decrement', on_click=decrement).props('color=red')
-            ui.button('Increment', on_click=increment).props('color=green')
-        
-        # Add a chart for demonstration
-        with ui.card().classes('w-full mt-4'):
-            ui.label('Sample Chart').classes('text-xl')
-            chart = ui.chart({
-                'title': {'text': 'Sample Data'},
-                'xAxis': {'categories': ['Jan', 'Feb', 'Mar', 'Apr', 'May']},
-                'series': [{
-                    'name': 'Data Series 1',
-                    'data': [29, 71, 106, 129, 144]
-                }, {
-                    'name': 'Data Series 2',
-                    'data': [80, 120, 105, 110, 95]
-                }]
-            }).classes('h-64')
-
-# API endpoints can be added with FastAPI
-@app.get('/api/health')
+ASSISTANT_NAME = "Health assistant"
+SENTENCE_ENDINGS = (".", "!", "?")
+
+
+class ChatSession:
+    """UI state of one browser tab."""
+
+    __slots__ = ("client_key", "conversation_id", "task")
+
+    def __init__(self, client_key: str):
+        self.client_key = client_key
+        self.conversation_id: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None  # The answer being generated, if any
+
+    def cancel(self) -> None:
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+# Client id -> session of every connected (or reconnecting) tab
+_sessions: Dict[str, ChatSession] = {}
+
+
+def _drop_session(client_id: str) -> None:
+    session = _sessions.pop(client_id, None)
+    if session is not None:
+        session.cancel()
+
+
+def _join(text: str, piece: str) -> str:
+    # Keyword and cached answers stream one sentence per chunk, without the space between them
+    if text.endswith(SENTENCE_ENDINGS) and piece and not piece[0].isspace():
+        return f"{text} {piece}"
+    return text + piece
+
+
+def _trim(container: ui.element) -> None:
+    """Remove the oldest chat bubbles beyond NICEGUI_MAX_MESSAGES."""
+    excess = len(container.default_slot.children) - settings.NICEGUI_MAX_MESSAGES
+    for _ in range(max(0, excess)):
+        container.remove(0)
+
+
+async def _stream_answer(service: HealthChatService, request: HealthChatRequest, topic: Optional[HealthTopic], session: ChatSession, bubble: ui.chat_message, body: ui.label) -> None:
+    loop = asyncio.get_running_loop()
+    text = ""
+    shown = ""
+    flushed_at = loop.time()
+    async with aclosing(service.stream_response(request, topic)) as events:
+        async for event, data in events:
+            if event == "metadata":
+                session.conversation_id = data["conversation_id"]
+                bubble.props(f'stamp="{data["topic"]}"')
+            elif event == "chunk":
+                text = _join(text, data["text"])
+                # One UI update per interval, however many chunks arrived meanwhile
+                if loop.time() - flushed_at >= settings.NICEGUI_STREAM_FLUSH_INTERVAL:
+                    body.text = shown = text
+                    flushed_at = loop.time()
+    if text != shown:
+        body.text = text
+
+
+async def _answer(session: ChatSession, message: str, stream: bool, container: ui.element) -> None:
+    with container:
+        ui.chat_message(message, name="You", sent=True)
+        with ui.chat_message(name=ASSISTANT_NAME) as bubble:
+            body = ui.label("…")
+    _trim(container)
+
+    request = HealthChatRequest(message=message, conversation_id=session.conversation_id)
+    try:
+        await service_registry.wait_ready()
+        service = await service_registry.get()
+        async with admission.admit(session.client_key, message) as topic:
+            if stream:
+                await _stream_answer(service, request, topic, session, bubble, body)
+            else:
+                response = await service.generate_response(request, topic)
+                session.conversation_id = response.conversation_id
+                bubble.props(f'stamp="{response.topic.value}"')
+                body.text = response.response
+    except Overloaded as e:
+        body.text = "Too many messages, please wait a moment." if isinstance(e, RateLimited) else "The service is busy, please try again shortly."
+        ui.notify(f"{e} (retry in {e.retry_after:.0f} s)", type="warning")
+    except Exception as e:
+        logger.error("Error in NiceGUI health chat: %s", e)
+        body.text = "Sorry, something went wrong while answering."
+        ui.notify(str(e), type="negative")
+
+
+@ui.page("/")
+async def chat_page(client: Client):
+    """Health chat page."""
+    session = ChatSession(admission.client_key(client.request))
+    # Registered once the browser connects; pages that never connect are pruned by NiceGUI
+    client.on_connect(lambda: _sessions.setdefault(client.id, session))
+    client.on_delete(lambda: _drop_session(client.id))
+
+    with ui.column().classes("w-full max-w-3xl mx-auto h-screen p-4 no-wrap"):
+        ui.label(settings.APP_NAME).classes("text-2xl font-bold")
+        with ui.scroll_area().classes("w-full grow border rounded") as scroll:
+            container = ui.column().classes("w-full")
+        with ui.row().classes("w-full items-center no-wrap"):
+            entry = ui.input(placeholder="Ask a health question").classes("grow").props("autofocus")
+            stream = ui.switch("Stream", value=True)
+            send_button = ui.button("Send")
+
+    async def send() -> None:
+        message = (entry.value or "").strip()
+        if not message or session.task is not None:
+            return
+        entry.value = ""
+        send_button.disable()
+        session.task = asyncio.current_task()
+        try:
+            await _answer(session, message, stream.value, container)
+        finally:
+            session.task = None
+            if not client.is_deleted:
+                send_button.enable()
+                scroll.scroll_to(percent=1.0)
+
+    entry.on("keydown.enter", send)
+    send_button.on_click(send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mounted next to the API (FRAMEWORK=composite), the API's lifespan already runs the services
+    owns_services = not service_registry.started
+    if owns_services:
+        start_logging()
+        service_registry.start_in_background(settings.HEALTH_CHAT_MODELS)
+    try:
+        yield
+    finally:
+        for client_id in list(_sessions):
+            _drop_session(client_id)
+        if owns_services:
+            await service_registry.shutdown()
+            stop_logging()
+
+
+# FastAPI host for the NiceGUI pages; main.py serves it with FRAMEWORK=nicegui
+app = FastAPI(title=f"{settings.APP_NAME} (NiceGUI)", lifespan=lifespan)
+
+
+@app.get("/api/health")
 def health_check():
     """Health check endpoint."""
-    return {'status': 'ok'}
+    return {"status": "ok", "sessions": len(_sessions)}
 
-# Configure app
-app.title = 'NiceGUI Application'
 
-# This is needed for the main.py integration
-if __name__ == '__main__':
-    ui.run()
\ No newline at end of file
+ui.run_with(
+    app,
+    title=settings.APP_NAME,
+    reconnect_timeout=settings.NICEGUI_RECONNECT_TIMEOUT,
+    show_welcome_message=False,
+)
@@ -16,12 +16,12 @@ class State(rx.State):
     def increment(self):
         """Increment the count."""
         self.count += 1
-        logger.info(f"Count incremented to {self.count}")
+        logger.info("Count incremented to %s", self.count)
 
     def decrement(self):
         """Decrement the count."""
         self.count -= 1
-        logger.info(f"Count decremented to {self.count}")
+        logger.info("Count decremented to %s", self.count)
 
 # Define the UI
 def index():
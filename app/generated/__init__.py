@@ -1,14 +1,24 @@
-from fastapi import APIRouter
+"""
+Generated feature modules.
 
-router = APIRouter()
+Every module (or package) in this directory that defines an APIRouter named
+`router` is served under /generated/<module name>/, e.g.
+
+    # app/generated/simple_calculator.py
+    from fastapi import APIRouter
+
+    router = APIRouter()
 
-# Import generated routes/modules here to register them with the router
-# Example:
-# from . import your_feature_module
+    @router.get("/add")  # -> /generated/simple_calculator/add
+    async def add_numbers(a: float, b: float): ...
 
-# Include routers from feature modules
-# Example:
-# router.include_router(your_feature_module.router, tags=["your-feature"])
+Do not import feature modules here: they are found without being imported
+and loaded on first use, and re-imported when they change on disk (see
+app/core/generated_features.py).
+"""
 
-# Routes defined in submodules will be automatically associated with this router
-# if they use the '@router' decorator.
\ No newline at end of file
+from fastapi import APIRouter
+
+# Routes that must be registered at startup (e.g. to appear in the OpenAPI
+# docs) can still be added to this router; they are served under /generated.
+router = APIRouter()
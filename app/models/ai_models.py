@@ -1,9 +1,10 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from enum import Enum
 import uuid
 
-class HealthTopic(str):
+class HealthTopic(str, Enum):
     GENERAL = "general"
     NUTRITION = "nutrition"
     FITNESS = "fitness"
@@ -34,4 +35,25 @@ class HealthChatResponse(BaseModel):
     response: str
     conversation_id: str
     topic: HealthTopic
-    additional_info: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    additional_info: Optional[Dict[str, Any]] = None
+
+class HealthChatBatchRequest(BaseModel):
+    """Request model for answering many health chat messages at once."""
+    requests: List[HealthChatRequest] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(None, ge=1)
+
+class HealthChatBatchItem(BaseModel):
+    """Outcome of one request in a batch; exactly one of response or error is set."""
+    index: int
+    response: Optional[HealthChatResponse] = None
+    error: Optional[str] = None
+
+class HealthChatBatchResponse(BaseModel):
+    """Batch results in the same order as the submitted requests."""
+    results: List[HealthChatBatchItem]
+
+class HealthConversationPage(BaseModel):
+    """A page of conversation history, oldest message first."""
+    conversation_id: str
+    messages: List[HealthMessage]
+    next_before: Optional[int] = None  # Pass as `before` to fetch the next older page
\ No newline at end of file
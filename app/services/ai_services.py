@@ -1,62 +1,366 @@
 import logging
-from typing import List, Dict, Any, Optional
+import re
+import uuid
+from typing import TYPE_CHECKING, List, Dict, Any, AsyncIterator, Optional, Sequence, Tuple, Union
+from app.core.config import settings
+from app.core.metrics import metrics
 from app.models.ai_models import (
-    HealthMessage, HealthConversation, HealthChatRequest, HealthChatResponse, HealthTopic
+    HealthChatRequest, HealthChatResponse, HealthTopic
 )
+from app.services.context_builder import ContextBuilder, PromptContext
+from app.services.conversation_store import ConversationStore
+from app.services.llm_backend import ChatMessages, CircuitOpenError, LLMBackend
+from app.services.response_cache import ResponseCache, normalize_message
+from app.services.topic_classifier import TopicClassifier, get_topic_classifier
 import asyncio
 
+if TYPE_CHECKING:
+    # numpy and scipy are only needed once an index is loaded
+    from app.services.knowledge_base import KnowledgeBaseIndex
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Canned answers per topic, used until a specialized health LLM is wired in
+TOPIC_RESPONSES: Dict[HealthTopic, Dict[str, Any]] = {
+    HealthTopic.GENERAL: {
+        "response": "I'm sorry, I don't have specific information about that. Please consult a healthcare professional for personalized advice.",
+        "additional_info": {},
+    },
+    HealthTopic.NUTRITION: {
+        "response": "A balanced diet is crucial for good health. Make sure to include a variety of fruits, vegetables, whole grains, lean proteins, and healthy fats in your meals.",
+        "additional_info": {"recommended_daily_calories": 2000, "important_nutrients": ["Vitamin C", "Calcium", "Iron"]},
+    },
+    HealthTopic.FITNESS: {
+        "response": "Regular exercise is important for maintaining good health. Aim for at least 150 minutes of moderate aerobic activity or 75 minutes of vigorous aerobic activity per week, along with strength training exercises.",
+        "additional_info": {"exercise_types": ["cardio", "strength training", "flexibility"], "benefits": ["improved cardiovascular health", "stronger muscles and bones", "better mental health"]},
+    },
+    HealthTopic.MENTAL_HEALTH: {
+        "response": "Mental health is just as important as physical health. If you're feeling stressed or anxious, try relaxation techniques like deep breathing, meditation, or talking to a trusted friend. Don't hesitate to seek professional help if needed.",
+        "additional_info": {"coping_strategies": ["mindfulness", "regular exercise", "adequate sleep"], "resources": ["National Mental Health Hotline: 1-800-273-TALK"]},
+    },
+    HealthTopic.FIRST_AID: {
+        "response": "For any medical emergency, call your local emergency number immediately. For minor injuries, always keep a well-stocked first aid kit at home and know basic first aid procedures.",
+        "additional_info": {"emergency_number": "911", "first_aid_kit_essentials": ["bandages", "antiseptic wipes", "pain relievers"]},
+    },
+}
+
+# System prompt sent to the model backend, when one is configured
+SYSTEM_PROMPT = (
+    "You are a careful health information assistant. Give short, general, evidence-based guidance "
+    "and recommend consulting a healthcare professional for personal medical decisions."
+)
+
+# Sentence boundaries used to chunk answers for streaming
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
 class HealthChatService:
     """Service for health-related chatbot interactions."""
     
-    def __init__(self, model_name: str, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: str,
+        api_key: Optional[str] = None,
+        classifier: Optional[TopicClassifier] = None,
+        cache: Optional[ResponseCache] = None,
+        conversations: Optional[ConversationStore] = None,
+        backend: Optional[LLMBackend] = None,
+        knowledge_base: Optional["KnowledgeBaseIndex"] = None,
+        context: Optional[ContextBuilder] = None,
+    ):
         self.model_name = model_name
         self.api_key = api_key
-        logger.info(f"Initialized Health Chat service with model: {model_name}")
-        
-    async def generate_response(self, request: HealthChatRequest) -> HealthChatResponse:
-        """Generate a health-related response based on user input."""
+        self.classifier = classifier or get_topic_classifier()
+        self.cache = cache
+        self.conversations = conversations
+        self.backend = backend
+        self.knowledge_base = knowledge_base
+        self.context = context
+        logger.info("Initialized Health Chat service with model: %s", model_name)
+
+    async def warm_up(self) -> None:
+        """Exercise the request path once so the first real request pays no setup cost."""
+        self.classifier.classify("warm up nutrition fitness stress first aid")
+        # Touches the memory-mapped index pages so the first query does not fault them in
+        self._retrieve(["warm up nutrition fitness stress first aid"])
+
+    async def aclose(self) -> None:
+        """Release resources held by the service."""
+        if self.backend is not None:
+            await self.backend.aclose()
+
+    def reload_rules(self, classifier: TopicClassifier) -> None:
+        """Swap in new topic rules; cached answers built from the old rules are dropped."""
+        self.classifier = classifier
+        if self.cache is not None:
+            self.cache.invalidate("topic rules changed")
+
+    def reload_knowledge_base(self, knowledge_base: Optional["KnowledgeBaseIndex"]) -> None:
+        """Swap in a rebuilt knowledge base index; cached answers are dropped."""
+        self.knowledge_base = knowledge_base
+        if self.cache is not None:
+            self.cache.invalidate("knowledge base changed")
+
+    def _retrieve(self, messages: Sequence[str]) -> List[List[Dict[str, Any]]]:
+        """Top knowledge base passages for each message, scored in one batched query."""
+        if self.knowledge_base is None:
+            return [[] for _ in messages]
+        hits = self.knowledge_base.search(
+            messages, k=settings.KNOWLEDGE_BASE_TOP_K, min_score=settings.KNOWLEDGE_BASE_MIN_SCORE
+        )
+        return [[{"title": h["title"], "text": h["text"], "score": h["score"]} for h in row] for row in hits]
+
+    @staticmethod
+    def _additional_info(topic: HealthTopic, passages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        additional_info = dict(TOPIC_RESPONSES[topic]["additional_info"])
+        if passages:
+            additional_info["related_passages"] = passages
+        return additional_info
+
+    async def answer(
+        self,
+        message: str,
+        passages: Optional[List[Dict[str, Any]]] = None,
+        topic: Optional[HealthTopic] = None,
+    ) -> HealthChatResponse:
+        """Answer a message without binding it to a conversation.
+
+        `passages` lets callers that already retrieved knowledge base passages
+        (e.g. for a whole batch at once) skip the per-message lookup, and
+        `topic` callers that already classified the message. The result is
+        shared with the response cache and must be treated as read-only; use
+        generate_response() to get a per-request copy.
+        """
+        if self.cache is None:
+            response, _ = await self._generate(message, passages, topic=topic)
+            return response
+
+        key = self.cache.make_key(self.model_name, message)
+        response = await self.cache.get(key)
+        if response is None:
+            response, cacheable = await self._generate(message, passages, topic=topic)
+            if cacheable:
+                self.cache.set(key, response)
+        return response
+
+    async def _history(self, request: HealthChatRequest) -> Optional[PromptContext]:
+        """Earlier turns of the request's conversation, when they will be sent to the model."""
+        if self.context is None or self.backend is None or request.conversation_id is None:
+            return None
         try:
-            # In a real implementation, you would use a specialized health LLM or knowledge base
-            # For this example, we'll use a simple keyword-based system
-            
-            message = request.message.lower()
-            topic = HealthTopic.GENERAL
-            response = "I'm sorry, I don't have specific information about that. Please consult a healthcare professional for personalized advice."
-            additional_info = {}
-            
-            if "nutrition" in message or "diet" in message or "food" in message:
-                topic = HealthTopic.NUTRITION
-                response = "A balanced diet is crucial for good health. Make sure to include a variety of fruits, vegetables, whole grains, lean proteins, and healthy fats in your meals."
-                additional_info = {"recommended_daily_calories": 2000, "important_nutrients": ["Vitamin C", "Calcium", "Iron"]}
-            
-            elif "exercise" in message or "workout" in message or "fitness" in message:
-                topic = HealthTopic.FITNESS
-                response = "Regular exercise is important for maintaining good health. Aim for at least 150 minutes of moderate aerobic activity or 75 minutes of vigorous aerobic activity per week, along with strength training exercises."
-                additional_info = {"exercise_types": ["cardio", "strength training", "flexibility"], "benefits": ["improved cardiovascular health", "stronger muscles and bones", "better mental health"]}
-            
-            elif "mental health" in message or "stress" in message or "anxiety" in message:
-                topic = HealthTopic.MENTAL_HEALTH
-                response = "Mental health is just as important as physical health. If you're feeling stressed or anxious, try relaxation techniques like deep breathing, meditation, or talking to a trusted friend. Don't hesitate to seek professional help if needed."
-                additional_info = {"coping_strategies": ["mindfulness", "regular exercise", "adequate sleep"], "resources": ["National Mental Health Hotline: 1-800-273-TALK"]}
-            
-            elif "first aid" in message or "emergency" in message:
-                topic = HealthTopic.FIRST_AID
-                response = "For any medical emergency, call your local emergency number immediately. For minor injuries, always keep a well-stocked first aid kit at home and know basic first aid procedures."
-                additional_info = {"emergency_number": "911", "first_aid_kit_essentials": ["bandages", "antiseptic wipes", "pain relievers"]}
-            
-            logger.info(f"Generated health response for topic: {topic}")
-            
-            return HealthChatResponse(
-                response=response,
-                conversation_id=request.conversation_id or str(uuid.uuid4()),
-                topic=topic,
-                additional_info=additional_info
-            )
+            history = await self.context.build(request.conversation_id)
+        except Exception as e:
+            logger.warning("Could not load conversation history, answering without it: %s", e)
+            return None
+        return history if history.messages or history.summary else None
+
+    def _build_prompt(
+        self, message: str, topic: HealthTopic, passages: List[Dict[str, Any]], history: Optional[PromptContext] = None
+    ) -> ChatMessages:
+        system = f"{SYSTEM_PROMPT} The question was classified as: {topic.value}."
+        if passages:
+            references = "\n".join(f"- {p['title']}: {p['text']}" for p in passages)
+            system = f"{system}\nUse these reference passages where relevant:\n{references}"
+        if history is None:
+            return [
+                {"role": "system", "content": system},
+                {"role": "user", "content": message},
+            ]
+        if history.summary:
+            system = f"{system}\n{history.summary}"
+        return [
+            {"role": "system", "content": system},
+            *history.messages,
+            {"role": "user", "content": message},
+        ]
+
+    async def _generate(
+        self,
+        message: str,
+        passages: Optional[List[Dict[str, Any]]] = None,
+        history: Optional[PromptContext] = None,
+        topic: Optional[HealthTopic] = None,
+    ) -> Tuple[HealthChatResponse, bool]:
+        """Generate an answer; the flag is False for fallbacks that must not be cached."""
+        # The keyword classifier picks the topic and the knowledge base supplies related
+        # passages; the model backend, when configured, writes the answer and the canned
+        # topic answer is the fallback
+        if topic is None:
+            topic = self.classifier.classify(message).topic
+        if passages is None:
+            passages = self._retrieve([message])[0]
+        text, cacheable = TOPIC_RESPONSES[topic]["response"], True
+
+        if self.backend is not None:
+            try:
+                text = await self.backend.complete(self._build_prompt(message, topic, passages, history))
+            except CircuitOpenError:
+                # Logged once by the breaker when it opened
+                cacheable = False
+            except Exception as e:
+                logger.warning("LLM backend unavailable, using keyword answer: %s", e)
+                cacheable = False
+
+        logger.info("Generated health response for topic: %s", topic.value)
+
+        response = HealthChatResponse(
+            response=text,
+            conversation_id="",
+            topic=topic,
+            additional_info=self._additional_info(topic, passages)
+        )
+        return response, cacheable
+
+    async def generate_response(self, request: HealthChatRequest, topic: Optional[HealthTopic] = None) -> HealthChatResponse:
+        """Generate a health-related response based on user input; `topic` skips classifying it again."""
+        try:
+            history = await self._history(request)
+            if history is None:
+                response = await self.answer(request.message, topic=topic)
+            else:
+                # An answer that depends on earlier turns is not shared through the cache
+                response, _ = await self._generate(request.message, history=history, topic=topic)
+            return await self._bind_to_conversation(request, response)
         except Exception as e:
-            logger.error(f"Error generating health chat response: {str(e)}")
+            logger.error("Error generating health chat response: %s", e)
             raise
 
+    async def _bind_to_conversation(self, request: HealthChatRequest, response: HealthChatResponse) -> HealthChatResponse:
+        """Record the turn and return a per-request copy carrying the conversation id."""
+        conversation_id = request.conversation_id or str(uuid.uuid4())
+        metrics.count_topic(response.topic.value)
+        if self.conversations is not None:
+            await self.conversations.record_turn(
+                conversation_id,
+                request.message,
+                response.response,
+                response.topic,
+                is_new=request.conversation_id is None,
+            )
+        return response.model_copy(update={"conversation_id": conversation_id})
+
+    async def generate_batch(
+        self, requests: Sequence[HealthChatRequest], max_concurrency: int
+    ) -> List[Union[HealthChatResponse, Exception]]:
+        """Answer many requests with at most `max_concurrency` generations in flight.
+
+        Messages that normalize to the same text are generated once. Results
+        are returned in input order; a failed item holds its exception instead
+        of failing the whole batch.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def compute(message: str, passages: List[Dict[str, Any]]) -> HealthChatResponse:
+            async with semaphore:
+                return await self.answer(message, passages)
+
+        messages: Dict[str, str] = {}
+        keys = []
+        for request in requests:
+            key = normalize_message(request.message)
+            messages.setdefault(key, request.message)
+            keys.append(key)
+
+        # One matrix query retrieves passages for every unique message in the batch
+        try:
+            retrieved = self._retrieve(list(messages.values()))
+        except Exception as e:
+            # Passages only enrich the answers; every item is still answered without them
+            logger.error("Knowledge base lookup failed for health chat batch: %s", e)
+            retrieved = [[] for _ in messages]
+        unique: Dict[str, asyncio.Task] = {
+            key: asyncio.ensure_future(compute(message, passages))
+            for (key, message), passages in zip(messages.items(), retrieved)
+        }
+        await asyncio.gather(*unique.values(), return_exceptions=True)
+
+        results: List[Union[HealthChatResponse, Exception]] = []
+        for request, key in zip(requests, keys):
+            task = unique[key]
+            try:
+                if task.exception() is not None:
+                    raise task.exception()
+                results.append(await self._bind_to_conversation(request, task.result()))
+            except Exception as e:
+                logger.error("Error generating health chat response in batch: %s", e)
+                results.append(e)
+        logger.info("Answered health chat batch of %s requests (%s unique messages)", len(requests), len(unique))
+        return results
+
+    async def stream_response(
+        self, request: HealthChatRequest, topic: Optional[HealthTopic] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Generate a response as a sequence of (event, data) pairs; `topic` skips classifying it again.
+
+        Yields one "metadata" event with the topic and additional info, then
+        "chunk" events (model tokens, or one per sentence for cached and keyword
+        answers) and a final "done" event. Generation stops as soon as the
+        consumer stops iterating; the turn is only recorded in the conversation
+        store if the stream ran to completion.
+        """
+        conversation_id = request.conversation_id or str(uuid.uuid4())
+        history = await self._history(request)
+        cache_key = None
+        if self.cache is not None and history is None:
+            cache_key = self.cache.make_key(self.model_name, request.message)
+        response = None
+        if self.backend is None:
+            response = await self.answer(request.message, topic=topic)
+        elif cache_key is not None:
+            response = await self.cache.get(cache_key)
+
+        if response is not None:
+            topic, text = response.topic, response.response
+            yield "metadata", self._stream_metadata(conversation_id, topic, response.additional_info)
+            async for event in self._sentence_chunks(text):
+                yield event
+        else:
+            if topic is None:
+                topic = self.classifier.classify(request.message).topic
+            passages = self._retrieve([request.message])[0]
+            additional_info = self._additional_info(topic, passages)
+            yield "metadata", self._stream_metadata(conversation_id, topic, additional_info)
+
+            pieces: List[str] = []
+            try:
+                async for piece in self.backend.stream(self._build_prompt(request.message, topic, passages, history)):
+                    pieces.append(piece)
+                    yield "chunk", {"text": piece}
+                text = "".join(pieces)
+                if cache_key is not None:
+                    self.cache.set(cache_key, HealthChatResponse(
+                        response=text, conversation_id="", topic=topic, additional_info=additional_info
+                    ))
+            except Exception as e:
+                if pieces:
+                    # Part of the answer is already with the client; a fallback would garble it
+                    raise
+                if not isinstance(e, CircuitOpenError):
+                    logger.warning("LLM backend unavailable, streaming keyword answer: %s", e)
+                text = TOPIC_RESPONSES[topic]["response"]
+                async for event in self._sentence_chunks(text):
+                    yield event
+
+        metrics.count_topic(topic.value)
+        if self.conversations is not None:
+            await self.conversations.record_turn(
+                conversation_id,
+                request.message,
+                text,
+                topic,
+                is_new=request.conversation_id is None,
+            )
+        yield "done", {"conversation_id": conversation_id, "finish_reason": "stop"}
+
+    @staticmethod
+    def _stream_metadata(conversation_id: str, topic: HealthTopic, additional_info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"conversation_id": conversation_id, "topic": topic.value, "additional_info": additional_info}
+
+    @staticmethod
+    async def _sentence_chunks(text: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        for sentence in _SENTENCE_END.split(text):
+            yield "chunk", {"text": sentence}
+            # Give the event loop a chance to deliver cancellation between chunks
+            await asyncio.sleep(0)
+
 # Keep other service classes (LLMService, TextAnalysisService, etc.) as they were...
\ No newline at end of file
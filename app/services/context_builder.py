@@ -0,0 +1,214 @@
+"""
+Conversation history for model prompts within a token budget.
+
+Each conversation has a ConversationContext that follows the conversation
+store by sequence number: a turn only reads and counts the messages added
+since the previous one, so assembling a prompt costs O(new messages) rather
+than O(history). The newest turns are kept verbatim, with each message's
+token count computed once and cached next to it; when they no longer fit in
+CONTEXT_MAX_TOKENS the oldest turns are folded into a rolling summary. The
+summary is extractive (the opening words of each message, per turn) and
+updated in place: folding a turn adds one line, and the oldest lines are
+dropped once the summary exceeds CONTEXT_SUMMARY_MAX_TOKENS, leaving only
+their turn count and topics.
+
+Token counts are estimates that err on the high side, so budgets hold
+without loading a model-specific tokenizer.
+"""
+
+import logging
+import re
+from collections import Counter, OrderedDict, deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.services.conversation_store import ConversationStore, StoredMessage, conversation_store
+from app.services.llm_backend import ChatMessages
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Words split into pieces of up to 6 characters, and every punctuation mark, count as a token
+_TOKEN = re.compile(r"\w{1,6}|[^\w\s]")
+_MESSAGE_OVERHEAD = 4  # Role and framing tokens per chat message
+_FIRST_SENTENCE = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text, on the high side of common tokenizers."""
+    return len(_TOKEN.findall(text))
+
+
+def _clip(text: str, words: int) -> str:
+    """First sentence of a message, cut to at most `words` words."""
+    sentence = _FIRST_SENTENCE.split(text.strip(), 1)[0]
+    parts = sentence.split(maxsplit=words)
+    if len(parts) > words:
+        return " ".join(parts[:words]) + " …"
+    return " ".join(parts)
+
+
+class _Entry(NamedTuple):
+    """A verbatim message with its cached token count."""
+    message: StoredMessage
+    tokens: int
+
+
+class PromptContext(NamedTuple):
+    """History to put in a prompt: the summary of older turns and the newest messages."""
+    summary: str
+    messages: ChatMessages
+    tokens: int
+
+
+class RollingSummary:
+    """Extractive summary of folded turns, kept under a token budget."""
+
+    __slots__ = ("max_tokens", "line_words", "lines", "tokens", "turns", "dropped_turns", "topics", "_text")
+
+    def __init__(self, max_tokens: int, line_words: int):
+        self.max_tokens = max_tokens
+        self.line_words = line_words
+        self.lines: Deque[Tuple[str, int]] = deque()  # (line, tokens)
+        self.tokens = 0
+        self.turns = 0
+        self.dropped_turns = 0
+        self.topics: Counter = Counter()
+        self._text: Optional[str] = ""
+
+    def fold(self, turn: List[StoredMessage]) -> None:
+        """Add one turn (a user message and the replies to it)."""
+        line = "- " + "; ".join(f"{message.role}: {_clip(message.content, self.line_words)}" for message in turn)
+        tokens = estimate_tokens(line) + 1
+        self.lines.append((line, tokens))
+        self.tokens += tokens
+        self.turns += 1
+        self.topics[turn[0].topic] += 1
+        while self.tokens > self.max_tokens and self.lines:
+            _, dropped = self.lines.popleft()
+            self.tokens -= dropped
+            self.dropped_turns += 1
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        # Rendered again only after a fold; its size is bounded by max_tokens, not by the history
+        if self._text is None:
+            topics = ", ".join(topic for topic, _ in self.topics.most_common(3))
+            header = f"Summary of the {self.turns} earlier turns of this conversation (topics: {topics})"
+            if self.dropped_turns:
+                header += f"; the oldest {self.dropped_turns} are left out"
+            self._text = "\n".join([header + ":", *(line for line, _ in self.lines)])
+        return self._text
+
+
+class ConversationContext:
+    """Verbatim tail and rolling summary of one conversation, as of sequence number `next_seq`."""
+
+    __slots__ = ("next_seq", "entries", "tokens", "summary")
+
+    def __init__(self, summary_max_tokens: int, line_words: int):
+        self.next_seq = 0
+        self.entries: Deque[_Entry] = deque()
+        self.tokens = 0  # Running count of `entries`
+        self.summary = RollingSummary(summary_max_tokens, line_words)
+
+    def add(self, messages: List[StoredMessage], max_tokens: int) -> List[StoredMessage]:
+        """Append new messages and fold the oldest turns until the rest fits; returns what was folded."""
+        for message in messages:
+            if message.seq < self.next_seq:
+                continue  # Already added by a concurrent request
+            tokens = estimate_tokens(message.content) + _MESSAGE_OVERHEAD
+            self.entries.append(_Entry(message, tokens))
+            self.tokens += tokens
+            self.next_seq = message.seq + 1
+
+        folded: List[StoredMessage] = []
+        while self.entries and self.tokens + self.summary_tokens > max_tokens:
+            # A turn is a user message and everything up to the next one
+            turn = [self._pop()]
+            while self.entries and self.entries[0].message.role != "user":
+                turn.append(self._pop())
+            self.summary.fold(turn)
+            folded.extend(turn)
+        return folded
+
+    def _pop(self) -> StoredMessage:
+        entry = self.entries.popleft()
+        self.tokens -= entry.tokens
+        return entry.message
+
+    @property
+    def summary_tokens(self) -> int:
+        return self.summary.tokens + _MESSAGE_OVERHEAD if self.summary.turns else 0
+
+    def prompt(self) -> PromptContext:
+        messages = [{"role": entry.message.role, "content": entry.message.content} for entry in self.entries]
+        summary = self.summary.text if self.summary.turns else ""
+        return PromptContext(summary, messages, self.tokens + self.summary_tokens)
+
+
+class ContextBuilder:
+    """Per-conversation prompt history, updated incrementally from a ConversationStore."""
+
+    def __init__(
+        self,
+        store: ConversationStore,
+        max_tokens: int = 2000,
+        summary_max_tokens: int = 400,
+        line_words: int = 24,
+        max_conversations: int = 10000,
+    ):
+        self.store = store
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = min(summary_max_tokens, max_tokens // 2)
+        self.line_words = line_words
+        self.max_conversations = max_conversations
+        self._contexts: "OrderedDict[str, ConversationContext]" = OrderedDict()
+        self.builds = 0
+        self.rebuilds = 0
+        self.messages_added = 0
+        self.turns_folded = 0
+
+    async def build(self, conversation_id: str) -> PromptContext:
+        """History of a conversation for its next prompt."""
+        context = self._contexts.get(conversation_id)
+        if context is None:
+            # New here, or evicted: read the whole conversation once, then follow it
+            context = ConversationContext(self.summary_max_tokens, self.line_words)
+            self.rebuilds += 1
+        new = await self.store.get_since(conversation_id, context.next_seq)
+        # Another request may have created or advanced the context while we were reading
+        context = self._contexts.setdefault(conversation_id, context)
+        self._contexts.move_to_end(conversation_id)
+        while len(self._contexts) > self.max_conversations:
+            self._contexts.popitem(last=False)
+
+        before = context.next_seq
+        folded = context.add(new, self.max_tokens)
+        self.builds += 1
+        self.messages_added += max(0, context.next_seq - before)
+        self.turns_folded += sum(message.role == "user" for message in folded)
+        return context.prompt()
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime counters for monitoring the builder."""
+        return {
+            "conversations": len(self._contexts),
+            "max_conversations": self.max_conversations,
+            "max_tokens": self.max_tokens,
+            "builds": self.builds,
+            "rebuilds": self.rebuilds,
+            "messages_added": self.messages_added,
+            "turns_folded": self.turns_folded,
+        }
+
+
+# Shared by every HealthChatService in the process, like the conversation store it follows
+context_builder = ContextBuilder(
+    conversation_store,
+    max_tokens=settings.CONTEXT_MAX_TOKENS,
+    summary_max_tokens=settings.CONTEXT_SUMMARY_MAX_TOKENS,
+    line_words=settings.CONTEXT_SUMMARY_LINE_WORDS,
+    max_conversations=settings.CONTEXT_MAX_CONVERSATIONS,
+)
@@ -0,0 +1,425 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.models.ai_models import HealthMessage, HealthTopic
+from app.services.shared_state import CONVERSATION_NAMESPACE, SharedStore, shared_state
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Approximate CPython costs used for the hot-tier memory budget
+_MESSAGE_OVERHEAD = 160  # tuple, seq int and timestamp float; role/topic strings are interned
+_CONVERSATION_OVERHEAD = 800  # deque block, slots object, dict entry and key string
+
+
+class StoredMessage(NamedTuple):
+    """Compact in-memory form of a HealthMessage."""
+    seq: int
+    role: str
+    content: str
+    topic: str
+    timestamp: float
+
+    def to_model(self) -> HealthMessage:
+        return HealthMessage(
+            content=self.content,
+            role=self.role,
+            timestamp=datetime.fromtimestamp(self.timestamp),
+            topic=HealthTopic(self.topic),
+        )
+
+
+class _HotConversation:
+    """Tail of a conversation held in memory; seqs in `messages` are contiguous."""
+    __slots__ = ("messages", "next_seq", "size")
+
+    def __init__(self, max_messages: int, next_seq: int = 0):
+        self.messages: Deque[StoredMessage] = deque(maxlen=max_messages)
+        self.next_seq = next_seq
+        self.size = _CONVERSATION_OVERHEAD
+
+
+def _message_size(message: StoredMessage) -> int:
+    return _MESSAGE_OVERHEAD + sys.getsizeof(message.content)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed write may succeed if retried (a locked database, a dropped connection)."""
+    from sqlalchemy.exc import DBAPIError, OperationalError
+
+    return isinstance(error, OperationalError) or (isinstance(error, DBAPIError) and error.connection_invalidated)
+
+
+class ConversationStore:
+    """Two-tier store for health conversations.
+
+    The hot tier keeps the most recent messages of recently used conversations
+    in memory under a hard byte budget, evicting least recently used
+    conversations first. Every message is also queued for the cold tier
+    (SQLAlchemy, settings.DATABASE_URL) and written in batches by a background
+    task, so the request path never waits on disk writes.
+
+    With a SharedStore, worker processes share the recent tail of every
+    conversation: sequence numbers are allocated by the shared store, a
+    conversation missing from the hot tier is loaded from it before falling
+    back to the database, and hot conversations another worker appended to
+    are dropped and reloaded on next use.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_messages: int = 50,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        max_pending: int = 50_000,
+        shared: Optional[SharedStore] = None,
+    ):
+        self._max_bytes = max_bytes
+        self._max_messages = max_messages
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._shared = shared
+        if shared is not None:
+            shared.subscribe(CONVERSATION_NAMESPACE, self._on_shared_change)
+
+        self._hot: "OrderedDict[str, _HotConversation]" = OrderedDict()
+        self._hot_bytes = 0
+        # Oldest rows are dropped once the database falls max_pending rows behind
+        self._pending: Deque[Dict[str, Any]] = deque(maxlen=max_pending)
+        self._wakeup = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.evictions = 0
+        self.flushed = 0
+        self.dropped_writes = 0
+        self.write_errors = 0
+        self.dead_letters = 0
+
+    # --- Lifecycle ---
+    async def start(self) -> None:
+        """Create tables and start the write-behind task."""
+        # SQLAlchemy is imported here, off the event loop, rather than at application import
+        from app.core.database import init_db
+
+        await asyncio.to_thread(init_db)
+        if self._shared is not None:
+            await asyncio.to_thread(self._shared.open)
+        self._closing = False
+        self._writer = asyncio.create_task(self._write_behind())
+        logger.info("Conversation store started (hot tier limit %s bytes)", self._max_bytes)
+
+    async def stop(self) -> None:
+        """Stop the write-behind task and write everything still pending."""
+        self._closing = True
+        self._wakeup.set()
+        if self._writer is not None:
+            await self._writer
+            self._writer = None
+        await self.flush()
+        logger.info("Conversation store stopped")
+
+    # --- Writes ---
+    async def record_turn(
+        self,
+        conversation_id: str,
+        user_message: str,
+        assistant_message: str,
+        topic: HealthTopic,
+        is_new: bool = False,
+    ) -> None:
+        """Append a user message and the assistant's reply to a conversation."""
+        rows = [("user", user_message, topic.value), ("assistant", assistant_message, topic.value)]
+        await self._append_rows(conversation_id, rows, is_new)
+
+    async def append(self, conversation_id: str, role: str, content: str, topic: HealthTopic = HealthTopic.GENERAL) -> StoredMessage:
+        """Append a single message to a conversation."""
+        return (await self._append_rows(conversation_id, [(role, content, topic.value)]))[0]
+
+    async def _append_rows(
+        self, conversation_id: str, rows: List[Tuple[str, str, str]], is_new: bool = False
+    ) -> List[StoredMessage]:
+        conversation = await self._get_hot(conversation_id, is_new)
+        if self._shared is None:
+            messages = [self._append(conversation_id, conversation, *row) for row in rows]
+        else:
+            now = time.time()
+            timed_rows = [(role, content, topic, now) for role, content, topic in rows]
+            # The commit may wait on another worker's write lock, so it runs off the event loop
+            stored = await asyncio.to_thread(
+                self._shared.append_messages, conversation_id, timed_rows, self._max_messages, conversation.next_seq
+            )
+            messages = [StoredMessage(*row) for row in stored]
+            if self._hot.get(conversation_id) is conversation and conversation.next_seq == messages[0].seq:
+                for message in messages:
+                    self._add_hot(conversation, message)
+            else:
+                # Another worker appended first (or the tail was evicted meanwhile); reload on next use
+                self._drop_hot(conversation_id)
+            for message in messages:
+                self._queue_write(conversation_id, message)
+        self._enforce_budget()
+        return messages
+
+    def _append(self, conversation_id: str, conversation: _HotConversation, role: str, content: str, topic: str) -> StoredMessage:
+        message = StoredMessage(conversation.next_seq, role, content, topic, time.time())
+        self._add_hot(conversation, message)
+        self._queue_write(conversation_id, message)
+        return message
+
+    def _add_hot(self, conversation: _HotConversation, message: StoredMessage) -> None:
+        conversation.next_seq = message.seq + 1
+        messages = conversation.messages
+        if len(messages) == messages.maxlen:
+            dropped = _message_size(messages[0])
+            conversation.size -= dropped
+            self._hot_bytes -= dropped
+        messages.append(message)
+        size = _message_size(message)
+        conversation.size += size
+        self._hot_bytes += size
+
+    def _queue_write(self, conversation_id: str, message: StoredMessage) -> None:
+        if len(self._pending) == self._max_pending:
+            # The database is not keeping up; keep memory bounded rather than the backlog
+            self.dropped_writes += 1
+        self._pending.append({"conversation_id": conversation_id, **message._asdict()})
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    def _drop_hot(self, conversation_id: str) -> None:
+        conversation = self._hot.pop(conversation_id, None)
+        if conversation is not None:
+            self._hot_bytes -= conversation.size
+
+    def _on_shared_change(self, conversation_id: Optional[str]) -> None:
+        if conversation_id is None:
+            self._hot.clear()
+            self._hot_bytes = 0
+        else:
+            self._drop_hot(conversation_id)
+
+    async def _get_hot(self, conversation_id: str, is_new: bool = False) -> _HotConversation:
+        if self._shared is not None:
+            await self._shared.poll_async(force=True)  # Drops conversations other workers appended to
+        conversation = self._hot.get(conversation_id)
+        if conversation is not None:
+            self._hot.move_to_end(conversation_id)
+            return conversation
+
+        tail: List[StoredMessage] = []
+        if not is_new:
+            tail = await self._load_tail(conversation_id)
+            # Another request may have loaded it while we were waiting
+            conversation = self._hot.get(conversation_id)
+            if conversation is not None:
+                self._hot.move_to_end(conversation_id)
+                return conversation
+
+        conversation = _HotConversation(self._max_messages, next_seq=tail[-1].seq + 1 if tail else 0)
+        for message in tail:
+            conversation.messages.append(message)
+            conversation.size += _message_size(message)
+        self._hot[conversation_id] = conversation
+        self._hot_bytes += conversation.size
+        return conversation
+
+    async def _load_tail(self, conversation_id: str) -> List[StoredMessage]:
+        if self._shared is not None:
+            shared_tail = await asyncio.to_thread(self._shared.load_messages, conversation_id, self._max_messages)
+            if shared_tail:
+                return [StoredMessage(*row) for row in shared_tail]
+        # Make sure messages of a previously evicted conversation are on disk first
+        await self.flush()
+        tail = await asyncio.to_thread(self._load_page, conversation_id, self._max_messages, None)
+        if tail and self._shared is not None:
+            # Later appends from any worker continue after the last stored seq
+            await asyncio.to_thread(self._shared.seed_messages, conversation_id, tail)
+        return tail
+
+    def _enforce_budget(self) -> None:
+        # Always keep the conversation that was just used
+        while self._hot_bytes > self._max_bytes and len(self._hot) > 1:
+            _, conversation = self._hot.popitem(last=False)
+            self._hot_bytes -= conversation.size
+            self.evictions += 1
+
+    async def _write_behind(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write all pending messages to the database.
+
+        A batch that fails with a transient error (e.g. "database is locked")
+        goes back to the front of the queue for the next flush. After any
+        other error its rows are written one at a time, and rows that still
+        fail are dropped and counted in `dead_letters`, so one bad row cannot
+        hold up the rest.
+        """
+        async with self._write_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self._batch_size, len(self._pending)))]
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                    self.flushed += len(batch)
+                    continue
+                except Exception as e:
+                    self.write_errors += 1
+                    if _is_transient(e):
+                        logger.warning("Could not persist %s conversation messages, will retry: %s", len(batch), e)
+                        self._requeue(batch)
+                        break
+                    logger.error("Failed to persist %s conversation messages, writing them one by one: %s", len(batch), e)
+                retry = await self._write_rows(batch)
+                if retry:
+                    self._requeue(retry)
+                    break
+
+    async def _write_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Write rows one at a time; returns the rows that failed transiently."""
+        retry = []
+        for row in rows:
+            try:
+                await asyncio.to_thread(self._write_batch, [row])
+                self.flushed += 1
+            except Exception as e:
+                if _is_transient(e):
+                    retry.append(row)
+                    continue
+                self.dead_letters += 1
+                logger.error(
+                    "Dropped conversation message %s/%s that cannot be persisted: %s",
+                    row["conversation_id"], row["seq"], e,
+                )
+        return retry
+
+    def _requeue(self, rows: List[Dict[str, Any]]) -> None:
+        # Back in front of rows queued meanwhile; if the queue filled up, the oldest rows give way
+        room = self._max_pending - len(self._pending)
+        if len(rows) > room:
+            self.dropped_writes += len(rows) - room
+            rows = rows[len(rows) - room:] if room > 0 else []
+        self._pending.extendleft(reversed(rows))
+
+    @staticmethod
+    def _write_batch(rows: List[Dict[str, Any]]) -> None:
+        from sqlalchemy import insert
+        from app.core.database import SessionLocal
+        from app.models.db_models import HealthMessageRecord
+
+        with SessionLocal() as session:
+            session.execute(insert(HealthMessageRecord), rows)
+            session.commit()
+
+    # --- Reads ---
+    async def get_history(
+        self, conversation_id: str, limit: int = 20, before: Optional[int] = None
+    ) -> Tuple[List[StoredMessage], Optional[int]]:
+        """Return up to `limit` messages older than seq `before` (newest page by default).
+
+        The second value is the cursor for the next older page, or None when
+        the start of the conversation has been reached.
+        """
+        if self._shared is not None:
+            await self._shared.poll_async(force=True)
+        conversation = self._hot.get(conversation_id)
+        if conversation is not None and conversation.messages:
+            upper = conversation.next_seq if before is None else min(before, conversation.next_seq)
+            lower = max(0, upper - limit)
+            first = conversation.messages[0].seq
+            if lower >= first:
+                page = list(islice(conversation.messages, lower - first, upper - first))
+                return page, (lower if lower > 0 else None)
+
+        if self._shared is not None:
+            # The shared tail has other workers' messages that may not be in the database yet
+            rows = await asyncio.to_thread(self._shared.load_messages, conversation_id, limit, before)
+            if rows and (len(rows) == limit or rows[0][0] == 0):
+                page = [StoredMessage(*row) for row in rows]
+                return page, (page[0].seq if page[0].seq > 0 else None)
+
+        await self.flush()
+        page = await asyncio.to_thread(self._load_page, conversation_id, limit, before)
+        return page, (page[0].seq if page and page[0].seq > 0 else None)
+
+    async def get_since(self, conversation_id: str, seq: int) -> List[StoredMessage]:
+        """Return every message from seq `seq` on, oldest first.
+
+        For callers that keep their own position in a conversation: when the
+        conversation is hot this costs O(new messages), otherwise pages are
+        read backwards until `seq` is reached.
+        """
+        if self._shared is not None:
+            await self._shared.poll_async(force=True)
+        conversation = self._hot.get(conversation_id)
+        if conversation is not None and conversation.messages and conversation.messages[0].seq <= seq:
+            count = max(0, conversation.next_seq - seq)
+            return list(islice(reversed(conversation.messages), count))[::-1]
+
+        messages: List[StoredMessage] = []
+        before = None
+        while True:
+            page, before = await self.get_history(conversation_id, self._max_messages, before)
+            messages[:0] = [message for message in page if message.seq >= seq]
+            if before is None or before <= seq:
+                return messages
+
+    @staticmethod
+    def _load_page(conversation_id: str, limit: int, before: Optional[int]) -> List[StoredMessage]:
+        from sqlalchemy import select
+        from app.core.database import SessionLocal
+        from app.models.db_models import HealthMessageRecord
+
+        query = select(
+            HealthMessageRecord.seq,
+            HealthMessageRecord.role,
+            HealthMessageRecord.content,
+            HealthMessageRecord.topic,
+            HealthMessageRecord.timestamp,
+        ).where(HealthMessageRecord.conversation_id == conversation_id)
+        if before is not None:
+            query = query.where(HealthMessageRecord.seq < before)
+        query = query.order_by(HealthMessageRecord.seq.desc()).limit(limit)
+        with SessionLocal() as session:
+            rows = session.execute(query).all()
+        return [StoredMessage(*row) for row in reversed(rows)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime counters for monitoring the store."""
+        return {
+            "hot_conversations": len(self._hot),
+            "hot_bytes": self._hot_bytes,
+            "max_bytes": self._max_bytes,
+            "pending_writes": len(self._pending),
+            "evictions": self.evictions,
+            "flushed": self.flushed,
+            "dropped_writes": self.dropped_writes,
+            "write_errors": self.write_errors,
+            "dead_letters": self.dead_letters,
+        }
+
+
+# Shared by every HealthChatService in the process
+conversation_store = ConversationStore(
+    max_bytes=settings.CONVERSATION_HOT_MAX_BYTES,
+    max_messages=settings.CONVERSATION_HOT_MESSAGES,
+    batch_size=settings.CONVERSATION_WRITE_BATCH_SIZE,
+    flush_interval=settings.CONVERSATION_FLUSH_INTERVAL,
+    shared=shared_state,
+)
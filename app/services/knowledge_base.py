@@ -0,0 +1,244 @@
+"""
+Retrieval index over a corpus of health passages.
+
+The index is built offline with scikit-learn's TfidfVectorizer and saved as
+plain .npy arrays. At serving time the arrays are memory-mapped, so every
+worker process on the machine shares the same page-cache pages, and queries
+are scored with sparse matrix products instead of Python loops. Serving only
+needs numpy and scipy.
+
+The matrix is stored as terms x passages CSR, i.e. one row of postings per
+term, so a query only reads the rows of its own terms. The vocabulary is a
+sorted fixed-width byte-string array (terms.npy) whose positions are those
+rows; query terms are looked up with one vectorized binary search over the
+mapped array rather than through a dict that every worker would build.
+
+Build the index (also done in the Dockerfile):
+    python -m app.services.knowledge_base build [--corpus PATH] [--out DIR]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+from app.core.config import settings
+from app.core.logging_config import start_logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Must match the vectorizer settings used in build_index()
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+_NGRAM_RANGE = (1, 2)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _resolve(path: str) -> str:
+    return path if os.path.isabs(path) else os.path.join(_APP_DIR, path)
+
+
+def build_index(corpus_path: str, out_dir: str) -> int:
+    """Fit a TF-IDF index over a JSON-lines corpus and write it to out_dir."""
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        passages = [json.loads(line) for line in f if line.strip()]
+    documents = [f"{p.get('title', '')}. {p['text']}" for p in passages]
+
+    vectorizer = TfidfVectorizer(
+        lowercase=True,
+        token_pattern=_TOKEN_PATTERN.pattern,
+        stop_words="english",
+        ngram_range=_NGRAM_RANGE,
+        sublinear_tf=True,
+        dtype=np.float32,
+    )
+    matrix = vectorizer.fit_transform(documents).tocsr()
+    # Columns in byte order of the UTF-8 terms, so a term's column is its position in terms.npy
+    terms = sorted(vectorizer.vocabulary_, key=lambda term: term.encode("utf-8"))
+    columns = np.array([vectorizer.vocabulary_[term] for term in terms], dtype=np.int64)
+    postings = matrix[:, columns].T.tocsr()  # terms x passages
+    postings.sort_indices()
+    idf = vectorizer.idf_[columns]
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "data.npy"), postings.data.astype(np.float32))
+    np.save(os.path.join(out_dir, "indices.npy"), postings.indices.astype(np.int32))
+    np.save(os.path.join(out_dir, "indptr.npy"), postings.indptr.astype(np.int32))
+    np.save(os.path.join(out_dir, "idf.npy"), idf.astype(np.float32))
+    np.save(os.path.join(out_dir, "terms.npy"), np.array([term.encode("utf-8") for term in terms], dtype=np.bytes_))
+
+    # Passage texts go into one UTF-8 blob so they can be memory-mapped too
+    encoded = [p["text"].encode("utf-8") for p in passages]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    with open(os.path.join(out_dir, "texts.bin"), "wb") as f:
+        for e in encoded:
+            f.write(e)
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets)
+
+    meta = {
+        "shape": list(postings.shape),  # terms, passages
+        "stop_words": sorted(ENGLISH_STOP_WORDS),
+        "passages": [{"id": p.get("id"), "title": p.get("title"), "topic": p.get("topic")} for p in passages],
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    logger.info("Built knowledge base index: %s passages, %s terms -> %s", postings.shape[1], postings.shape[0], out_dir)
+    return postings.shape[1]
+
+
+class KnowledgeBaseIndex:
+    """Memory-mapped TF-IDF index answering batched top-k queries."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._stop_words = frozenset(meta["stop_words"])
+        self._passages: List[Dict[str, Any]] = meta["passages"]
+
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode="r")  # noqa: E731
+        self._idf = load("idf.npy")
+        self._terms = load("terms.npy")  # Sorted; position = row of the postings matrix
+        self._offsets = load("offsets.npy")
+        self._texts = np.memmap(os.path.join(index_dir, "texts.bin"), dtype=np.uint8, mode="r") \
+            if self._offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        # The CSR matrix wraps the memory-mapped arrays without copying them
+        self._postings = sparse.csr_matrix(
+            (load("data.npy"), load("indices.npy"), load("indptr.npy")), shape=tuple(meta["shape"]), copy=False
+        )
+
+    @property
+    def size(self) -> int:
+        return self._postings.shape[1]
+
+    def _query_terms(self, text: str) -> List[str]:
+        tokens = [t for t in _TOKEN_PATTERN.findall(text.lower()) if t not in self._stop_words]
+        terms = list(tokens)
+        for n in range(2, _NGRAM_RANGE[1] + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _columns(self, terms: Sequence[bytes]) -> np.ndarray:
+        """Postings row of each term, or -1 for terms not in the vocabulary."""
+        vocabulary = self._terms
+        if not terms or vocabulary.size == 0:
+            return np.full(len(terms), -1, dtype=np.int64)
+        # Longer terms cannot be in the vocabulary, and casting would truncate them into false matches
+        width = vocabulary.dtype.itemsize
+        fits = np.array([len(t) <= width for t in terms])
+        wanted = np.array([t if ok else b"" for t, ok in zip(terms, fits)], dtype=vocabulary.dtype)
+        positions = np.searchsorted(vocabulary, wanted)
+        found = fits & (positions < vocabulary.size)
+        found[found] = vocabulary[positions[found]] == wanted[found]
+        return np.where(found, positions, -1)
+
+    def _vectorize(self, queries: Sequence[str]) -> sparse.csr_matrix:
+        """Build the L2-normalized sublinear TF-IDF query matrix (one row per query)."""
+        query_terms = [Counter(self._query_terms(query)) for query in queries]
+        unique = list({term for counts in query_terms for term in counts})
+        columns = dict(zip(unique, self._columns([term.encode("utf-8") for term in unique]).tolist()))
+        rows, cols, values = [], [], []
+        for row, counts in enumerate(query_terms):
+            for term, count in counts.items():
+                col = columns[term]
+                if col >= 0:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(1.0 + math.log(count))
+        rows_arr = np.asarray(rows, dtype=np.int32)
+        cols_arr = np.asarray(cols, dtype=np.int32)
+        values_arr = np.asarray(values, dtype=np.float32) * self._idf[cols_arr]
+        # Normalized here rather than with a sparse product, whose work area has one slot per term
+        norms = np.sqrt(np.bincount(rows_arr, weights=values_arr * values_arr, minlength=len(queries)))
+        norms[norms == 0] = 1.0
+        values_arr = (values_arr / norms[rows_arr]).astype(np.float32)
+        # Rows were appended in order, so the entries are already laid out as CSR
+        indptr = np.zeros(len(queries) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum(np.bincount(rows_arr, minlength=len(queries)))
+        return sparse.csr_matrix((values_arr, cols_arr, indptr), shape=(len(queries), self._postings.shape[0]))
+
+    def passage(self, index: int) -> Dict[str, Any]:
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return {**self._passages[index], "text": bytes(self._texts[start:end]).decode("utf-8")}
+
+    def search(self, queries: Sequence[str], k: int = 3, min_score: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """Return the top-k passages for each query, best first."""
+        if not queries or self.size == 0:
+            return [[] for _ in queries]
+        # CSR times CSR: only the postings rows of the query terms are read, and nothing is converted
+        scores = (self._vectorize(queries) @ self._postings).toarray()
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for doc_ids, doc_scores in zip(top, top_scores):
+            hits = []
+            for doc_id, score in zip(doc_ids, doc_scores):
+                if score <= min_score:
+                    break
+                hits.append({**self.passage(int(doc_id)), "score": round(float(score), 4)})
+            results.append(hits)
+        return results
+
+
+def default_index_dir() -> str:
+    return _resolve(settings.KNOWLEDGE_BASE_INDEX_DIR)
+
+
+@lru_cache(maxsize=None)
+def get_knowledge_base(index_dir: Optional[str] = None) -> Optional[KnowledgeBaseIndex]:
+    """Return the process-wide index, or None if it has not been built."""
+    index_dir = index_dir or default_index_dir()
+    if not os.path.exists(os.path.join(index_dir, "terms.npy")):
+        logger.warning("Knowledge base index not found at %s; run 'python -m app.services.knowledge_base build'", index_dir)
+        return None
+    index = KnowledgeBaseIndex(index_dir)
+    logger.info("Loaded knowledge base index with %s passages from %s", index.size, index_dir)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Health knowledge base index tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the TF-IDF index from a JSON-lines corpus")
+    build.add_argument("--corpus", default=_resolve(settings.KNOWLEDGE_BASE_CORPUS_PATH))
+    build.add_argument("--out", default=default_index_dir())
+    query = subparsers.add_parser("query", help="Query a built index")
+    query.add_argument("text", nargs="+")
+    query.add_argument("-k", type=int, default=settings.KNOWLEDGE_BASE_TOP_K)
+    args = parser.parse_args()
+    start_logging()
+
+    if args.command == "build":
+        count = build_index(args.corpus, args.out)
+        print(f"Indexed {count} passages into {args.out}")
+    else:
+        index = get_knowledge_base()
+        if index is None:
+            raise SystemExit("Index not built")
+        for hit in index.search([" ".join(args.text)], k=args.k)[0]:
+            print(f"{hit['score']:.3f}  [{hit['topic']}] {hit['title']}: {hit['text']}")
+
+
+if __name__ == "__main__":
+    # Run as app.services.knowledge_base, not __main__, so records reach the "app" logger and its handlers
+    from app.services.knowledge_base import main
+
+    main()
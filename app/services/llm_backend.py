@@ -0,0 +1,252 @@
+import abc
+import asyncio
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    # httpx is imported on first use so keyword-only deployments never load it
+    import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ChatMessages = List[Dict[str, str]]
+
+
+class LLMBackendError(Exception):
+    """Raised when the model backend cannot produce an answer."""
+
+
+class CircuitOpenError(LLMBackendError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+# --- Shared connection pool ---
+_http_client: Optional["httpx.AsyncClient"] = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Return the process-wide httpx.AsyncClient, creating its connection pool on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared connection pool (called on application shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# --- Resilience helpers ---
+class CircuitBreaker:
+    """Stops calling a failing backend for `reset_timeout` seconds after repeated failures.
+
+    After the timeout a single trial call is let through (half-open); its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """Forget a trial call that ended without a verdict (e.g. it was cancelled)."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("LLM backend circuit opened after %s failures", self.failures)
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one upstream call."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so one caller being cancelled does not cancel the shared call
+        return await asyncio.shield(task)
+
+
+# --- Backends ---
+class LLMBackend(abc.ABC):
+    """Interface for model backends used by HealthChatService."""
+
+    @abc.abstractmethod
+    async def complete(self, messages: ChatMessages) -> str:
+        """Return the whole answer to a chat prompt."""
+
+    async def stream(self, messages: ChatMessages) -> AsyncIterator[str]:
+        """Yield the answer in pieces; backends without streaming yield it whole."""
+        yield await self.complete(messages)
+
+    async def aclose(self) -> None:
+        """Release backend resources; the shared connection pool is closed separately."""
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Backend speaking the OpenAI-style /chat/completions protocol over the shared pool."""
+
+    def __init__(
+        self,
+        base_url: str,
+        model_name: str,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        client: Optional["httpx.AsyncClient"] = None,
+    ):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model_name = model_name
+        self.timeout = timeout or settings.LLM_TIMEOUT
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = client
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        return self._client or get_http_client()
+
+    def _payload(self, messages: ChatMessages, stream: bool) -> Dict[str, Any]:
+        return {"model": self.model_name, "messages": messages, "stream": stream}
+
+    async def complete(self, messages: ChatMessages) -> str:
+        import httpx
+
+        try:
+            response = await self.client.post(
+                self.url, json=self._payload(messages, False), headers=self._headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            raise LLMBackendError(f"LLM backend request failed: {e!r}") from e
+
+    async def stream(self, messages: ChatMessages) -> AsyncIterator[str]:
+        import httpx
+
+        try:
+            async with self.client.stream(
+                "POST", self.url, json=self._payload(messages, True), headers=self._headers, timeout=self.timeout
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            raise LLMBackendError(f"LLM backend stream failed: {e!r}") from e
+
+
+class GuardedBackend(LLMBackend):
+    """Wraps a backend with a circuit breaker and single-flight coalescing."""
+
+    def __init__(self, backend: LLMBackend, breaker: Optional[CircuitBreaker] = None):
+        self.backend = backend
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_BREAKER_RESET_TIMEOUT,
+        )
+        self.single_flight = SingleFlight()
+
+    async def _guarded_complete(self, messages: ChatMessages) -> str:
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM backend circuit is open")
+        try:
+            result = await self.backend.complete(messages)
+        except asyncio.CancelledError:
+            # Cancelled, not failed; a half-open trial must not hold the circuit open forever
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def complete(self, messages: ChatMessages) -> str:
+        key = json.dumps(messages, sort_keys=True, separators=(",", ":"))
+        return await self.single_flight.do(key, lambda: self._guarded_complete(messages))
+
+    async def stream(self, messages: ChatMessages) -> AsyncIterator[str]:
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM backend circuit is open")
+        try:
+            async for piece in self.backend.stream(messages):
+                yield piece
+        except (asyncio.CancelledError, GeneratorExit):
+            # The consumer went away; that says nothing about backend health
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+
+def create_backend(model_name: str, api_key: Optional[str] = None) -> Optional[LLMBackend]:
+    """Build the configured backend for a model, or None when only keyword answers are used."""
+    if not settings.LLM_BACKEND_URL:
+        return None
+    backend = OpenAICompatibleBackend(settings.LLM_BACKEND_URL, model_name, api_key=api_key or settings.LLM_API_KEY)
+    return GuardedBackend(backend)
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from cachetools import TLRUCache
+
+from app.core.config import settings
+from app.models.ai_models import HealthChatResponse
+from app.services.shared_state import SharedStore, shared_state
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_SHARED_NAMESPACE = "response"
+_KEY_SEPARATOR = "\x1f"
+
+
+def normalize_message(message: str) -> str:
+    """Canonical form of a message for cache lookups: case, spacing and end punctuation ignored."""
+    return _WHITESPACE.sub(" ", message.lower()).strip(" .,!?;:")
+
+
+class _NearEntry(NamedTuple):
+    response: HealthChatResponse
+    expires: float  # time.monotonic() deadline
+
+
+class _CountingTLRUCache(TLRUCache):
+    """LRU cache of _NearEntry values, each expiring at its own deadline; counts evictions and expirations."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttu=lambda key, entry, now: entry.expires)
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+
+    def popitem(self):
+        # Only called by cachetools when the cache is full and must make room
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        if expired:
+            self.expirations += len(expired)
+        return expired
+
+
+class ResponseCache:
+    """Size-bounded LRU cache with TTL for generated health chat answers.
+
+    Entries are keyed on the model name plus the normalized message text and
+    stored without a meaningful conversation_id; callers fill that in fresh
+    for every hit.
+
+    With a SharedStore the in-process cache is a near cache in front of the
+    entries of all worker processes: misses are looked up in the shared
+    store (on a thread, off the event loop) and kept here only until the
+    shared entry expires, new answers are written to it in the background,
+    and entries that another worker changes or invalidates are dropped here.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 600.0, shared: Optional[SharedStore] = None):
+        self._cache = _CountingTLRUCache(maxsize=maxsize, ttl=ttl)
+        self._shared = shared
+        self._generation = 0  # Bumped by every invalidation, so a lookup in flight does not restore a dropped entry
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if shared is not None:
+            shared.subscribe(_SHARED_NAMESPACE, self._on_shared_change)
+
+    @staticmethod
+    def make_key(model_name: str, message: str) -> Tuple[str, str]:
+        return model_name, normalize_message(message)
+
+    def _on_shared_change(self, key: Optional[str]) -> None:
+        self._generation += 1
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(tuple(key.split(_KEY_SEPARATOR, 1)), None)
+
+    async def get(self, key: Tuple[str, str]) -> Optional[HealthChatResponse]:
+        shared = self._shared
+        if shared is not None:
+            await shared.poll_async()
+        entry = self._cache.get(key)
+        response = entry.response if entry is not None else None
+        if response is None and shared is not None:
+            generation = self._generation
+            found = await asyncio.to_thread(shared.get, _SHARED_NAMESPACE, _KEY_SEPARATOR.join(key))
+            if found is not None:
+                data, expires_at = found
+                response = HealthChatResponse.model_validate_json(data)
+                self.shared_hits += 1
+                if generation == self._generation:
+                    # Near-cached for what is left of the shared entry's lifetime, not a full TTL
+                    self._cache[key] = _NearEntry(response, time.monotonic() + expires_at - time.time())
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def set(self, key: Tuple[str, str], response: HealthChatResponse) -> None:
+        self._cache[key] = _NearEntry(response, time.monotonic() + self._cache.ttl)
+        if self._shared is not None:
+            self._shared.set_later(
+                _SHARED_NAMESPACE, _KEY_SEPARATOR.join(key), response.model_dump_json().encode(), self._cache.ttl
+            )
+
+    def invalidate(self, reason: str = "manual") -> None:
+        """Drop every cached answer, e.g. after topic rules or the knowledge base change."""
+        size = len(self._cache)
+        self._generation += 1
+        self._cache.clear()
+        if self._shared is not None:
+            # Queued behind this worker's pending cache writes, so none of them outlives the invalidation
+            self._shared.clear_later(_SHARED_NAMESPACE)
+        self.invalidations += 1
+        logger.info("Response cache invalidated (%s); dropped %s entries", reason, size)
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime counters for monitoring the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl": self._cache.ttl,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,  # Included in hits; answers computed by another worker
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self._cache.evictions,
+            "expirations": self._cache.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# Shared by every HealthChatService in the process
+response_cache = ResponseCache(
+    maxsize=settings.RESPONSE_CACHE_MAXSIZE, ttl=settings.RESPONSE_CACHE_TTL, shared=shared_state
+)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.startup_profiler import startup_profiler
+from app.services.ai_services import HealthChatService
+from app.services.context_builder import context_builder
+from app.services.conversation_store import conversation_store
+from app.services.llm_backend import close_http_client, create_backend
+from app.services.response_cache import response_cache
+from app.services.shared_state import shared_state
+from app.services.topic_classifier import TopicClassifier, get_topic_classifier
+
+if TYPE_CHECKING:
+    from app.services.knowledge_base import KnowledgeBaseIndex
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class HealthChatServiceRegistry:
+    """Application-scoped pool of HealthChatService instances keyed by model name.
+
+    Services are created and warmed once during application startup and then
+    shared by every request. `ready` stays False until warm-up has finished.
+    """
+
+    def __init__(self):
+        self._services: Dict[str, HealthChatService] = {}
+        self._create_locks: Dict[str, asyncio.Lock] = {}
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self.ready = False
+
+    @property
+    def started(self) -> bool:
+        """Whether start() has run or is running, e.g. from another application in the same process."""
+        return self.ready or self._warm_up_task is not None
+
+    @property
+    def default_model(self) -> str:
+        return settings.HEALTH_CHAT_MODELS[0]
+
+    def _create(self, model_name: str) -> HealthChatService:
+        # Imported here so numpy and scipy load during warm-up, not at application import
+        from app.services.knowledge_base import get_knowledge_base
+
+        service = HealthChatService(
+            model_name=model_name,
+            api_key=settings.LLM_API_KEY,
+            cache=response_cache if settings.RESPONSE_CACHE_ENABLED else None,
+            conversations=conversation_store if settings.CONVERSATION_STORE_ENABLED else None,
+            backend=create_backend(model_name),
+            knowledge_base=get_knowledge_base() if settings.KNOWLEDGE_BASE_ENABLED else None,
+            context=context_builder if settings.CONVERSATION_STORE_ENABLED and settings.CONTEXT_ENABLED else None,
+        )
+        self._services[model_name] = service
+        return service
+
+    async def start(self, model_names: Iterable[str]) -> None:
+        """Start shared stores, then create and warm up a service for each model name."""
+        with startup_profiler.phase("warm_up"):
+            if shared_state is not None:
+                await shared_state.start()
+            if settings.CONVERSATION_STORE_ENABLED:
+                await conversation_store.start()
+            for model_name in model_names:
+                service = self._services.get(model_name) or await self._load(model_name)
+                await service.warm_up()
+        self.ready = True
+        startup_profiler.mark("ready")
+        logger.info("Health chat service registry ready with models: %s", ', '.join(self._services))
+
+    def start_in_background(self, model_names: Iterable[str]) -> asyncio.Task:
+        """Run start() as a task so the server can accept requests (e.g. /api/ping) while warming up."""
+        async def run() -> None:
+            try:
+                await self.start(model_names)
+            except Exception as e:
+                # Requests still work, services are then created on demand; stay in the load balancer
+                logger.error("Health chat service warm-up failed, creating services on demand: %s", e)
+                self.ready = True
+
+        self._warm_up_task = asyncio.create_task(run())
+        return self._warm_up_task
+
+    async def wait_ready(self) -> None:
+        """Wait for a background warm-up to finish (returns at once if none is running)."""
+        task = self._warm_up_task
+        if task is not None and not task.done():
+            # Shield so a cancelled request does not cancel the warm-up
+            await asyncio.shield(task)
+
+    async def get(self, model_name: Optional[str] = None) -> HealthChatService:
+        """Return the shared service for a model, creating it if it was not preloaded."""
+        model_name = model_name or self.default_model
+        service = self._services.get(model_name)
+        if service is None:
+            logger.warning("Health chat model %s was not preloaded; creating it on demand", model_name)
+            service = await self._load(model_name)
+        return service
+
+    async def _load(self, model_name: str) -> HealthChatService:
+        # One creation per model; concurrent requests for it wait for that one
+        async with self._create_locks.setdefault(model_name, asyncio.Lock()):
+            service = self._services.get(model_name)
+            if service is None:
+                # Creation imports and loads indexes; keep it off the event loop
+                service = await asyncio.to_thread(self._create, model_name)
+            return service
+
+    def reload_rules(self, path: Optional[str] = None) -> TopicClassifier:
+        """Recompile the topic rules and hand them to every service."""
+        get_topic_classifier.cache_clear()
+        classifier = get_topic_classifier(path)
+        for service in self._services.values():
+            service.reload_rules(classifier)
+        if not self._services:
+            response_cache.invalidate("topic rules changed")
+        return classifier
+
+    def reload_knowledge_base(self, index_dir: Optional[str] = None) -> Optional["KnowledgeBaseIndex"]:
+        """Re-open the knowledge base index (e.g. after a rebuild) and hand it to every service."""
+        from app.services.knowledge_base import get_knowledge_base
+
+        get_knowledge_base.cache_clear()
+        knowledge_base = get_knowledge_base(index_dir)
+        for service in self._services.values():
+            service.reload_knowledge_base(knowledge_base)
+        if not self._services:
+            response_cache.invalidate("knowledge base changed")
+        return knowledge_base
+
+    async def shutdown(self) -> None:
+        """Close every service and empty the registry."""
+        self.ready = False
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            try:
+                await self._warm_up_task
+            except asyncio.CancelledError:
+                pass
+            self._warm_up_task = None
+        services, self._services = self._services, {}
+        for model_name, service in services.items():
+            try:
+                await service.aclose()
+            except Exception as e:
+                logger.error("Error closing health chat service %s: %s", model_name, e)
+        await close_http_client()
+        if settings.CONVERSATION_STORE_ENABLED:
+            await conversation_store.stop()
+        if shared_state is not None:
+            await shared_state.stop()
+        logger.info("Health chat service registry shut down")
+
+
+# Shared by the API routes and any frontend running in the same process
+service_registry = HealthChatServiceRegistry()
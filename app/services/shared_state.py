@@ -0,0 +1,368 @@
+"""
+State shared by the worker processes of one machine, in a SQLite database in WAL mode.
+
+`uvicorn --workers N` runs N processes with separate memory, so per-process
+caches warm N times and a conversation's follow-up may reach a worker that
+never saw it. SharedStore gives every worker the same view through one
+SQLite file (SHARED_STATE_PATH), with no external service:
+
+  * kv: namespaced key/value entries with an expiry time (response cache)
+  * messages: the recent tail of every conversation, with sequence numbers
+    allocated in a single transaction so workers never hand out the same one
+  * changes: a log of writes, used to invalidate the per-worker near caches
+
+Workers keep their own in-memory near caches and subscribe to a namespace.
+poll() asks SQLite whether another connection has committed since the last
+check (PRAGMA data_version, no disk read) and only then reads the change
+log and calls the subscribers with each changed key (None for "everything").
+Every call here may wait on another process's write lock or on disk, so
+code on the event loop uses poll_async() and asyncio.to_thread().
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MessageRow = Tuple[int, str, str, str, float]  # seq, role, content, topic, timestamp
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    key TEXT,
+    at REAL NOT NULL
+);
+"""
+
+CONVERSATION_NAMESPACE = "conversation"
+_CHANGE_RETENTION = 300.0  # Seconds the change log is kept; a worker idle longer drops its near caches
+_MAINTENANCE_INTERVAL = 60.0
+_BUSY_TIMEOUT_MS = 5000
+
+
+class SharedStore:
+    """Cross-process key/value store, conversation tails and change feed on one SQLite file."""
+
+    def __init__(self, path: str, poll_interval: float = 0.1, conversation_ttl: float = 86400.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.conversation_ttl = conversation_ttl
+        self._listeners: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._pid: Optional[int] = None
+        self.reads = 0
+        self.writes = 0
+        self.invalidations_received = 0
+        self._maintenance: Optional[asyncio.Task] = None
+        self._reset_after_fork()
+
+    # --- Connections (one per thread, reopened after fork) ---
+    def _reset_after_fork(self) -> None:
+        # Connections, locks and threads inherited from the parent must not be used
+        self._pid = os.getpid()
+        self._origin = uuid.uuid4().hex
+        self._local = threading.local()
+        self._poll_conn: Optional[sqlite3.Connection] = None  # data_version is per connection
+        self._poll_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._last_change = 0
+        self._data_version = None
+        self._next_poll = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable enough for caches; no fsync per commit
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def open(self) -> None:
+        """Create the database if needed and start following the change log from its current end."""
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        with self._poll_lock:
+            if self._poll_conn is None:
+                conn = self._poll_conn = self._connect()
+                self._last_change = conn.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()[0]
+                self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+                logger.info("Shared state at %s (pid %s)", self.path, os.getpid())
+
+    def close(self) -> None:
+        if self._pid == os.getpid() and self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction holding SQLite's write lock from the start."""
+        conn = self._connection()
+        # Threads of this process queue on a lock instead of in SQLite's sleeping busy handler
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.writes += 1
+
+    def _background(self, fn: Callable, *args) -> None:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+        self._writer.submit(fn, *args)
+
+    def _record_change(
+        self, conn: sqlite3.Connection, namespace: str, key: Optional[str], origin: Optional[str] = None
+    ) -> None:
+        conn.execute(
+            "INSERT INTO changes (origin, namespace, key, at) VALUES (?, ?, ?, ?)",
+            (self._origin if origin is None else origin, namespace, key, time.time()),
+        )
+
+    # --- Change feed ---
+    def subscribe(self, namespace: str, callback: Callable[[Optional[str]], None]) -> None:
+        """Call callback(key) when another process changes key in namespace (None: everything)."""
+        self._listeners.setdefault(namespace, []).append(callback)
+
+    def _notify(self, namespace: str, key: Optional[str]) -> None:
+        self.invalidations_received += 1
+        for callback in self._listeners.get(namespace, ()):
+            callback(key)
+
+    def poll(self, force: bool = False) -> None:
+        """Deliver changes committed by other processes since the last poll."""
+        for namespace, key in self._changes(force):
+            self._notify(namespace, key)
+
+    async def poll_async(self, force: bool = False) -> None:
+        """poll() for the event loop: the change log is read on a thread, subscribers are called here."""
+        if not force and time.monotonic() < self._next_poll:
+            return
+        for namespace, key in await asyncio.to_thread(self._changes, force):
+            self._notify(namespace, key)
+
+    def _changes(self, force: bool) -> List[Tuple[str, Optional[str]]]:
+        """(namespace, key) of the changes other processes committed since the last call."""
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return []
+        if self._pid != os.getpid() or self._poll_conn is None:
+            self.open()
+            return []
+        conn = self._poll_conn
+        if not self._poll_lock.acquire(blocking=False):
+            return []  # Another thread is polling right now
+        try:
+            self._next_poll = now + self.poll_interval
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
+            changes: List[Tuple[str, Optional[str]]] = []
+            oldest = conn.execute("SELECT MIN(id) FROM changes").fetchone()[0]
+            if oldest is not None and oldest > self._last_change + 1:
+                # Changes we never saw were pruned; nothing near can be trusted
+                changes.extend((namespace, None) for namespace in self._listeners)
+            rows = conn.execute(
+                "SELECT id, origin, namespace, key FROM changes WHERE id > ? ORDER BY id", (self._last_change,)
+            ).fetchall()
+            for change_id, origin, namespace, key in rows:
+                if origin != self._origin:
+                    changes.append((namespace, key))
+                self._last_change = change_id
+            return changes
+        finally:
+            self._poll_lock.release()
+
+    # --- Key/value ---
+    def get(self, namespace: str, key: str) -> Optional[Tuple[bytes, float]]:
+        """Value of an entry and its expiry time (time.time() seconds), if it has not expired."""
+        self.reads += 1
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, value, time.time() + ttl),
+            )
+            self._record_change(conn, namespace, key)
+
+    def set_later(self, namespace: str, key: str, value: bytes, ttl: float) -> None:
+        """set() on a background thread, so the caller never waits on another worker's write lock."""
+        self._background(self._set_logged, namespace, key, value, ttl)
+
+    def _set_logged(self, namespace: str, key: str, value: bytes, ttl: float) -> None:
+        try:
+            self.set(namespace, key, value, ttl)
+        except sqlite3.Error as e:
+            logger.warning("Shared state write failed: %s", e)
+
+    def clear(self, namespace: str) -> None:
+        """Delete every entry in namespace and tell the other processes."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+            self._record_change(conn, namespace, None)
+
+    def clear_later(self, namespace: str) -> None:
+        """clear() on the background thread, after the set_later() calls made before it."""
+        self._background(self._clear_logged, namespace)
+
+    def _clear_logged(self, namespace: str) -> None:
+        try:
+            self.clear(namespace)
+        except sqlite3.Error as e:
+            logger.error("Could not clear shared state namespace %s: %s", namespace, e)
+
+    # --- Conversation tails ---
+    def append_messages(
+        self, conversation_id: str, rows: Sequence[Tuple[str, str, str, float]], keep: int, next_seq: int = 0
+    ) -> List[MessageRow]:
+        """Append (role, content, topic, timestamp) rows; returns them with their sequence numbers.
+
+        Only the newest `keep` messages of the conversation are kept here;
+        the database behind ConversationStore has the full history. Sequence
+        numbers continue after the last stored message, and never start below
+        `next_seq` (the caller's own view), so a tail pruned here meanwhile
+        cannot make them start again at 0.
+        """
+        # The write lock is taken before reading the last seq, so no other writer can use it
+        with self._transaction() as conn:
+            last = conn.execute(
+                "SELECT MAX(seq) FROM messages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+            seq = max(-1 if last is None else last, next_seq - 1)
+            stored = []
+            for role, content, topic, timestamp in rows:
+                seq += 1
+                stored.append((seq, role, content, topic, timestamp))
+            conn.executemany(
+                "INSERT INTO messages (conversation_id, seq, role, content, topic, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                [(conversation_id, *row) for row in stored],
+            )
+            conn.execute("DELETE FROM messages WHERE conversation_id = ? AND seq <= ?", (conversation_id, seq - keep))
+            self._record_change(conn, CONVERSATION_NAMESPACE, conversation_id)
+        return stored
+
+    def seed_messages(self, conversation_id: str, rows: Sequence[MessageRow]) -> None:
+        """Store a conversation tail loaded from the database, unless another process already did."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO messages (conversation_id, seq, role, content, topic, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                [(conversation_id, *row) for row in rows],
+            )
+
+    def load_messages(self, conversation_id: str, limit: int, before: Optional[int] = None) -> List[MessageRow]:
+        """Up to `limit` messages older than seq `before` (newest by default), oldest first."""
+        self.reads += 1
+        rows = self._connection().execute(
+            "SELECT seq, role, content, topic, timestamp FROM messages WHERE conversation_id = ? AND seq < ? "
+            "ORDER BY seq DESC LIMIT ?",
+            (conversation_id, before if before is not None else 2**62, limit),
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    # --- Housekeeping ---
+    async def start(self) -> None:
+        """Open the store and run housekeeping every minute from this event loop, off the request path."""
+        await asyncio.to_thread(self.open)
+        if self._maintenance is None or self._maintenance.done():
+            self._maintenance = asyncio.create_task(self._maintain_periodically())
+
+    async def stop(self) -> None:
+        """Stop the housekeeping task."""
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            try:
+                await self._maintenance
+            except asyncio.CancelledError:
+                pass
+            self._maintenance = None
+
+    async def _maintain_periodically(self) -> None:
+        while True:
+            # Deletes may wait on another worker's write lock; keep them off the event loop
+            await asyncio.to_thread(self._maintain_logged)
+            await asyncio.sleep(_MAINTENANCE_INTERVAL)
+
+    def _maintain_logged(self) -> None:
+        try:
+            self._maintain()
+        except sqlite3.Error as e:
+            logger.warning("Shared state cleanup failed: %s", e)
+
+    def _maintain(self) -> None:
+        wall = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM kv WHERE expires_at <= ?", (wall,))
+            conn.execute("DELETE FROM changes WHERE at < ?", (wall - _CHANGE_RETENTION,))
+            idle = conn.execute(
+                "SELECT conversation_id FROM messages GROUP BY conversation_id HAVING MAX(timestamp) < ?",
+                (wall - self.conversation_ttl,),
+            ).fetchall()
+            conn.executemany("DELETE FROM messages WHERE conversation_id = ?", idle)
+            for (conversation_id,) in idle:
+                # Logged with no origin so every process hears of it, this one included:
+                # a worker still holding the tail must reload it from the database
+                self._record_change(conn, CONVERSATION_NAMESPACE, conversation_id, origin="")
+
+    def stats(self) -> Dict[str, int]:
+        return {"reads": self.reads, "writes": self.writes, "invalidations_received": self.invalidations_received}
+
+
+# Shared by the response cache and the conversation store of this process
+shared_state: Optional[SharedStore] = (
+    SharedStore(
+        settings.SHARED_STATE_PATH,
+        poll_interval=settings.SHARED_STATE_POLL_INTERVAL,
+        conversation_ttl=settings.SHARED_STATE_CONVERSATION_TTL,
+    )
+    if settings.SHARED_STATE_ENABLED
+    else None
+)
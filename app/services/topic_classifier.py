@@ -0,0 +1,338 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.models.ai_models import HealthTopic
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class TopicClassification(NamedTuple):
+    """Result of classifying a single message."""
+    topic: HealthTopic
+    scores: Dict[HealthTopic, float]
+    matches: Tuple[str, ...]
+
+
+def _build_trie_pattern(keywords: Iterable[str]) -> str:
+    """Build a regex alternation shaped like a trie of the given keywords.
+
+    Sharing prefixes keeps the work done at each position of the message
+    proportional to the keyword length instead of the keyword count.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # Prefer the longer keyword; fall back to the shorter one on backtrack
+            return "(?:" + body + ")?" if len(branches) > 1 or len(body) > 1 else body + "?"
+        return body
+
+    return render(trie)
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """The word and every string made by deleting up to `distance` of its characters."""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+_WORD = re.compile(r"\w+")
+
+# Common words of four letters or more; never looked up as misspelled keywords
+STOP_WORDS = frozenset("""
+    about above after again against also among another anything around away back because been before
+    being below best better between both came come could days does doing done down during each even
+    ever every feel feels felt find from gets getting give going good have having help here high into
+    just keep know last like little long look made make many more most much must need needs never
+    next only other over people really right same should since some something still such sure take
+    than that their them then there these they thing things think this those though through time
+    times today together told under until very want week weeks well were what when where which while
+    will with without work would year years your yours
+""".split())
+
+
+def _distance(keyword: str, token: str, limit: int) -> int:
+    """Optimal string alignment distance between keyword and token.
+
+    A swap of adjacent letters counts as one edit. Only the band of cells
+    within `limit` of the diagonal is computed; returns limit + 1 as soon as
+    the distance is known to be over limit.
+    """
+    over = limit + 1
+    if abs(len(token) - len(keyword)) > limit:
+        return over
+    previous2: List[int] = []
+    previous = [j if j <= limit else over for j in range(len(token) + 1)]
+    for i in range(1, len(keyword) + 1):
+        current = [i if i <= limit else over] + [over] * len(token)
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(token), i + limit) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (keyword[i - 1] != token[j - 1]))
+            if i > 1 and j > 1 and keyword[i - 1] == token[j - 2] and keyword[i - 2] == token[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value = min(value, over)
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return over
+        previous2, previous = previous, current
+    return previous[len(token)]
+
+
+class FuzzyKeywordIndex:
+    """SymSpell-style deletion index for looking up misspelled keywords.
+
+    The first PREFIX_LENGTH characters of every keyword, with up to its
+    allowed number of characters deleted, are keys of one dict. A token is
+    looked up with the deletions of its own prefix, so the cost of a lookup
+    depends on the token's length, not on the number of keywords; the few
+    candidates found are then checked with an edit distance. Like exact
+    matches, a keyword must match the whole token ("cardiologist" does not
+    find "cardio"). The first letter must be right: typos there are rare, and
+    allowing them turns real words into keywords ("dental" -> "mental").
+    """
+
+    PREFIX_LENGTH = 7
+
+    def __init__(self, keywords: Iterable[str], max_distance: int, min_length: int):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self._index: Dict[str, List[str]] = {}
+        for keyword in keywords:
+            allowed = self.allowed_distance(keyword)
+            if allowed:
+                # The first letter is kept out of the deletions: it must be right anyway
+                for key in _deletes(keyword[1:self.PREFIX_LENGTH], allowed):
+                    self._index.setdefault(keyword[0] + key, []).append(keyword)
+        # Misspellings repeat across messages, and a phrase shares its prefix with its first word
+        self.lookup = lru_cache(maxsize=4096)(self._lookup)
+        self._candidates = lru_cache(maxsize=4096)(self._candidates_for_prefix)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def allowed_distance(self, keyword: str) -> int:
+        """One typo per four letters, up to max_distance; none for keywords shorter than min_length."""
+        if len(keyword) < self.min_length:
+            return 0
+        return min(self.max_distance, len(keyword) // 4)
+
+    def _candidates_for_prefix(self, prefix: str) -> Tuple[str, ...]:
+        candidates: Set[str] = set()
+        for key in _deletes(prefix[1:], self.max_distance):
+            candidates.update(self._index.get(prefix[0] + key, ()))
+        return tuple(candidates)
+
+    def _lookup(self, token: str) -> Optional[str]:
+        """The closest keyword within its allowed distance of the token, if any.
+
+        Only keywords with as many words as the token are considered.
+        """
+        best: Optional[Tuple[int, str]] = None
+        spaces = token.count(" ")
+        for keyword in self._candidates(token[:self.PREFIX_LENGTH]):
+            if keyword.count(" ") != spaces:
+                continue
+            allowed = self.allowed_distance(keyword)
+            distance = _distance(keyword, token, allowed)
+            if distance <= allowed and (best is None or (distance, keyword) < best):
+                best = (distance, keyword)
+        return best[1] if best else None
+
+
+class TopicClassifier:
+    """Compiled keyword engine that scores every HealthTopic in one pass.
+
+    Keywords match whole words only, so "cut" does not fire on "cute" and
+    "cardio" not on "cardiologist"; inflected forms ("exercises", "injured")
+    are listed in the rules as keywords of their own. Each hit adds the keyword's weight to
+    its topic; the highest total wins and ties go to the topic listed first
+    in the rules.
+
+    With max_edit_distance > 0, words that no keyword matched exactly are
+    looked up in a FuzzyKeywordIndex, so "excercise", "nutrtion" and
+    "anxeity" count as their keywords. Stop words and words that appear in
+    the keywords are not looked up on their own, and consecutive words are
+    only looked up as a phrase when the first one (allowing for a typo) is
+    the first word of a multi-word keyword. Only the first fuzzy_max_tokens
+    words of a message are looked up, which bounds the cost of very long
+    messages; the rest still match exactly.
+    """
+
+    def __init__(
+        self,
+        rules: Mapping[HealthTopic, Mapping[str, float]],
+        min_score: float = 0.0,
+        max_edit_distance: int = 0,
+        fuzzy_min_length: int = 6,
+        fuzzy_max_tokens: int = 200,
+    ):
+        self.min_score = min_score
+        self._topic_order: Dict[HealthTopic, int] = {}
+        self._keyword_weights: Dict[str, List[Tuple[HealthTopic, float]]] = {}
+
+        for topic, keywords in rules.items():
+            topic = HealthTopic(topic)
+            self._topic_order.setdefault(topic, len(self._topic_order))
+            for keyword, weight in keywords.items():
+                keyword = " ".join(keyword.lower().split())
+                if keyword:
+                    self._keyword_weights.setdefault(keyword, []).append((topic, float(weight)))
+
+        if self._keyword_weights:
+            pattern = r"(?<!\w)(" + _build_trie_pattern(self._keyword_weights) + r")\b"
+        else:
+            pattern = r"(?!x)x"  # Matches nothing
+        self._pattern = re.compile(pattern)
+
+        self._fuzzy: Optional[FuzzyKeywordIndex] = None
+        self._fuzzy_min_token = max(1, fuzzy_min_length - max_edit_distance)
+        self._fuzzy_max_tokens = fuzzy_max_tokens
+        self._max_phrase_words = max((k.count(" ") + 1 for k in self._keyword_weights), default=1)
+        # Words a single-word lookup skips: correctly spelled, so not a typo of any keyword
+        self._known_words = STOP_WORDS | {word for k in self._keyword_weights for word in k.split()}
+        self._first_letters = {k[0] for k in self._keyword_weights}
+        self._phrase_starts = {k.split(" ", 1)[0] for k in self._keyword_weights if " " in k}
+        self._phrase_letters = {word[0] for word in self._phrase_starts}
+        self._fuzzy_phrase_starts: Optional[FuzzyKeywordIndex] = None
+        if max_edit_distance > 0 and self._keyword_weights:
+            self._fuzzy = FuzzyKeywordIndex(self._keyword_weights, max_edit_distance, fuzzy_min_length)
+            # Only a gate: the whole phrase is checked against the keyword's own allowance afterwards
+            self._fuzzy_phrase_starts = FuzzyKeywordIndex(self._phrase_starts, max_edit_distance, self._fuzzy_min_token)
+
+        self.fingerprint = hashlib.sha1(
+            json.dumps(
+                {
+                    "min_score": min_score,
+                    "fuzzy": [max_edit_distance, fuzzy_min_length, fuzzy_max_tokens],
+                    "rules": sorted((k, [(t.value, w) for t, w in v]) for k, v in self._keyword_weights.items()),
+                },
+                sort_keys=True,
+            ).encode("utf-8")
+        ).hexdigest()
+
+    @property
+    def keyword_count(self) -> int:
+        return len(self._keyword_weights)
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "TopicClassifier":
+        """Build a classifier from the parsed contents of a rules file."""
+        rules = {HealthTopic(entry["topic"]): entry.get("keywords", {}) for entry in data.get("topics", [])}
+        return cls(
+            rules,
+            min_score=float(data.get("min_score", 0.0)),
+            max_edit_distance=settings.TOPIC_FUZZY_MAX_DISTANCE,
+            fuzzy_min_length=settings.TOPIC_FUZZY_MIN_LENGTH,
+            fuzzy_max_tokens=settings.TOPIC_FUZZY_MAX_TOKENS,
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "TopicClassifier":
+        """Load a classifier from a JSON rules file."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        classifier = cls.from_dict(data)
+        logger.info("Loaded %s topic keywords from %s", classifier.keyword_count, path)
+        return classifier
+
+    def classify(self, text: str) -> TopicClassification:
+        """Score all topics against the text and pick the best one."""
+        scores: Dict[HealthTopic, float] = {}
+        matches = []
+        keyword_weights = self._keyword_weights
+        text = text.lower()
+        exact_spans = []
+        for match in self._pattern.finditer(text):
+            keyword = match.group(1)
+            matches.append(keyword)
+            exact_spans.append(match.span(1))
+            for topic, weight in keyword_weights[keyword]:
+                scores[topic] = scores.get(topic, 0.0) + weight
+        if self._fuzzy is not None:
+            for keyword in self._fuzzy_matches(text, exact_spans):
+                matches.append(keyword)
+                for topic, weight in keyword_weights[keyword]:
+                    scores[topic] = scores.get(topic, 0.0) + weight
+
+        topic = HealthTopic.GENERAL
+        if scores:
+            order = self._topic_order
+            best = min(scores, key=lambda t: (-scores[t], order[t]))
+            if scores[best] >= self.min_score:
+                topic = best
+        return TopicClassification(topic=topic, scores=scores, matches=tuple(matches))
+
+    def _fuzzy_matches(self, text: str, exact_spans: List[Tuple[int, int]]) -> List[str]:
+        """Keywords found by fuzzy lookup among the words no exact match covered."""
+        tokens = []  # None for words inside an exact match
+        spans = iter(exact_spans)
+        span = next(spans, None)
+        for word in islice(_WORD.finditer(text), self._fuzzy_max_tokens):
+            while span is not None and span[1] <= word.start():
+                span = next(spans, None)
+            tokens.append(word.group() if span is None or word.start() < span[0] else None)
+
+        found = []
+        lookup = self._fuzzy.lookup
+        min_length = self._fuzzy_min_token
+        known = self._known_words
+        first_letters = self._first_letters
+        for start, word in enumerate(tokens):
+            if word is None or word[0] not in first_letters:
+                continue
+            keyword, size = None, 1
+            if self._can_start_phrase(word):
+                # Longest phrase first, like the exact matcher
+                for size in range(min(self._max_phrase_words, len(tokens) - start), 1, -1):
+                    words = tokens[start:start + size]
+                    if None not in words:
+                        keyword = lookup(" ".join(words))
+                        if keyword is not None:
+                            break
+            if keyword is None and len(word) >= min_length and word not in known:
+                keyword, size = lookup(word), 1
+            if keyword is not None:
+                found.append(keyword)
+                tokens[start:start + size] = [None] * size
+        return found
+
+    def _can_start_phrase(self, word: str) -> bool:
+        if word in self._phrase_starts:
+            return True
+        return word[0] in self._phrase_letters and self._fuzzy_phrase_starts.lookup(word) is not None
+
+
+def default_rules_path() -> str:
+    """Path to the topic rules file, relative paths resolved against the app package."""
+    path = settings.TOPIC_RULES_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    return path
+
+
+@lru_cache(maxsize=None)
+def get_topic_classifier(path: Optional[str] = None) -> TopicClassifier:
+    """Return the process-wide classifier, compiling it on first use."""
+    return TopicClassifier.from_file(path or default_rules_path())
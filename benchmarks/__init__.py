@@ -0,0 +1 @@
+# Performance benchmarks; run individual modules with 'python -m benchmarks.<name>'
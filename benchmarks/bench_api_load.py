@@ -0,0 +1,203 @@
+"""
+In-process load benchmark for the API.
+
+Drives `app.app` through httpx.ASGITransport (no sockets, no server process),
+so the numbers measure the application itself: routing, middleware,
+validation, the health chat service and template rendering. Scenarios:
+  * ping         GET  /api/ping
+  * health_chat  POST /api/ai/health-chat, messages from a corpus file
+  * index        GET  /
+
+The default corpus (benchmarks/corpus/health_messages.json) mixes topics,
+short and long messages and typo-filled input. Each request of the
+health_chat scenario picks the next message; with --unique a counter is
+appended so every message misses the response cache.
+
+For each scenario the benchmark reports throughput and p50/p95/p99 latency.
+With --baseline, the run fails (exit code 1) if any scenario's p95 is more
+than `tolerance` slower, or its throughput more than `tolerance` lower, than
+in the saved baseline. The committed baseline
+(benchmarks/baselines/api_load.json) was saved from a default run of all
+scenarios; timings depend on the machine, so regenerate it on the machine
+you compare on, from the commit you compare against:
+    python -m benchmarks.bench_api_load --save benchmarks/baselines/api_load.json
+
+Usage:
+    python -m benchmarks.bench_api_load [--requests 2000] [--concurrency 16]
+        [--scenario ping --scenario health_chat] [--corpus FILE] [--unique]
+        [--baseline [FILE]] [--save FILE] [--tolerance 0.2]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, "corpus", "health_messages.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "api_load.json")
+
+# name -> (method, path); request bodies come from make_body()
+SCENARIOS: Dict[str, Tuple[str, str]] = {
+    "ping": ("GET", "/api/ping"),
+    "health_chat": ("POST", "/api/ai/health-chat"),
+    "index": ("GET", "/"),
+}
+
+
+def load_corpus(path: str) -> List[str]:
+    """Messages from a corpus file: a JSON list, or an object with a "messages" list."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data["messages"] if isinstance(data, dict) else data
+    messages = []
+    for entry in entries:
+        if isinstance(entry, str):
+            messages.append(entry)
+        else:
+            messages.append((entry["text"] * entry.get("repeat", 1)).strip())
+    if not messages:
+        raise ValueError(f"{path} contains no messages")
+    return messages
+
+
+def make_body(scenario: str, messages: List[str], unique: bool) -> Callable[[int], Optional[dict]]:
+    if scenario != "health_chat":
+        return lambda i: None
+    if unique:
+        return lambda i: {"message": f"{messages[i % len(messages)]} ({i})"}
+    return lambda i: {"message": messages[i % len(messages)]}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: str, requests: int, concurrency: int, body: Callable[[int], Optional[dict]]
+) -> dict:
+    method, path = SCENARIOS[scenario]
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body(i))
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def main_async(args) -> Dict[str, dict]:
+    from app import app
+    from app.services.service_registry import service_registry
+
+    # After the import, which applies LOG_LEVEL; per-request log lines would dominate the measurement
+    logging.getLogger("app").setLevel(logging.ERROR)
+
+    messages = load_corpus(args.corpus)
+    results: Dict[str, dict] = {}
+    async with app.router.lifespan_context(app):
+        await service_registry.wait_ready()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in args.scenario or list(SCENARIOS):
+                body = make_body(scenario, messages, args.unique)
+                # Warm-up requests are not measured (first renders, lazy imports, caches)
+                await run_scenario(client, scenario, args.warmup, 1, body)
+                results[scenario] = await run_scenario(client, scenario, args.requests, args.concurrency, body)
+                r = results[scenario]
+                print(
+                    f"  {scenario:<12} {r['throughput_rps']:9.1f} req/s  p50 {r['p50_ms']:8.2f} ms  "
+                    f"p95 {r['p95_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  errors {r['errors']}"
+                )
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> bool:
+    """Print the comparison with a baseline; returns False on a regression."""
+    ok = True
+    for scenario, r in results.items():
+        base = baseline.get(scenario)
+        if base is None:
+            print(f"  {scenario:<12} not in the baseline")
+            continue
+        p95_limit = base["p95_ms"] * (1 + tolerance)
+        rps_limit = base["throughput_rps"] * (1 - tolerance)
+        regressed = r["p95_ms"] > p95_limit or r["throughput_rps"] < rps_limit
+        ok = ok and not regressed
+        print(
+            f"  {scenario:<12} p95 {r['p95_ms']:8.2f} ms (baseline {base['p95_ms']:8.2f}), "
+            f"{r['throughput_rps']:9.1f} req/s (baseline {base['throughput_rps']:9.1f}): "
+            f"{'REGRESSION' if regressed else 'OK'}"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests before each scenario")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Run only these (repeatable)")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSON file with health chat messages")
+    parser.add_argument("--unique", action="store_true", help="Make every message unique to bypass the response cache")
+    parser.add_argument(
+        "--baseline", nargs="?", const=DEFAULT_BASELINE,
+        help="JSON file from a previous --save to compare against (default: the committed baseline)",
+    )
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression vs the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("FRAMEWORK", "fastapi")
+    # All requests come from one client; measure the app, not the per-client rate limit
+    os.environ.setdefault("ADMISSION_RATE", "0")
+
+    print(f"{args.requests} requests per scenario, concurrency {args.concurrency}:")
+    results = asyncio.run(main_async(args))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
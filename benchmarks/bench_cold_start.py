@@ -0,0 +1,135 @@
+"""
+Cold-start benchmark: time from process start to the first successful
+/api/ping response, the latency a user sees when a stopped machine is woken
+up by their request.
+
+Each run starts a fresh `uvicorn main:app` process on a free port, polls
+/api/ping until it answers 200, records the elapsed time and the time until
+/api/ready also answers 200, then stops the process. The startup profile of
+the last run (/api/startup) is printed to show where the time went.
+
+Usage:
+    python -m benchmarks.bench_cold_start [--runs 5] [--baseline FILE] [--save FILE] [--tolerance 0.2]
+
+With --baseline, the run fails (exit code 1) if the median time to first
+ping is more than `tolerance` slower than the saved baseline.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, url: str, deadline: float, process: subprocess.Popen) -> float:
+    """Poll url until it returns 200; returns the perf_counter time it first did."""
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode} before {url} answered")
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not answer within the timeout")
+
+
+def cold_start(project_dir: str, timeout: float, env: Dict[str, str]) -> Tuple[float, float, Optional[dict]]:
+    """Start one server process; return (seconds to first ping, seconds to ready, startup profile)."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=project_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            deadline = start + timeout
+            first_ping = wait_for(client, f"{base}/api/ping", deadline, process) - start
+            ready = wait_for(client, f"{base}/api/ready", deadline, process) - start
+            response = client.get(f"{base}/api/startup")
+            profile = response.json() if response.status_code == 200 else None
+        return first_ping, ready, profile
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure process start to first /api/ping response")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--project-dir", default=PROJECT_DIR, help="Tree to start the server from")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each server")
+    parser.add_argument("--profile-imports", action="store_true", help="Run the servers with STARTUP_PROFILE=1")
+    parser.add_argument("--baseline", help="JSON file from a previous --save to compare against")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, FRAMEWORK="fastapi")
+    if args.profile_imports:
+        env["STARTUP_PROFILE"] = "1"
+
+    pings, readies, profile = [], [], None
+    for run in range(args.runs):
+        first_ping, ready, profile = cold_start(args.project_dir, args.timeout, env)
+        pings.append(first_ping)
+        readies.append(ready)
+        print(f"  run {run + 1}: first ping {first_ping * 1000:7.1f} ms, ready {ready * 1000:7.1f} ms")
+
+    result = {
+        "runs": args.runs,
+        "first_ping_median_ms": round(statistics.median(pings) * 1000, 1),
+        "first_ping_max_ms": round(max(pings) * 1000, 1),
+        "ready_median_ms": round(statistics.median(readies) * 1000, 1),
+    }
+    print(
+        f"Time to first /api/ping: median {result['first_ping_median_ms']:.1f} ms, "
+        f"max {result['first_ping_max_ms']:.1f} ms; ready after {result['ready_median_ms']:.1f} ms (median)"
+    )
+    if profile:
+        print("Startup profile of the last run (ms since the app package was imported):")
+        for phase in profile["phases"]:
+            print(f"  {phase['name']:<24} +{phase['start_ms']:>8.1f}  {phase['duration_ms']:>8.1f}")
+        for imp in profile["slowest_imports"][:10]:
+            print(f"  import {imp['module']:<40} {imp['self_ms']:>7.1f} / {imp['cumulative_ms']:>7.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        limit = baseline["first_ping_median_ms"] * (1 + args.tolerance)
+        status = "OK" if result["first_ping_median_ms"] <= limit else "REGRESSION"
+        print(f"Baseline median {baseline['first_ping_median_ms']:.1f} ms, limit {limit:.1f} ms: {status}")
+        if status != "OK":
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Memory benchmark for the composite mode (FRAMEWORK=composite).
+
+Starts the API and the NiceGUI chat page as two separate servers, the way
+they would be deployed one framework per machine, and then as one composite
+server. The composite server's resident memory is read before and after each
+frontend's first request, and /api/frontends is printed, showing what each
+frontend added to the process.
+
+Usage:
+    python -m benchmarks.bench_composite_memory [--timeout 60]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable
+
+import httpx
+
+from app.core.server import rss_bytes
+from benchmarks.bench_cold_start import PROJECT_DIR, free_port, wait_for
+
+_MB = 1024 * 1024
+
+
+def start_server(framework: str, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_DIR,
+        env=dict(os.environ, FRAMEWORK=framework),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def settled_rss(pid: int, pause: float = 1.0) -> int:
+    time.sleep(pause)  # Let warm-up and background tasks allocate what they will
+    return rss_bytes(pid)
+
+
+def separate(framework: str, ready_path: str, pages: Iterable[str], timeout: float) -> int:
+    """Resident memory of a single-framework server after it served its pages."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    process = start_server(framework, port)
+    try:
+        with httpx.Client(timeout=10.0) as client:
+            wait_for(client, base + ready_path, time.perf_counter() + timeout, process)
+            for page in pages:
+                client.get(base + page)
+            return settled_rss(process.pid)
+    finally:
+        stop_server(process)
+
+
+def composite(prefixes: Iterable[str], timeout: float) -> Dict[str, int]:
+    """Resident memory of a composite server before any frontend and after each one's first request."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    process = start_server("composite", port)
+    try:
+        with httpx.Client(timeout=30.0) as client:
+            wait_for(client, f"{base}/api/ready", time.perf_counter() + timeout, process)
+            client.get(f"{base}/")
+            steps = {"API only": settled_rss(process.pid)}
+            for prefix in prefixes:
+                status = client.get(f"{base}{prefix}/").status_code
+                steps[f"+ {prefix} (HTTP {status})"] = settled_rss(process.pid)
+            print(json.dumps(client.get(f"{base}/api/frontends").json(), indent=2))
+            return steps
+    finally:
+        stop_server(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each server")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+
+    api = separate("fastapi", "/api/ready", ["/"], args.timeout)
+    chat = separate("nicegui", "/api/health", ["/"], args.timeout)
+    steps = composite(settings.COMPOSITE_FRONTENDS, args.timeout)
+
+    print("\nSeparate servers (resident memory):")
+    print(f"  {'FRAMEWORK=fastapi':<32} {api / _MB:8.1f} MB")
+    print(f"  {'FRAMEWORK=nicegui':<32} {chat / _MB:8.1f} MB")
+    print(f"  {'total':<32} {(api + chat) / _MB:8.1f} MB")
+    print("Composite server (FRAMEWORK=composite):")
+    for label, rss in steps.items():
+        print(f"  {label:<32} {rss / _MB:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
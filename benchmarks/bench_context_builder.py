@@ -0,0 +1,82 @@
+"""
+Benchmark for the token-budgeted conversation context builder.
+
+Plays one long conversation into an in-memory ConversationStore and, at
+checkpoints, times assembling the history for the next prompt two ways:
+naive concatenation of every message (counting all their tokens again, as a
+prompt built from the whole HealthConversation would) and the ContextBuilder
+(newest turns verbatim, older ones in the rolling summary, only new messages
+counted). Prompt size in estimated tokens is printed next to each.
+
+Usage:
+    python -m benchmarks.bench_context_builder [--turns 5000] [--max-tokens 2000]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from app.models.ai_models import HealthTopic
+from app.services.context_builder import ContextBuilder, estimate_tokens
+from app.services.conversation_store import ConversationStore
+from benchmarks.bench_topic_classifier import FILLER
+
+TOPICS = [topic for topic in HealthTopic]
+CHECKPOINTS = (10, 100, 1000, 5000, 20000)
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(words)).capitalize() + "."
+
+
+def naive(history: List[str]) -> int:
+    """Every message, with every token counted again."""
+    prompt = "\n".join(history)
+    return estimate_tokens(prompt)
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    store = ConversationStore(max_messages=50, max_pending=1000)
+    builder = ContextBuilder(store, max_tokens=args.max_tokens, summary_max_tokens=args.summary_tokens)
+    conversation_id = "bench"
+    history: List[str] = []
+    checkpoints = [c for c in CHECKPOINTS if c <= args.turns] or [args.turns]
+
+    print(f"History budget {args.max_tokens} tokens (summary up to {builder.summary_max_tokens})")
+    print(f"  {'turns':>6} {'naive':>12} {'tokens':>9} {'builder':>12} {'tokens':>7} {'summary lines':>14}")
+    for turn in range(1, args.turns + 1):
+        user, assistant = text(rng, rng.randint(8, 30)), text(rng, rng.randint(30, 120))
+        await store.record_turn(conversation_id, user, assistant, rng.choice(TOPICS), is_new=turn == 1)
+        history += [user, assistant]
+        if turn in checkpoints:
+            started = time.perf_counter()
+            naive_tokens = naive(history)
+            naive_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            context = await builder.build(conversation_id)
+            builder_seconds = time.perf_counter() - started
+            lines = len(builder._contexts[conversation_id].summary.lines)
+            print(f"  {turn:>6} {naive_seconds * 1e6:9.0f} us {naive_tokens:>9} "
+                  f"{builder_seconds * 1e6:9.0f} us {context.tokens:>7} {lines:>14}")
+        elif turn % args.every == 0:
+            # Regular turns between checkpoints, so the builder only sees the last few messages each time
+            await builder.build(conversation_id)
+    print(builder.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5000, help="Turns in the conversation")
+    parser.add_argument("--max-tokens", type=int, default=2000, help="History budget per prompt")
+    parser.add_argument("--summary-tokens", type=int, default=400, help="Budget of the rolling summary")
+    parser.add_argument("--every", type=int, default=1, help="Build a prompt every this many turns")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
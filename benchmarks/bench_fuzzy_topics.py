@@ -0,0 +1,174 @@
+"""
+Benchmark for typo-tolerant topic matching.
+
+Accuracy: messages with one misspelled keyword (a deleted, inserted,
+replaced or swapped letter, never the first one) classified by the exact
+matcher and by the fuzzy one, plus the false positives of each on messages
+without any keyword.
+
+Long messages: the cost of classifying a message of --long-words random
+words with the shipped rules, exact only and with typo lookups (only the
+first TOPIC_FUZZY_MAX_TOKENS words are looked up).
+
+Scaling: the cost of classifying a misspelled message as the keyword set
+grows, with the deletion index (caches cleared before every call, so every
+lookup is a miss) against checking the edit distance to every keyword.
+
+Usage:
+    python -m benchmarks.bench_fuzzy_topics [--messages 500] [--repeat 50] [--long-words 2000]
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+import timeit
+
+from app.core.config import settings
+from app.models.ai_models import HealthTopic
+from app.services.topic_classifier import TopicClassifier, _distance, default_rules_path
+from benchmarks.bench_topic_classifier import FILLER, synthetic_rules
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """One random edit after the first letter."""
+    i = rng.randrange(1, len(word))
+    kind = rng.choice(("delete", "insert", "replace", "swap"))
+    if kind == "delete":
+        return word[:i] + word[i + 1:]
+    if kind == "insert":
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if kind == "replace":
+        return word[:i] + rng.choice(string.ascii_lowercase.replace(word[i], "")) + word[i + 1:]
+    if i == len(word) - 1:
+        i -= 1
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def sentence(rng: random.Random, keyword: str = "", words: int = 12) -> str:
+    body = [rng.choice(FILLER) for _ in range(words)]
+    if keyword:
+        body.insert(rng.randrange(len(body) + 1), keyword)
+    return " ".join(body)
+
+
+def linear_scan(keywords, max_distance: int, min_length: int):
+    """Fuzzy lookup without an index: every word against every keyword."""
+    def lookup(message: str):
+        found = []
+        for token in message.split():
+            for keyword in keywords:
+                if len(keyword) < min_length or keyword[0] != token[0]:
+                    continue
+                allowed = min(max_distance, len(keyword) // 4)
+                if _distance(keyword, token, allowed) <= allowed:
+                    found.append(keyword)
+        return found
+    return lookup
+
+
+def accuracy(args, rng: random.Random) -> None:
+    with open(default_rules_path(), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rules = {HealthTopic(entry["topic"]): entry.get("keywords", {}) for entry in data.get("topics", [])}
+    exact = TopicClassifier(rules, min_score=float(data.get("min_score", 0.0)))
+    fuzzy = TopicClassifier.from_dict(data)
+
+    # Keywords long enough to be matched fuzzily and owned by a single topic
+    owners = {}
+    for topic, keywords in rules.items():
+        for keyword in keywords:
+            owners.setdefault(keyword.lower(), set()).add(topic)
+    candidates = sorted(k for k, t in owners.items() if len(t) == 1 and len(k) >= settings.TOPIC_FUZZY_MIN_LENGTH)
+
+    samples = []
+    for _ in range(args.messages):
+        keyword = rng.choice(candidates)
+        words = keyword.split()
+        j = rng.randrange(len(words))
+        if len(words[j]) > 1:
+            words[j] = misspell(words[j], rng)
+        samples.append((sentence(rng, " ".join(words)), next(iter(owners[keyword]))))
+    clean = [sentence(rng) for _ in range(args.messages)]
+
+    print(f"Typo corpus: {args.messages} messages, one misspelled keyword each "
+          f"(max distance {settings.TOPIC_FUZZY_MAX_DISTANCE}, min length {settings.TOPIC_FUZZY_MIN_LENGTH})")
+    for label, classifier in (("exact", exact), ("fuzzy", fuzzy)):
+        correct = sum(classifier.classify(message).topic == topic for message, topic in samples)
+        false_hits = sum(classifier.classify(message).topic != HealthTopic.GENERAL for message in clean)
+        print(f"  {label:<8} {correct / len(samples):7.1%} correct topic   {false_hits:4d} false positives "
+              f"on {len(clean)} clean messages")
+
+
+def clear_caches(classifier: TopicClassifier) -> None:
+    for index in (classifier._fuzzy, classifier._fuzzy_phrase_starts):
+        index.lookup.cache_clear()
+        index._candidates.cache_clear()
+
+
+def long_message(args, rng: random.Random) -> None:
+    with open(default_rules_path(), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rules = {HealthTopic(entry["topic"]): entry.get("keywords", {}) for entry in data.get("topics", [])}
+    exact = TopicClassifier(rules, min_score=float(data.get("min_score", 0.0)))
+    fuzzy = TopicClassifier.from_dict(data)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(args.long_words // 2)]
+    message = " ".join(rng.choice(vocabulary + list(FILLER)) for _ in range(args.long_words))
+
+    def cold():
+        clear_caches(fuzzy)
+        fuzzy.classify(message)
+
+    print(f"\nMessage of {args.long_words} words:")
+    for label, call in (
+        ("exact", lambda: exact.classify(message)),
+        ("fuzzy", lambda: fuzzy.classify(message)),
+        ("fuzzy, cold caches", cold),
+    ):
+        per_call = min(timeit.repeat(call, number=args.repeat, repeat=3)) / args.repeat
+        print(f"  {label:<20} {per_call * 1e6:9.0f} us/msg")
+
+
+def scaling(args, rng: random.Random) -> None:
+    print("\nMisspelled message, every lookup a cache miss:")
+    print(f"  {'keywords':>8} {'build':>9} {'index keys':>11} {'indexed':>14} {'linear scan':>16}")
+    for size in (100, 1000, 10000, 50000):
+        rules = synthetic_rules(size)
+        keywords = [k for kws in rules.values() for k in kws]
+        started = time.perf_counter()
+        classifier = TopicClassifier(
+            rules, max_edit_distance=settings.TOPIC_FUZZY_MAX_DISTANCE, fuzzy_min_length=settings.TOPIC_FUZZY_MIN_LENGTH
+        )
+        build = time.perf_counter() - started
+        index = classifier._fuzzy
+        message = sentence(rng, misspell(rng.choice([k for k in keywords if len(k) >= 8]), rng))
+
+        def indexed():
+            clear_caches(classifier)
+            classifier.classify(message)
+
+        per_call = min(timeit.repeat(indexed, number=args.repeat, repeat=3)) / args.repeat
+        scan = linear_scan(keywords, settings.TOPIC_FUZZY_MAX_DISTANCE, settings.TOPIC_FUZZY_MIN_LENGTH)
+        scan_repeat = max(1, args.repeat * 100 // size)
+        per_scan = min(timeit.repeat(lambda: scan(message), number=scan_repeat, repeat=3)) / scan_repeat
+        print(f"  {len(keywords):>8} {build * 1e3:7.0f} ms {len(index):>11} "
+              f"{per_call * 1e6:9.0f} us/msg {per_scan * 1e6:11.0f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500, help="Messages in the typo corpus")
+    parser.add_argument("--repeat", type=int, default=50, help="Calls per timing sample")
+    parser.add_argument("--long-words", type=int, default=2000, help="Words in the long message")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    accuracy(args, rng)
+    long_message(args, rng)
+    scaling(args, rng)
+
+
+if __name__ == "__main__":
+    main()
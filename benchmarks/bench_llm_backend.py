@@ -0,0 +1,78 @@
+"""
+Benchmark for the pooled LLM backend client.
+
+Runs against the in-process stub backend (benchmarks/stub_llm.py), so no
+network access is needed. Shows:
+  * upstream calls and wall time for a burst of identical prompts, with and
+    without single-flight coalescing
+  * fallback latency of HealthChatService while the circuit breaker is open
+
+Usage:
+    python -m benchmarks.bench_llm_backend [--burst 200] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from app.models.ai_models import HealthChatRequest
+from app.services.ai_services import HealthChatService
+from app.services.llm_backend import CircuitBreaker, GuardedBackend, OpenAICompatibleBackend
+from benchmarks.stub_llm import create_stub_app
+
+PROMPT = [{"role": "user", "content": "How much water should I drink each day?"}]
+
+
+def make_backend(stub, client: httpx.AsyncClient) -> OpenAICompatibleBackend:
+    return OpenAICompatibleBackend("http://stub/v1", "stub-model", client=client)
+
+
+async def burst(label: str, backend, stub, size: int) -> None:
+    stub.state.calls = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(backend.complete(PROMPT) for _ in range(size)))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {size} requests -> {stub.state.calls:4d} upstream calls in {elapsed * 1000:8.1f} ms")
+
+
+async def breaker_fallback(latency: float, requests: int) -> None:
+    stub = create_stub_app(latency=latency, fail=True)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)) as client:
+        guarded = GuardedBackend(make_backend(stub, client), CircuitBreaker(failure_threshold=3, reset_timeout=60))
+        service = HealthChatService("stub-model", backend=guarded)
+        start = time.perf_counter()
+        for i in range(requests):
+            await service.generate_response(HealthChatRequest(message=f"diet question {i}"))
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {requests} requests against a failing backend: {stub.state.calls} upstream calls, "
+            f"breaker {guarded.breaker.state}, {elapsed / requests * 1000:.2f} ms/request"
+        )
+
+
+async def main_async(args) -> None:
+    stub = create_stub_app(latency=args.latency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)) as client:
+        print(f"Burst of identical prompts (stub latency {args.latency * 1000:.0f} ms):")
+        await burst("plain backend", make_backend(stub, client), stub, args.burst)
+        await burst("guarded (single-flight)", GuardedBackend(make_backend(stub, client)), stub, args.burst)
+
+    print("\nCircuit breaker fallback:")
+    await breaker_fallback(args.latency, args.burst)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200, help="Concurrent identical requests")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub backend latency in seconds")
+    args = parser.parse_args()
+    # Fallback warnings would drown the results
+    logging.getLogger("app").setLevel(logging.ERROR)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
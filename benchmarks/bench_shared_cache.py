@@ -0,0 +1,113 @@
+"""
+Response cache hit rate across worker processes: per-process caches vs the
+shared SQLite store with per-worker near caches.
+
+Starts N worker processes, like `uvicorn --workers N`, and deals a stream of
+health chat messages to them round-robin. Message popularity follows a
+Zipf distribution over a fixed set of distinct messages. Every miss
+"computes" an answer (sleeps --compute-ms) and stores it in the cache. The
+run is repeated with each worker owning a private ResponseCache (the
+per-process baseline) and with all workers sharing one SharedStore file.
+
+Usage:
+    python -m benchmarks.bench_shared_cache [--workers 4] [--requests 20000] [--keys 1000]
+        [--zipf 1.1] [--compute-ms 1]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from typing import List, Optional
+
+from app.models.ai_models import HealthChatResponse, HealthTopic
+
+ANSWER = HealthChatResponse(
+    response="A balanced diet includes a variety of fruits, vegetables, whole grains and lean proteins.",
+    conversation_id="",
+    topic=HealthTopic.NUTRITION,
+)
+
+
+def message_stream(requests: int, keys: int, zipf: float, seed: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** zipf) for rank in range(1, keys + 1)]
+    return [f"health question number {k}" for k in rng.choices(range(keys), weights=weights, k=requests)]
+
+
+def worker(index: int, workers: int, stream: List[str], shared_path: Optional[str], compute: float, barrier, results) -> None:
+    from app.services.response_cache import ResponseCache
+    from app.services.shared_state import SharedStore
+
+    shared = SharedStore(shared_path) if shared_path else None
+    if shared is not None:
+        shared.open()
+    cache = ResponseCache(maxsize=len(stream), ttl=3600, shared=shared)
+    mine = stream[index::workers]
+
+    async def serve() -> float:
+        lookup_time = 0.0
+        for message in mine:
+            key = cache.make_key("bench-model", message)
+            start = time.perf_counter()
+            hit = await cache.get(key)
+            lookup_time += time.perf_counter() - start
+            if hit is None:
+                time.sleep(compute)
+                cache.set(key, ANSWER)
+        return lookup_time
+
+    barrier.wait()
+    lookup_time = asyncio.run(serve())
+    if shared is not None:
+        shared.close()
+    stats = cache.stats()
+    results.put((stats["hits"], stats["shared_hits"], stats["misses"], lookup_time / len(mine)))
+
+
+def run(label: str, workers: int, stream: List[str], shared_path: Optional[str], compute: float) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(i, workers, stream, shared_path, compute, barrier, results)) for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    rows = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    hits = sum(r[0] for r in rows)
+    shared_hits = sum(r[1] for r in rows)
+    misses = sum(r[2] for r in rows)
+    per_lookup = sum(r[3] for r in rows) / len(rows)
+    print(
+        f"  {label:<22} hit rate {hits / (hits + misses):6.1%} ({shared_hits} from other workers), "
+        f"{misses} answers computed, {per_lookup * 1e6:6.1f} us per lookup"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=1000, help="Distinct messages")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew of the messages")
+    parser.add_argument("--compute-ms", type=float, default=1.0, help="Time to compute an answer on a miss")
+    args = parser.parse_args()
+
+    stream = message_stream(args.requests, args.keys, args.zipf)
+    print(f"{args.requests} requests over {args.keys} messages, {args.workers} workers:")
+    compute = args.compute_ms / 1000
+    run("single process", 1, stream, None, compute)
+    run("per-process caches", args.workers, stream, None, compute)
+    with tempfile.TemporaryDirectory() as tmp:
+        run("shared + near caches", args.workers, stream, os.path.join(tmp, "shared.db"), compute)
+
+
+if __name__ == "__main__":
+    main()
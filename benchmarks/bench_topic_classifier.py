@@ -0,0 +1,121 @@
+"""
+Micro-benchmark for the health topic classifier.
+
+Compares the compiled single-pass TopicClassifier against the original
+if/elif substring chain on long messages, always with the same keyword set
+on both sides, and shows how both behave as the keyword set grows.
+
+On one long message a handful of substring scans (str.__contains__ in C)
+beats the regex, which visits every position of the message; the classifier
+pays for whole-word matching and per-topic scores. Its cost stays flat as
+keywords are added, while the chain's grows with every keyword.
+
+Usage:
+    python -m benchmarks.bench_topic_classifier [--words 2000] [--repeat 200]
+"""
+
+import argparse
+import json
+import random
+import string
+import timeit
+
+from app.models.ai_models import HealthTopic
+from app.services.topic_classifier import TopicClassifier, default_rules_path, get_topic_classifier
+
+FILLER = (
+    "i have been wondering about a few things lately and would like some advice on how to "
+    "keep myself healthy while working long hours at a desk with very little free time"
+).split()
+
+
+def legacy_classify(message: str) -> HealthTopic:
+    """The original keyword chain from HealthChatService.generate_response."""
+    message = message.lower()
+    if "nutrition" in message or "diet" in message or "food" in message:
+        return HealthTopic.NUTRITION
+    elif "exercise" in message or "workout" in message or "fitness" in message:
+        return HealthTopic.FITNESS
+    elif "mental health" in message or "stress" in message or "anxiety" in message:
+        return HealthTopic.MENTAL_HEALTH
+    elif "first aid" in message or "emergency" in message:
+        return HealthTopic.FIRST_AID
+    return HealthTopic.GENERAL
+
+
+# The keywords of legacy_classify, in the same order, as classifier rules
+LEGACY_RULES = {
+    HealthTopic.NUTRITION: {"nutrition": 1.0, "diet": 1.0, "food": 1.0},
+    HealthTopic.FITNESS: {"exercise": 1.0, "workout": 1.0, "fitness": 1.0},
+    HealthTopic.MENTAL_HEALTH: {"mental health": 1.0, "stress": 1.0, "anxiety": 1.0},
+    HealthTopic.FIRST_AID: {"first aid": 1.0, "emergency": 1.0},
+}
+
+
+def legacy_chain(keywords):
+    """Generalize the substring chain to an arbitrary keyword list (one scan per keyword)."""
+    def classify(message: str) -> HealthTopic:
+        message = message.lower()
+        for keyword, topic in keywords:
+            if keyword in message:
+                return topic
+        return HealthTopic.GENERAL
+    return classify
+
+
+def make_message(words: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    body = [rng.choice(FILLER) for _ in range(words)]
+    body.append("emergency")  # Force a late hit so the chain cannot stop early
+    return " ".join(body)
+
+
+def synthetic_rules(size: int, seed: int = 11):
+    rng = random.Random(seed)
+    topics = [t for t in HealthTopic if t is not HealthTopic.GENERAL]
+    rules = {t: {} for t in topics}
+    for _ in range(size):
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+        rules[rng.choice(topics)][word] = 1.0
+    rules[HealthTopic.FIRST_AID]["emergency"] = 4.0
+    return rules
+
+
+def bench(label: str, func, message: str, repeat: int) -> float:
+    per_call = min(timeit.repeat(lambda: func(message), number=repeat, repeat=3)) / repeat
+    print(f"  {label:<38} {per_call * 1e6:10.1f} us/message")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=2000, help="Words per benchmark message")
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per timing sample")
+    args = parser.parse_args()
+
+    message = make_message(args.words)
+    print(f"Message length: {len(message)} chars, {args.words + 1} words")
+
+    print("\nLegacy keywords (11):")
+    bench("legacy if/elif chain", legacy_classify, message, args.repeat)
+    bench("compiled TopicClassifier", TopicClassifier(LEGACY_RULES).classify, message, args.repeat)
+
+    with open(default_rules_path(), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rules = {HealthTopic(entry["topic"]): entry.get("keywords", {}) for entry in data.get("topics", [])}
+    keywords = [(k, t) for t, kws in rules.items() for k in kws]
+    print(f"\nShipped rules ({len(keywords)} keywords):")
+    bench("substring chain", legacy_chain(keywords), message, args.repeat)
+    bench("compiled TopicClassifier", TopicClassifier(rules, min_score=float(data["min_score"])).classify, message, args.repeat)
+    bench("compiled TopicClassifier, fuzzy on", get_topic_classifier().classify, message, args.repeat)
+
+    for size in (100, 1000, 5000):
+        rules = synthetic_rules(size)
+        keywords = [(k, t) for t, kws in rules.items() for k in kws]
+        print(f"\nSynthetic rules ({len(keywords)} keywords):")
+        bench("substring chain", legacy_chain(keywords), message, max(1, args.repeat // 20))
+        bench("compiled TopicClassifier", TopicClassifier(rules).classify, message, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Local stub of an OpenAI-compatible /chat/completions backend.
+
+Used by the benchmarks through httpx.ASGITransport so nothing needs network
+access. It can also be served for manual testing:
+
+    python -m benchmarks.stub_llm --port 9000
+    LLM_BACKEND_URL=http://127.0.0.1:9000/v1 python main.py
+"""
+
+import argparse
+import asyncio
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_ANSWER = (
+    "Here is some general health guidance from the stub model. "
+    "Stay hydrated, sleep well and keep moving. "
+    "See a healthcare professional for personal advice."
+)
+
+
+def create_stub_app(latency: float = 0.05, fail: bool = False) -> FastAPI:
+    """Build a stub backend that answers after `latency` seconds, or always fails."""
+    app = FastAPI(title="Stub LLM backend")
+    app.state.calls = 0
+    app.state.fail = fail
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.calls += 1
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        if app.state.fail:
+            return JSONResponse(status_code=503, content={"error": "stub backend unavailable"})
+
+        if not payload.get("stream"):
+            return {"choices": [{"message": {"role": "assistant", "content": STUB_ANSWER}}]}
+
+        async def events():
+            for word in STUB_ANSWER.split(" "):
+                chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+app = create_stub_app()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the stub LLM backend")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    uvicorn.run(create_stub_app(latency=args.latency), host="127.0.0.1", port=args.port)
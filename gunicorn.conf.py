@@ -0,0 +1,23 @@
+"""
+gunicorn configuration for the preforking production server (see app/core/server.py).
+
+gunicorn reads this file from the working directory, so this is enough:
+    gunicorn main:app
+"""
+
+import os
+
+from app.core.config import settings
+from app.core.server import child_exit, post_fork, post_worker_init, pre_fork, when_ready  # noqa: F401 (server hooks)
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = settings.SERVER_WORKERS
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Load the application in the master; the workers share its memory copy-on-write
+preload_app = True
+
+# Recycle workers; uvicorn finishes in-flight requests before exiting
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS_JITTER
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
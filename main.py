@@ -1,14 +1,14 @@
 import os
 import importlib
 import sys
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Add the current directory to the path to ensure imports work correctly
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Importing the app package loads environment variables from .env; the
+# FastAPI application itself is only built if the branch below needs it
+importlib.import_module("app")
+
 # Determine which framework to use based on environment variable
 # Default to FastAPI if not specified
 FRAMEWORK = os.getenv("FRAMEWORK", "fastapi").lower()
@@ -19,12 +19,16 @@ if FRAMEWORK == "fastapi":
     application = app
 elif FRAMEWORK == "nicegui":
     try:
-        from nicegui import ui, app as nicegui_app
-        # Setup NiceGUI app here
+        # The health chat page, calling the shared service in-process
+        from app.frontend.nicegui_app import app as nicegui_app
         application = nicegui_app
     except ImportError:
         print("NiceGUI not installed. Please install with: pip install nicegui")
         exit(1)
+elif FRAMEWORK == "composite":
+    # The API plus every frontend in COMPOSITE_FRONTENDS, each imported on its first request
+    from app.core.composite import create_composite_app
+    application = create_composite_app()
 elif FRAMEWORK == "reactpy":
     try:
         import reactpy
@@ -50,6 +54,12 @@ else:
 app = application
 
 if __name__ == "__main__":
+    port = int(os.getenv("PORT", 8000))
+    if os.getenv("APP_SERVER", "uvicorn").lower() == "prefork":
+        # Production: gunicorn master forking uvicorn workers (see gunicorn.conf.py)
+        from app.core.server import run_prefork
+        run_prefork("main:app", "0.0.0.0", port)
+
     import uvicorn
     # Run the application with uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)), reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
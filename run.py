@@ -1,9 +1,8 @@
 import uvicorn
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Importing the app package loads environment variables from .env
+import app  # noqa: F401
 
 if __name__ == "__main__":
     # Get host and port from environment variables or use defaults
@@ -11,6 +10,11 @@ if __name__ == "__main__":
     port = int(os.getenv("APP_PORT", "8001"))
     reload = os.getenv("APP_RELOAD", "true").lower() == "true"
 
+    # APP_SERVER=prefork: the production server (gunicorn master forking uvicorn workers)
+    if os.getenv("APP_SERVER", "uvicorn").lower() == "prefork":
+        from app.core.server import run_prefork
+        run_prefork("app:app", host, port)
+
     # Run the FastAPI app using Uvicorn
     # 'app:app' refers to the 'app' instance in the 'app' module (app/__init__.py)
     uvicorn.run("app:app", host=host, port=port, reload=reload)
\ No newline at end of file
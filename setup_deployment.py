@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 """
 Setup script to prepare the application for deployment.
-This script ensures that templates and static files are properly copied to the app directory structure.
+This script ensures that templates and static files are properly copied to the app directory structure,
+then builds the static assets: content-hashed file names, precompressed gzip/brotli variants and a manifest.
 """
 
 import os
@@ -42,6 +43,21 @@ def copy_files(src_dir, dest_dir):
             shutil.copy2(src_item, dest_item)
             print(f"Copied file: {item}")
 
+def build_static_assets(static_dir):
+    """Fingerprint and precompress the static files in place and write the asset manifest."""
+    if not os.path.exists(static_dir):
+        print(f"Warning: Static directory {static_dir} does not exist.")
+        return
+
+    from app.core.logging_config import start_logging
+    from app.core.static_assets import build_assets
+
+    start_logging()  # Otherwise the build's log records stay in the queue
+    assets = build_assets(static_dir, static_dir)
+    for logical, entry in sorted(assets.items()):
+        encodings = ", ".join(entry["encodings"]) or "uncompressed"
+        print(f"Built asset: {logical} -> {entry['path']} ({encodings})")
+
 def main():
     """Main function to prepare the application for deployment."""
     # Get the base directory of the project
@@ -64,6 +80,9 @@ def main():
     
     print("\nCopying static files...")
     copy_files(static_src, static_dest)
+
+    print("\nBuilding static assets...")
+    build_static_assets(static_dest)
     
     print("\nDeployment preparation complete!")
 
@@ -0,0 +1,66 @@
+"""
+Shared test setup.
+
+Settings are read when app.core.config is imported, so the environment is
+pointed at a scratch directory here, before any test module imports the app:
+the database, shared state and metrics files of a test run never touch the
+ones of a running server.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+_SCRATCH = tempfile.mkdtemp(prefix="app-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_SCRATCH, 'test.db')}")
+os.environ.setdefault("SHARED_STATE_PATH", os.path.join(_SCRATCH, "shared-state.db"))
+os.environ.setdefault("METRICS_DIR", os.path.join(_SCRATCH, "metrics"))
+os.environ.setdefault("LOG_ANALYTICS_STATE_PATH", os.path.join(_SCRATCH, "analytics_state.json"))
+os.environ["LLM_BACKEND_URL"] = ""  # Keyword answers only; tests pass fake backends explicitly
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    """A fresh admission controller, so rate limits do not carry over between tests."""
+    from app.api import ai_routes
+    from app.core import admission as admission_module
+
+    controller = admission_module.AdmissionController()
+    monkeypatch.setattr(admission_module, "admission", controller)
+    monkeypatch.setattr(ai_routes, "admission", controller)
+    return controller
+
+
+@pytest.fixture
+def api(admission):
+    """An application serving only the /api/ai routes (no lifespan: nothing is started)."""
+    from fastapi import FastAPI
+
+    from app.api import ai_routes
+
+    app = FastAPI()
+    app.include_router(ai_routes.router, prefix="/api/ai")
+    return app
+
+
+@pytest.fixture
+async def client(api):
+    import httpx
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def use_service(api):
+    """Serve the routes from a fresh service (own response cache, no conversation store) with the given backend."""
+    from app.api import ai_routes
+    from app.services.ai_services import HealthChatService
+    from app.services.response_cache import ResponseCache
+
+    def use(backend=None):
+        service = HealthChatService("test-model", cache=ResponseCache(ttl=60), backend=backend)
+        api.dependency_overrides[ai_routes.get_health_chat_service] = lambda: service
+        return service
+    return use
@@ -0,0 +1,127 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.admission import ConcurrencyLimiter, Overloaded, TokenBucketTable
+from app.models.ai_models import HealthTopic
+from app.services.topic_classifier import get_topic_classifier
+
+
+async def hold(limiter, priority, started, release, order=None, name=None):
+    async with limiter.slot(priority):
+        if order is not None:
+            order.append(name)
+        started.set()
+        await release.wait()
+
+
+async def test_priority_waiters_go_first():
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=4, max_wait=5.0, max_priority_queue=4)
+    release, order = asyncio.Event(), []
+    tasks = [asyncio.create_task(hold(limiter, False, asyncio.Event(), release, order, "holder"))]
+    await asyncio.sleep(0)
+    for name, priority in (("routine", False), ("first aid", True)):
+        tasks.append(asyncio.create_task(hold(limiter, priority, asyncio.Event(), release, order, name)))
+        await asyncio.sleep(0)
+    assert limiter.stats()["waiting_priority"] == 1 and limiter.stats()["waiting_routine"] == 1
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == ["holder", "first aid", "routine"]
+    assert limiter.active == 0
+
+
+async def test_full_lanes_are_shed():
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, max_wait=5.0, max_priority_queue=1)
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(hold(limiter, priority, asyncio.Event(), release)) for priority in (False, False, True)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded, match="^queue full") as routine:
+        async with limiter.slot(False):
+            pass
+    with pytest.raises(Overloaded, match="priority queue full"):
+        async with limiter.slot(True):
+            pass
+    assert routine.value.retry_after > 0 and limiter.shed == 2
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+async def test_routine_wait_is_bounded():
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=4, max_wait=0.01, max_priority_queue=4)
+    release, started = asyncio.Event(), asyncio.Event()
+    task = asyncio.create_task(hold(limiter, False, started, release))
+    await started.wait()
+    with pytest.raises(Overloaded, match="wait exceeded"):
+        async with limiter.slot(False):
+            pass
+    assert limiter.waiting == 0
+    release.set()
+    await task
+
+
+def test_token_bucket_refills():
+    buckets = TokenBucketTable(rate=2.0, burst=2, max_clients=10)
+    assert buckets.take("a", now=0.0) == 0 and buckets.take("a", now=0.0) == 0
+    assert buckets.take("a", now=0.0) == pytest.approx(0.5)
+    assert buckets.take("a", now=1.0) == 0
+
+
+async def test_empty_bucket_answers_429(admission, client):
+    admission.buckets = TokenBucketTable(rate=0.5, burst=1, max_clients=10)
+    assert (await client.post("/api/ai/health-chat", json={"message": "How much protein?"})).status_code == 200
+    response = await client.post("/api/ai/health-chat", json={"message": "How much protein?"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert admission.rate_limited == 1
+
+
+async def test_stats_endpoints_skip_admission_control(admission, client):
+    admission.buckets = TokenBucketTable(rate=0.5, burst=1, max_clients=10)
+    for path in ("/api/ai/admission", "/api/ai/health-chat/cache", "/api/ai/health-chat/context", "/api/ai/health-chat/sockets"):
+        for _ in range(3):
+            assert (await client.get(path)).status_code == 200
+    assert admission.rate_limited == 0 and admission.limiter.admitted == 0
+
+
+async def test_saturated_server_sheds_routine_but_admits_first_aid(admission, client):
+    admission.limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=0, max_wait=5.0, max_priority_queue=1)
+    release, started = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(hold(admission.limiter, False, started, release))
+    await started.wait()
+
+    response = await client.post("/api/ai/health-chat", json={"message": "Best stretches after running?"})
+    assert response.status_code == 503 and "Retry-After" in response.headers
+
+    first_aid = asyncio.create_task(client.post("/api/ai/health-chat", json={"message": "How do I treat a deep cut?"}))
+    while not admission.limiter.stats()["waiting_priority"]:
+        await asyncio.sleep(0.001)
+    release.set()
+    response = await first_aid
+    assert response.status_code == 200 and response.json()["topic"] == HealthTopic.FIRST_AID.value
+    await holder
+
+
+async def test_mentioning_first_aid_in_passing_is_routine(admission):
+    # Scored for first aid, but filed under fitness: no priority lane
+    message = "What exercises help recovery, and should I keep a first aid kit at the gym?"
+    assert get_topic_classifier().classify(message).scores.get(HealthTopic.FIRST_AID, 0) > 0
+    async with admission.admit("client", message) as topic:
+        assert topic is not HealthTopic.FIRST_AID
+        assert admission.limiter.stats()["active"] == 1
+
+
+async def test_message_is_classified_once(admission, client, monkeypatch):
+    classifier = get_topic_classifier()
+    calls = []
+
+    def classify(message):
+        calls.append(message)
+        return type(classifier).classify(classifier, message)
+
+    monkeypatch.setattr(classifier, "classify", classify)
+    message = f"How do I treat a burn? ({uuid.uuid4()})"  # Not in the response cache
+    response = await client.post("/api/ai/health-chat", json={"message": message})
+    assert response.status_code == 200 and response.json()["topic"] == HealthTopic.FIRST_AID.value
+    assert calls == [message]
@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core import chat_sockets as chat_sockets_module
+from app.core.chat_sockets import ChatConnection, ChatSocketHub, SlowConsumer
+
+
+class FakeSocket:
+    """Records frames; sends block while `stalled` is clear, like a client that stopped reading."""
+
+    def __init__(self, incoming=()):
+        self.sent = []
+        self.sending = 0
+        self.most_sending = 0
+        self.closed_with = None
+        self.stalled = asyncio.Event()
+        self.stalled.set()
+        self.incoming = list(incoming)
+
+    async def send_text(self, text):
+        self.sending += 1
+        self.most_sending = max(self.most_sending, self.sending)
+        try:
+            await self.stalled.wait()
+            await asyncio.sleep(0)
+            self.sent.append(json.loads(text))
+        finally:
+            self.sending -= 1
+
+    async def receive(self):
+        return self.incoming.pop(0)
+
+    async def close(self, code, reason=""):
+        self.closed_with = code
+
+
+def frame(text):
+    return {"type": "websocket.receive", "text": text}
+
+
+async def test_frames_are_sent_one_at_a_time_in_order():
+    socket = FakeSocket()
+    connection = ChatConnection(socket, send_timeout=5.0)
+    await asyncio.gather(*(connection.send({"type": "chunk", "text": str(i)}) for i in range(5)), connection.send({"type": "ping"}))
+    assert socket.most_sending == 1
+    assert [f.get("text") for f in socket.sent] == ["0", "1", "2", "3", "4", None]
+    assert connection.pending_bytes == 0
+
+
+async def test_heartbeat_ping_waits_for_the_frame_being_sent():
+    socket = FakeSocket()
+    socket.stalled.clear()
+    hub = ChatSocketHub(max_connections=10, heartbeat_interval=0.02, idle_timeout=60.0, send_timeout=5.0)
+    connection = ChatConnection(socket, send_timeout=5.0)
+    hub._connections.add(connection)
+    answer = asyncio.create_task(connection.send({"type": "response", "response": "Drink water."}))
+    connection.last_sent = 0.0  # Due for a ping as far as the hub can tell
+    heartbeat = asyncio.create_task(hub._heartbeat())
+    await asyncio.sleep(0.03)
+    assert socket.most_sending == 1 and socket.sent == []
+    socket.stalled.set()
+    await answer
+    await asyncio.sleep(0.03)
+    assert [f["type"] for f in socket.sent][:2] == ["response", "ping"]
+    hub._connections.clear()
+    heartbeat.cancel()
+
+
+async def test_queued_frames_are_bounded_in_encoded_bytes():
+    socket = FakeSocket()
+    socket.stalled.clear()
+    text = "é" * 40  # 40 characters, 80 bytes
+    connection = ChatConnection(socket, send_timeout=5.0, send_buffer=200)
+    first = asyncio.create_task(connection.send({"text": text}))
+    await asyncio.sleep(0)
+    assert connection.pending_bytes == len(json.dumps({"text": text}, separators=(",", ":")).encode())
+    second = asyncio.create_task(connection.send({"text": text}))
+    await asyncio.sleep(0)
+    # Counting characters, a third frame would still fit in 200
+    with pytest.raises(SlowConsumer):
+        await connection.send({"text": text})
+    assert socket.closed_with == 1008 and connection.closed
+    socket.stalled.set()
+    await first  # Already on its way when the connection was closed
+    with pytest.raises(SlowConsumer):
+        await second
+    assert connection.pending_bytes == 0
+
+
+async def test_single_large_frame_is_sent_when_nothing_is_queued():
+    socket = FakeSocket()
+    connection = ChatConnection(socket, send_timeout=5.0, send_buffer=10)
+    await connection.send({"response": "x" * 100})
+    assert len(socket.sent) == 1 and socket.closed_with is None
+
+
+async def test_blocked_send_times_out():
+    socket = FakeSocket()
+    socket.stalled.clear()
+    connection = ChatConnection(socket, send_timeout=0.01)
+    with pytest.raises(SlowConsumer):
+        await connection.send({"type": "response"})
+    assert socket.closed_with == 1008
+
+
+async def test_message_size_is_measured_in_bytes(monkeypatch):
+    monkeypatch.setattr(chat_sockets_module.settings, "WS_MAX_MESSAGE_BYTES", 100)
+    ascii_message = json.dumps({"message": "a" * 80})
+    wide_message = json.dumps({"message": "é" * 40}, ensure_ascii=False)  # 54 characters, 94 bytes
+    wider_message = json.dumps({"message": "é" * 45}, ensure_ascii=False)  # 59 characters, 104 bytes
+    connection = ChatConnection(FakeSocket([frame(ascii_message), frame(wide_message), frame(wider_message)]), send_timeout=5.0)
+    assert (await connection.receive())["message"] == "a" * 80
+    assert (await connection.receive())["message"] == "é" * 40
+    with pytest.raises(ValueError, match="limited to 100 bytes"):
+        await connection.receive()
@@ -0,0 +1,136 @@
+import uuid
+
+import pytest
+
+from app.core.database import init_db
+from app.models.ai_models import HealthTopic
+from app.services.context_builder import ContextBuilder, estimate_tokens
+from app.services.conversation_store import ConversationStore, StoredMessage
+
+TURN_TOKENS = (3 + 4) + (2 + 4)  # "question N" and "answer N", each with the per-message overhead
+
+
+class FakeStore:
+    """Stands in for ConversationStore.get_since and records what was asked for."""
+
+    def __init__(self):
+        self.messages = {}
+        self.calls = []
+
+    def add_turns(self, conversation_id, turns, topic="fitness"):
+        messages = self.messages.setdefault(conversation_id, [])
+        for _ in range(turns):
+            i = len(messages) // 2
+            for role, text in (("user", f"question {i}"), ("assistant", f"answer {i}")):
+                messages.append(StoredMessage(len(messages), role, text, topic, 0.0))
+
+    async def get_since(self, conversation_id, seq):
+        self.calls.append((conversation_id, seq))
+        return [m for m in self.messages.get(conversation_id, []) if m.seq >= seq]
+
+
+@pytest.fixture
+def store():
+    return FakeStore()
+
+
+async def test_history_within_the_budget_is_kept_verbatim(store):
+    builder = ContextBuilder(store, max_tokens=10 * TURN_TOKENS)
+    store.add_turns("c", 3)
+    context = await builder.build("c")
+    assert context.summary == ""
+    assert [m["content"] for m in context.messages] == ["question 0", "answer 0", "question 1", "answer 1", "question 2", "answer 2"]
+    assert context.tokens == 3 * TURN_TOKENS
+    assert estimate_tokens("question 0") == 3  # TURN_TOKENS assumes this
+
+
+async def test_history_that_fits_exactly_is_not_folded(store):
+    builder = ContextBuilder(store, max_tokens=2 * TURN_TOKENS)
+    store.add_turns("c", 2)
+    context = await builder.build("c")
+    assert len(context.messages) == 4 and context.summary == "" and context.tokens == builder.max_tokens
+
+
+async def test_oldest_whole_turns_fold_once_the_budget_is_exceeded(store):
+    builder = ContextBuilder(store, max_tokens=3 * TURN_TOKENS, summary_max_tokens=30)
+    store.add_turns("c", 3)
+    assert (await builder.build("c")).summary == ""
+    store.add_turns("c", 1)
+    context = await builder.build("c")
+    # Folding a turn adds a summary, which costs tokens too, so more than one turn goes
+    assert [m["content"] for m in context.messages] == ["question 3", "answer 3"]
+    assert context.tokens <= builder.max_tokens
+    assert context.summary.startswith("Summary of the 3 earlier turns of this conversation (topics: fitness)")
+    assert context.summary.endswith("- user: question 2; assistant: answer 2")
+    assert builder.stats()["turns_folded"] == 3
+
+
+async def test_message_larger_than_the_budget_is_folded(store):
+    builder = ContextBuilder(store, max_tokens=40)
+    store.messages["c"] = [StoredMessage(0, "user", "Long question. " + "word " * 100, "general", 0.0)]
+    context = await builder.build("c")
+    assert context.messages == [] and context.tokens <= 40
+    # Only the first sentence is kept in the summary line
+    assert context.summary.endswith("- user: Long question.")
+
+
+async def test_summary_drops_its_oldest_lines_over_its_budget(store):
+    builder = ContextBuilder(store, max_tokens=200, summary_max_tokens=20)
+    store.add_turns("c", 30)
+    context = await builder.build("c")
+    summary = builder._contexts["c"].summary
+    assert summary.tokens <= 20 and summary.dropped_turns > 0
+    assert f"the oldest {summary.dropped_turns} are left out" in context.summary
+    assert "question 0" not in context.summary
+    assert summary.turns == summary.dropped_turns + len(summary.lines)
+    assert context.tokens <= builder.max_tokens
+
+
+async def test_later_builds_read_only_new_messages(store):
+    builder = ContextBuilder(store, max_tokens=3 * TURN_TOKENS)
+    store.add_turns("c", 2)
+    await builder.build("c")
+    store.add_turns("c", 2)
+    context = await builder.build("c")
+    assert store.calls == [("c", 0), ("c", 4)]
+    assert [m["content"] for m in context.messages][-2:] == ["question 3", "answer 3"]
+    stats = builder.stats()
+    assert stats["builds"] == 2 and stats["rebuilds"] == 1 and stats["messages_added"] == 8
+    # Nothing new: nothing added, nothing recounted
+    await builder.build("c")
+    assert store.calls[-1] == ("c", 8) and builder.stats()["messages_added"] == 8
+
+
+async def test_messages_seen_before_are_not_added_twice(store):
+    builder = ContextBuilder(store, max_tokens=10 * TURN_TOKENS)
+    store.add_turns("c", 1)
+    await builder.build("c")
+    context = builder._contexts["c"]
+    # A concurrent request read an overlapping range
+    assert context.add(store.messages["c"], builder.max_tokens) == []
+    assert len(context.entries) == 2 and context.tokens == TURN_TOKENS
+
+
+async def test_evicted_conversation_is_rebuilt_from_the_start(store):
+    builder = ContextBuilder(store, max_tokens=10 * TURN_TOKENS, max_conversations=1)
+    store.add_turns("a", 1)
+    store.add_turns("b", 1)
+    await builder.build("a")
+    await builder.build("b")
+    context = await builder.build("a")
+    assert store.calls[-1] == ("a", 0) and len(context.messages) == 2
+    assert builder.stats()["rebuilds"] == 3 and builder.stats()["conversations"] == 1
+
+
+async def test_follows_a_conversation_store():
+    init_db()
+    conversations = ConversationStore(max_messages=4, batch_size=3)
+    builder = ContextBuilder(conversations, max_tokens=10 * TURN_TOKENS)
+    conversation_id = str(uuid.uuid4())
+    await conversations.record_turn(conversation_id, "question 0", "answer 0", HealthTopic.FITNESS, is_new=True)
+    assert len((await builder.build(conversation_id)).messages) == 2
+    await conversations.record_turn(conversation_id, "question 1", "answer 1", HealthTopic.FITNESS)
+    context = await builder.build(conversation_id)
+    assert [m["content"] for m in context.messages] == ["question 0", "answer 0", "question 1", "answer 1"]
+    assert builder.stats()["rebuilds"] == 1
+    await conversations.flush()
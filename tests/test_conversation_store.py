@@ -0,0 +1,127 @@
+import uuid
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import SessionLocal, init_db
+from app.models.ai_models import HealthTopic
+from app.models.db_models import HealthMessageRecord
+from app.services.conversation_store import ConversationStore
+from app.services.shared_state import SharedStore
+
+
+@pytest.fixture
+async def store():
+    init_db()
+    store = ConversationStore(max_messages=4, batch_size=3)  # No write-behind task: tests flush explicitly
+    yield store
+    await store.flush()
+
+
+async def record(store, conversation_id, turns):
+    for i in range(turns):
+        await store.record_turn(conversation_id, f"question {i}", f"answer {i}", HealthTopic.FITNESS, is_new=i == 0)
+
+
+async def test_history_pages_from_hot_tier_and_database(store):
+    conversation_id = str(uuid.uuid4())
+    await record(store, conversation_id, 5)  # 10 messages, the newest 4 hot
+    await store.flush()
+
+    page, cursor = await store.get_history(conversation_id, limit=3)
+    assert [m.seq for m in page] == [7, 8, 9] and cursor == 7
+    page, cursor = await store.get_history(conversation_id, limit=3, before=cursor)
+    assert [m.seq for m in page] == [4, 5, 6] and cursor == 4
+    page, cursor = await store.get_history(conversation_id, limit=10, before=cursor)
+    assert [m.seq for m in page] == [0, 1, 2, 3] and cursor is None
+    assert page[0].content == "question 0" and page[1].role == "assistant"
+
+
+async def test_get_since_reads_only_newer_messages(store):
+    conversation_id = str(uuid.uuid4())
+    await record(store, conversation_id, 5)
+    assert [m.seq for m in await store.get_since(conversation_id, 8)] == [8, 9]
+    assert await store.get_since(conversation_id, 10) == []
+    # Older than the hot tail: read back from the database
+    assert [m.seq for m in await store.get_since(conversation_id, 0)] == list(range(10))
+
+
+async def test_evicted_conversation_continues_after_last_seq(store):
+    conversation_id = str(uuid.uuid4())
+    await record(store, conversation_id, 2)
+    store._drop_hot(conversation_id)
+    message = await store.append(conversation_id, "user", "again")
+    assert message.seq == 4
+
+
+async def test_transient_write_error_is_retried(store, monkeypatch):
+    conversation_id = str(uuid.uuid4())
+    write_batch = ConversationStore._write_batch
+    calls = []
+
+    def locked_once(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        write_batch(rows)
+
+    monkeypatch.setattr(ConversationStore, "_write_batch", staticmethod(locked_once))
+    await record(store, conversation_id, 1)
+    await store.flush()
+    assert store.write_errors == 1 and store.stats()["pending_writes"] == 2
+    await store.flush()
+    assert store.stats()["pending_writes"] == 0 and store.dead_letters == 0
+    page, _ = await ConversationStore(max_messages=4).get_history(conversation_id)
+    assert [m.content for m in page] == ["question 0", "answer 0"]
+
+
+async def test_rows_that_cannot_be_written_are_dead_lettered(store):
+    conversation_id = str(uuid.uuid4())
+    # A row another writer already stored under seq 1
+    with SessionLocal() as session:
+        session.execute(insert(HealthMessageRecord), [{
+            "conversation_id": conversation_id, "seq": 1, "role": "assistant",
+            "content": "taken", "topic": "general", "timestamp": 0.0,
+        }])
+        session.commit()
+    await record(store, conversation_id, 2)
+    await store.flush()
+
+    assert store.dead_letters == 1 and store.stats()["pending_writes"] == 0
+    assert store.flushed == 3
+    page, _ = await ConversationStore(max_messages=4).get_history(conversation_id)
+    assert [m.content for m in page] == ["question 0", "taken", "question 1", "answer 1"]
+
+
+async def test_pending_writes_are_capped(store):
+    small = ConversationStore(max_messages=4, max_pending=5)
+    await record(small, str(uuid.uuid4()), 4)
+    assert small.stats()["pending_writes"] == 5 and small.dropped_writes == 3
+    assert small._pending[0]["seq"] == 3
+    small._pending.clear()
+
+
+async def test_seqs_continue_after_the_shared_tail_is_pruned(store, tmp_path):
+    path = str(tmp_path / "shared.db")
+    shared = [SharedStore(path, poll_interval=0.0) for _ in range(2)]
+    first, second = (ConversationStore(max_messages=4, batch_size=3, shared=s) for s in shared)
+    conversation_id = str(uuid.uuid4())
+    await record(first, conversation_id, 2)
+    await first.flush()
+    # This worker's own housekeeping prunes the tail it holds
+    shared[0].conversation_ttl = 0.0
+    shared[0]._maintain()
+    shared[0].conversation_ttl = 86400.0
+    assert shared[0].load_messages(conversation_id, 10) == []
+
+    # The worker that held the tail carries on after it, not from 0; the other one follows
+    assert (await first.append(conversation_id, "user", "from the first worker")).seq == 4
+    assert (await second.append(conversation_id, "user", "from the second worker")).seq == 5
+    await first.flush()
+    await second.flush()
+    assert first.dead_letters == second.dead_letters == 0
+    page, _ = await ConversationStore(max_messages=4).get_history(conversation_id, limit=10)
+    assert [m.seq for m in page] == list(range(6))
+    for s in shared:
+        s.close()
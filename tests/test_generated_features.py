@@ -0,0 +1,105 @@
+import os
+import sys
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.generated_features import GeneratedFeatures
+
+FEATURE = """
+from fastapi import APIRouter
+
+router = APIRouter()
+
+
+@router.get("/hello")
+async def hello():
+    return {{"version": {version}}}
+"""
+
+
+def write(path, text):
+    path.write_text(text)
+    # A new signature even if the clock did not tick between writes
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def features(tmp_path):
+    package = f"generated_{uuid.uuid4().hex}"
+    yield GeneratedFeatures(str(tmp_path), package=package, check_interval=0.0)
+    for name in [name for name in sys.modules if name.startswith(package)]:
+        del sys.modules[name]
+
+
+@pytest.fixture
+async def client(features):
+    app = FastAPI()
+    app.mount("/generated", features)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_features_are_listed_without_importing_them(client, features, tmp_path):
+    write(tmp_path / "greeting.py", FEATURE.format(version=1))
+    write(tmp_path / "_private.py", FEATURE.format(version=1))
+    response = await client.get("/generated/")
+    assert response.json()["features"] == {"greeting": {"loaded": False, "routes": []}}
+    assert features.imports == 0
+
+
+async def test_rewritten_feature_is_reloaded(client, features, tmp_path):
+    write(tmp_path / "greeting.py", FEATURE.format(version=1))
+    assert (await client.get("/generated/greeting/hello")).json() == {"version": 1}
+    first = await features.get("greeting")
+
+    write(tmp_path / "greeting.py", FEATURE.format(version=2))
+    assert (await client.get("/generated/greeting/hello")).json() == {"version": 2}
+    assert features.imports == 1 and features.reloads == 1
+    # The previous module object is left intact for requests still using it
+    assert first.module is not (await features.get("greeting")).module
+    assert len(first.router.routes) == 1
+
+
+async def test_broken_rewrite_keeps_the_previous_version(client, features, tmp_path):
+    write(tmp_path / "greeting.py", FEATURE.format(version=1))
+    await client.get("/generated/greeting/hello")
+    module = sys.modules[f"{features.package}.greeting"]
+
+    write(tmp_path / "greeting.py", FEATURE.format(version=2) + "\nraise RuntimeError('half written')\n")
+    assert (await client.get("/generated/greeting/hello")).json() == {"version": 1}
+    write(tmp_path / "greeting.py", "router = None\n")
+    assert (await client.get("/generated/greeting/hello")).json() == {"version": 1}
+    assert features.failures == 2 and features.reloads == 0
+    assert sys.modules[f"{features.package}.greeting"] is module
+
+    write(tmp_path / "greeting.py", FEATURE.format(version=3))
+    assert (await client.get("/generated/greeting/hello")).json() == {"version": 3}
+
+
+async def test_feature_that_never_loaded_is_a_server_error(client, tmp_path):
+    write(tmp_path / "broken.py", "import does_not_exist\n")
+    assert (await client.get("/generated/broken/hello")).status_code == 500
+    assert (await client.get("/generated/missing/hello")).status_code == 404
+
+
+async def test_new_and_deleted_files_are_noticed(client, tmp_path):
+    assert (await client.get("/generated/greeting/hello")).status_code == 404
+    write(tmp_path / "greeting.py", FEATURE.format(version=1))
+    assert (await client.get("/generated/greeting/hello")).status_code == 200
+    os.remove(tmp_path / "greeting.py")
+    assert (await client.get("/generated/greeting/hello")).status_code == 404
+
+
+async def test_unchanged_feature_is_not_reimported(client, features, tmp_path):
+    features.check_interval = 60.0
+    write(tmp_path / "greeting.py", FEATURE.format(version=1))
+    features.scan()
+    await client.get("/generated/greeting/hello")
+    write(tmp_path / "greeting.py", FEATURE.format(version=2))
+    # Not checked again within the interval
+    assert (await client.get("/generated/greeting/hello")).json() == {"version": 1}
+    assert features.imports == 1 and features.reloads == 0
@@ -0,0 +1,115 @@
+import asyncio
+
+from app.core.config import settings
+from app.models.ai_models import HealthTopic
+from app.services.llm_backend import LLMBackend
+
+
+class CountingBackend(LLMBackend):
+    """Echoes the question; records how many completions ran at once."""
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, messages):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return f"Answer to: {messages[-1]['content']}"
+        finally:
+            self.in_flight -= 1
+
+
+async def batch(client, *messages, **body):
+    return await client.post(
+        "/api/ai/health-chat/batch", json={"requests": [{"message": m} for m in messages], **body}
+    )
+
+
+async def test_results_keep_the_input_order(client, use_service):
+    use_service()
+    messages = ["How much protein?", "Best stretches after running?", "How do I treat a burn?"]
+    response = await batch(client, *messages)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["index"] for item in results] == [0, 1, 2]
+    assert [item["response"]["topic"] for item in results] == [
+        HealthTopic.NUTRITION.value, HealthTopic.FITNESS.value, HealthTopic.FIRST_AID.value
+    ]
+    assert all(item["error"] is None for item in results)
+    # Every item is its own conversation
+    assert len({item["response"]["conversation_id"] for item in results}) == 3
+
+
+async def test_duplicate_messages_are_generated_once(client, use_service):
+    backend = CountingBackend()
+    use_service(backend)
+    response = await batch(client, "How much protein?", "how much  PROTEIN", "Any tips for sleep?", "How much protein?")
+    results = response.json()["results"]
+    assert backend.calls == 2
+    assert results[0]["response"]["response"] == results[1]["response"]["response"] == results[3]["response"]["response"]
+
+
+async def test_failed_item_does_not_fail_the_batch(client, use_service, monkeypatch):
+    service = use_service()
+    answer = service.answer
+
+    async def flaky(message, passages=None, topic=None):
+        if "burn" in message:
+            raise RuntimeError("generation failed")
+        return await answer(message, passages, topic)
+
+    monkeypatch.setattr(service, "answer", flaky)
+    response = await batch(client, "How much protein?", "How do I treat a burn?")
+    assert response.status_code == 200
+    ok, failed = response.json()["results"]
+    assert ok["response"]["topic"] == HealthTopic.NUTRITION.value and ok["error"] is None
+    assert failed == {"index": 1, "response": None, "error": "generation failed"}
+
+
+async def test_max_concurrency_is_respected(client, use_service):
+    backend = CountingBackend()
+    use_service(backend)
+    response = await batch(client, *(f"How much protein in meal {i}?" for i in range(6)), max_concurrency=2)
+    assert response.status_code == 200
+    assert backend.calls == 6 and backend.max_in_flight == 2
+
+
+async def test_max_concurrency_is_capped_by_the_setting(client, use_service, monkeypatch):
+    monkeypatch.setattr(settings, "HEALTH_CHAT_BATCH_CONCURRENCY", 3)
+    backend = CountingBackend()
+    use_service(backend)
+    await batch(client, *(f"How much protein in meal {i}?" for i in range(6)), max_concurrency=100)
+    assert backend.max_in_flight == 3
+
+
+async def test_oversized_batch_is_rejected(client, use_service, monkeypatch):
+    monkeypatch.setattr(settings, "HEALTH_CHAT_BATCH_MAX_ITEMS", 2)
+    use_service()
+    response = await batch(client, "a", "b", "c")
+    assert response.status_code == 413
+    assert "at most 2" in response.json()["detail"]
+
+
+async def test_empty_batch_is_invalid(client, use_service):
+    use_service()
+    assert (await batch(client)).status_code == 422
+    assert (await batch(client, "How much protein?", max_concurrency=0)).status_code == 422
+
+
+async def test_failed_retrieval_answers_every_item_without_passages(client, use_service, monkeypatch):
+    service = use_service()
+
+    def retrieve(messages):
+        raise OSError("index unreadable")
+
+    monkeypatch.setattr(service, "_retrieve", retrieve)
+    response = await batch(client, "How much protein?", "How do I treat a burn?")
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["error"] for item in results] == [None, None]
+    assert all("related_passages" not in item["response"]["additional_info"] for item in results)
@@ -0,0 +1,106 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api import ai_routes
+from app.core.admission import TokenBucketTable
+from app.core.chat_sockets import ChatSocketHub
+from app.models.ai_models import HealthTopic
+from app.services.llm_backend import LLMBackend
+
+
+class PiecesBackend(LLMBackend):
+    async def complete(self, messages):
+        return "Rest and ice."
+
+    async def stream(self, messages):
+        for piece in ("Rest ", "and ", "ice."):
+            yield piece
+
+
+@pytest.fixture
+def sockets(monkeypatch):
+    """A fresh hub, so connections and the heartbeat task stay with the test's own event loop."""
+    hub = ChatSocketHub(max_connections=2, heartbeat_interval=30.0, idle_timeout=600.0, send_timeout=5.0)
+    monkeypatch.setattr(ai_routes, "chat_sockets", hub)
+    return hub
+
+
+@pytest.fixture
+def connect(api, sockets, use_service, monkeypatch):
+    # The socket endpoint takes its service from the registry, not from a dependency
+    service = use_service(PiecesBackend())
+
+    async def get(model_name=None):
+        return service
+
+    monkeypatch.setattr(ai_routes.service_registry, "get", get)
+    with TestClient(api) as client:
+        yield lambda path="/api/ai/health-chat/ws": client.websocket_connect(path)
+
+
+def test_answers_messages_on_one_conversation(connect, sockets):
+    with connect() as ws:
+        assert ws.receive_json() == {"type": "ready", "conversation_id": None}
+        ws.send_json({"message": "How much protein should I eat?"})
+        first = ws.receive_json()
+        assert first["type"] == "response" and first["topic"] == HealthTopic.NUTRITION.value
+        assert first["response"] == "Rest and ice."
+        ws.send_json({"message": "And after a workout?"})
+        assert ws.receive_json()["conversation_id"] == first["conversation_id"]
+        assert sockets.stats()["open"] == 1
+    assert sockets.stats()["open"] == 0 and sockets.accepted == 1
+
+
+def test_streams_metadata_chunks_and_done(connect):
+    with connect("/api/ai/health-chat/ws?conversation_id=abc") as ws:
+        assert ws.receive_json()["conversation_id"] == "abc"
+        ws.send_json({"message": "I sprained my ankle", "stream": True})
+        frames = [ws.receive_json() for _ in range(5)]
+    assert [frame["type"] for frame in frames] == ["metadata", "chunk", "chunk", "chunk", "done"]
+    assert frames[0]["conversation_id"] == frames[-1]["conversation_id"] == "abc"
+    assert "".join(frame["text"] for frame in frames[1:4]) == "Rest and ice."
+
+
+def test_bad_frames_get_an_error_and_keep_the_connection(connect):
+    with connect() as ws:
+        ws.receive_json()
+        ws.send_json({"user_info": {"age": 30}})
+        invalid = ws.receive_json()
+        assert invalid["type"] == "error" and invalid["status"] == 422
+        assert invalid["detail"] == ["message: Input should be a valid string"]
+        ws.send_text("not json")
+        assert ws.receive_json()["status"] == 400
+        ws.send_bytes(b"{}")
+        assert ws.receive_json() == {"type": "error", "status": 400, "detail": "Messages must be JSON text frames"}
+        ws.send_json({"message": "How much protein should I eat?"})
+        assert ws.receive_json()["type"] == "response"
+
+
+def test_ping_is_answered(connect):
+    with connect() as ws:
+        ws.receive_json()
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+
+def test_rate_limited_message_gets_a_429_frame(connect, admission):
+    admission.buckets = TokenBucketTable(rate=0.5, burst=1, max_clients=10)
+    with connect() as ws:
+        ws.receive_json()
+        ws.send_json({"message": "How much protein should I eat?"})
+        assert ws.receive_json()["type"] == "response"
+        ws.send_json({"message": "How much protein should I eat?"})
+        limited = ws.receive_json()
+        assert limited["type"] == "error" and limited["status"] == 429 and limited["retry_after"] > 0
+    assert admission.rate_limited == 1
+
+
+def test_connections_over_the_limit_are_refused(connect, sockets):
+    with connect() as first, connect() as second:
+        first.receive_json(), second.receive_json()
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with connect() as third:
+                third.receive_json()
+        assert refused.value.code == 1013
+    assert sockets.refused == 1
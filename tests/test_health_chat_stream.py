@@ -0,0 +1,91 @@
+import json
+import uuid
+
+from app.models.ai_models import HealthTopic
+from app.services.ai_services import TOPIC_RESPONSES
+from app.services.llm_backend import LLMBackend
+
+
+class PiecesBackend(LLMBackend):
+    """Streams a fixed answer in pieces, optionally failing after `fail_after` of them."""
+
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def complete(self, messages):
+        self.calls += 1
+        return "".join(self.pieces)
+
+    async def stream(self, messages):
+        self.calls += 1
+        for i, piece in enumerate(self.pieces):
+            if i == self.fail_after:
+                raise ConnectionError("backend went away")
+            yield piece
+
+
+def events(response):
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        parsed.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+async def stream(client, message, **body):
+    return await client.post("/api/ai/health-chat/stream", json={"message": message, **body})
+
+
+async def test_streams_model_pieces(client, use_service):
+    use_service(PiecesBackend(["Drink ", "water ", "often."]))
+    response = await stream(client, "How much protein should I eat?")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    (first, metadata), *chunks, (last, done) = events(response)
+    assert first == "metadata" and metadata["topic"] == HealthTopic.NUTRITION.value
+    assert [event for event, _ in chunks] == ["chunk"] * 3
+    assert "".join(data["text"] for _, data in chunks) == "Drink water often."
+    assert last == "done" and done == {"conversation_id": metadata["conversation_id"], "finish_reason": "stop"}
+
+
+async def test_conversation_id_is_kept(client, use_service):
+    use_service()
+    conversation_id = str(uuid.uuid4())
+    (_, metadata), *_, (_, done) = events(await stream(client, "Any tips for sleep?", conversation_id=conversation_id))
+    assert metadata["conversation_id"] == done["conversation_id"] == conversation_id
+
+
+async def test_second_stream_is_served_from_the_cache(client, use_service):
+    backend = PiecesBackend(["Walk ", "every day."])
+    use_service(backend)
+    first = events(await stream(client, "Is walking good exercise?"))
+    second = events(await stream(client, "is walking good exercise"))
+    assert backend.calls == 1
+    text = lambda parsed: "".join(data["text"] for event, data in parsed if event == "chunk")
+    assert text(first) == text(second) == "Walk every day."
+
+
+async def test_backend_failure_before_any_piece_streams_the_keyword_answer(client, use_service):
+    use_service(PiecesBackend(["never sent"], fail_after=0))
+    parsed = events(await stream(client, "How do I treat a burn?"))
+    assert parsed[0][1]["topic"] == HealthTopic.FIRST_AID.value
+    text = " ".join(data["text"].strip() for event, data in parsed if event == "chunk")
+    assert text == TOPIC_RESPONSES[HealthTopic.FIRST_AID]["response"]
+    assert parsed[-1][0] == "done"
+
+
+async def test_backend_failure_mid_answer_ends_with_an_error_event(client, use_service):
+    use_service(PiecesBackend(["Rest ", "and ", "ice."], fail_after=2))
+    parsed = events(await stream(client, "I sprained my ankle"))
+    assert [event for event, _ in parsed] == ["metadata", "chunk", "chunk", "error"]
+    assert "backend went away" in parsed[-1][1]["detail"]
+
+
+async def test_invalid_request_is_rejected(client, use_service):
+    use_service()
+    response = await client.post("/api/ai/health-chat/stream", json={"conversation_id": "x"})
+    assert response.status_code == 422
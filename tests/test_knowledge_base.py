@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from app.services.knowledge_base import KnowledgeBaseIndex, build_index
+
+pytest.importorskip("sklearn")  # Needed to build the index, not to serve it
+
+PASSAGES = [
+    {"id": "protein", "title": "Protein needs", "topic": "nutrition", "text": "Adults need about 0.8 grams of protein per kilogram of body weight."},
+    {"id": "sleep", "title": "Sleep", "topic": "mental_health", "text": "Most adults need seven to nine hours of sleep; stress makes sleep worse."},
+    {"id": "burns", "title": "Burns", "topic": "first_aid", "text": "Cool a burn under running water for twenty minutes. Do not use ice."},
+    {"id": "unicode", "title": "Café", "topic": "nutrition", "text": "Crème fraîche and café au lait contain saturated fat."},
+]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("kb")
+    corpus = directory / "corpus.jsonl"
+    corpus.write_text("\n".join(json.dumps(p) for p in PASSAGES), encoding="utf-8")
+    build_index(str(corpus), str(directory / "index"))
+    return KnowledgeBaseIndex(str(directory / "index"))
+
+
+def test_search_ranks_matching_passages(index):
+    hits = index.search(["how much protein per kilogram"], k=2)[0]
+    assert hits[0]["id"] == "protein" and hits[0]["text"].startswith("Adults need")
+    assert all(0 < hit["score"] <= 1 for hit in hits)
+
+
+def test_batch_matches_single_queries(index):
+    queries = ["burn and cold water", "stress and sleep", "crème fraîche", "nothing known here"]
+    batch = index.search(queries, k=3, min_score=0.0)
+    assert batch == [index.search([query], k=3)[0] for query in queries]
+    assert [hits[0]["id"] for hits in batch[:3]] == ["burns", "sleep", "unicode"]
+    assert batch[3] == []
+
+
+def test_terms_longer_than_any_vocabulary_entry_do_not_match(index):
+    width = index._terms.dtype.itemsize
+    term = (index._terms[0] + b"x" * width).decode("utf-8")
+    assert index._columns([term.encode("utf-8")]).tolist() == [-1]
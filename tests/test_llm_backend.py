@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_backend import (
+    CircuitBreaker, CircuitOpenError, GuardedBackend, LLMBackend, LLMBackendError, SingleFlight
+)
+
+PROMPT = [{"role": "user", "content": "How much protein?"}]
+
+
+class FakeBackend(LLMBackend):
+    """Answers after `delay`, or raises `error`; counts upstream calls."""
+
+    def __init__(self, error=None, delay=0.0):
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return "Eat enough protein."
+
+
+def test_backend_must_implement_complete():
+    with pytest.raises(TypeError):
+        LLMBackend()
+
+
+def test_breaker_opens_at_the_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()
+    # A failed trial re-opens the circuit at once, below the threshold count
+    breaker.record_failure()
+    breaker.reset_timeout = 60
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_successful_trial_closes_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+async def test_guarded_backend_stops_calling_a_failing_backend():
+    upstream = FakeBackend(error=LLMBackendError("down"))
+    backend = GuardedBackend(upstream, CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    for _ in range(2):
+        with pytest.raises(LLMBackendError):
+            await backend.complete(PROMPT)
+    with pytest.raises(CircuitOpenError):
+        await backend.complete(PROMPT)
+    assert upstream.calls == 2
+
+
+async def test_cancelled_trial_releases_the_half_open_slot():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    backend = GuardedBackend(FakeBackend(delay=10), breaker)
+    with pytest.raises(asyncio.TimeoutError):
+        # The timeout cancels the shared call itself, not only the shielded waiter
+        await asyncio.wait_for(backend._guarded_complete(PROMPT), 0.01)
+    backend.backend = FakeBackend()
+    assert await backend.complete(PROMPT) == "Eat enough protein."
+    assert breaker.state == "closed"
+
+
+async def test_single_flight_callers_share_one_call():
+    upstream = FakeBackend(delay=0.01)
+    backend = GuardedBackend(upstream, CircuitBreaker())
+    answers = await asyncio.gather(*(backend.complete(PROMPT) for _ in range(5)))
+    assert answers == ["Eat enough protein."] * 5
+    assert upstream.calls == 1 and backend.single_flight.coalesced == 4
+    # Finished calls are forgotten: the next one goes upstream again
+    await backend.complete(PROMPT)
+    assert upstream.calls == 2
+
+
+async def test_single_flight_error_reaches_every_waiter():
+    flight = SingleFlight()
+    upstream = FakeBackend(error=LLMBackendError("down"), delay=0.01)
+    results = await asyncio.gather(
+        *(flight.do("key", lambda: upstream.complete(PROMPT)) for _ in range(3)), return_exceptions=True
+    )
+    assert upstream.calls == 1
+    assert all(isinstance(result, LLMBackendError) for result in results)
+
+
+async def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    upstream = FakeBackend(delay=0.02)
+    first = asyncio.ensure_future(flight.do("key", lambda: upstream.complete(PROMPT)))
+    second = asyncio.ensure_future(flight.do("key", lambda: upstream.complete(PROMPT)))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "Eat enough protein."
+    assert upstream.calls == 1
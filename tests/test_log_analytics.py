@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from app.core.log_analytics import LogAggregates, load_state, log_files, parse_line, save_state, scan
+from app.core.logging_config import DATE_FORMAT, LOG_FORMAT, JsonFormatter
+
+START = datetime(2026, 3, 1, 9, 15).timestamp()
+TEXT = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+
+
+def line(message, name="app.services.ai_services", level=logging.INFO, minutes=0, formatter=TEXT):
+    record = logging.LogRecord(name, level, "/app/services/ai_services.py", 42, message, None, None, func="answer")
+    record.created = START + minutes * 60
+    return formatter.format(record) + "\n"
+
+
+def write(path, *lines, mode="a"):
+    with open(path, mode, encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def run(path, state):
+    """One incremental run over the log and its backups; returns the counts so far."""
+    aggregates, offsets = load_state(state, "1h")
+    save_state(state, aggregates, scan(log_files(path, 5), aggregates, offsets))
+    return aggregates
+
+
+def topics(aggregates):
+    table = aggregates.table("topic")
+    return {} if table.empty else {topic: int(n) for topic, n in table.sum().items()}
+
+
+@pytest.fixture
+def log(tmp_path):
+    return str(tmp_path / "app.log"), str(tmp_path / "state.json")
+
+
+def test_parses_text_and_json_lines():
+    text = parse_line(line("Generated health response for topic: nutrition"))
+    assert text == ("2026-03-01 09:15:00", "INFO", "app.services.ai_services", "Generated health response for topic: nutrition")
+    structured = parse_line(line("Shedding POST /api/ai/health-chat", name="app.core.admission", formatter=JsonFormatter()))
+    assert structured == ("2026-03-01 09:15:00", "INFO", "app.core.admission", "Shedding POST /api/ai/health-chat")
+    # Continuation lines of a traceback are not records
+    assert parse_line('  File "app/main.py", line 3, in <module>\n') is None
+    assert parse_line("{not json\n") is None
+
+
+def test_counts_topics_errors_and_chat_traffic():
+    aggregates = LogAggregates("1h")
+    rows = [parse_line(text) for text in (
+        line("Generated health response for topic: nutrition"),
+        line("Generated health response for topic: nutrition", minutes=50),
+        line("LLM backend unavailable, using keyword answer: timeout", level=logging.WARNING),
+        line("HTTPException: 404 Not Found for GET /api/missing", name="app.core.error_handling", level=logging.WARNING),
+        line("Answered health chat batch of 7 requests (3 unique messages)"),
+    )]
+    aggregates.add(rows, unparsed=2)
+    assert aggregates.records == 5 and aggregates.unparsed == 2
+    chat = aggregates.table("chat")
+    assert list(chat.index) == [pd.Timestamp("2026-03-01 09:00"), pd.Timestamp("2026-03-01 10:00")]
+    assert chat.sum().to_dict() == {"answered": 2, "batched": 7, "llm_fallback": 1}
+    assert aggregates.table("status").sum().to_dict() == {"404": 1}
+    assert aggregates.table("path").columns.tolist() == ["GET /api/missing"]
+    assert aggregates.error_rates().loc[pd.Timestamp("2026-03-01 09:00"), "warning_or_worse"] == 0.5
+
+
+def test_rerun_reads_only_appended_lines(log):
+    path, state = log
+    write(path, line("Generated health response for topic: nutrition"), line("Generated health response for topic: fitness"))
+    assert topics(run(path, state)) == {"fitness": 1, "nutrition": 1}
+    assert topics(run(path, state)) == {"fitness": 1, "nutrition": 1}
+
+    write(path, line("Generated health response for topic: nutrition"), "2026-03-01 09:16:00 - app.services")
+    aggregates = run(path, state)
+    assert topics(aggregates) == {"fitness": 1, "nutrition": 2} and aggregates.records == 3
+    # The unfinished line is read once it is complete
+    write(path, ".ai_services - INFO - ai_services:answer:42 - Generated health response for topic: stress\n")
+    assert topics(run(path, state)) == {"fitness": 1, "nutrition": 2, "stress": 1}
+
+
+def test_rotated_file_resumes_at_its_offset(log):
+    path, state = log
+    write(path, line("Generated health response for topic: nutrition"))
+    run(path, state)
+    # Written after the last run, then rotated away by the RotatingFileHandler
+    write(path, line("Generated health response for topic: fitness"))
+    os.rename(path, f"{path}.1")
+    write(path, line("Generated health response for topic: stress"))
+    aggregates = run(path, state)
+    assert topics(aggregates) == {"fitness": 1, "nutrition": 1, "stress": 1} and aggregates.records == 3
+
+    # Rotated again: app.log.1 moves to app.log.2, nothing is counted twice
+    os.rename(f"{path}.1", f"{path}.2")
+    os.rename(path, f"{path}.1")
+    write(path, line("Generated health response for topic: nutrition"))
+    assert topics(run(path, state)) == {"fitness": 1, "nutrition": 2, "stress": 1}
+    with open(state, encoding="utf-8") as f:
+        assert sorted(entry["path"] for entry in json.load(f)["files"].values()) == [path, f"{path}.1", f"{path}.2"]
+
+
+def test_truncated_or_replaced_file_is_read_from_the_start(log):
+    path, state = log
+    write(path, line("Generated health response for topic: nutrition"), line("Generated health response for topic: nutrition"))
+    run(path, state)
+    write(path, line("Generated health response for topic: fitness"), mode="w")
+    assert topics(run(path, state)) == {"fitness": 1, "nutrition": 2}
+
+    # Same inode and a larger size, but different first bytes: not the file the offset belongs to
+    write(path, line("Generated health response for topic: stress", minutes=1) * 3, mode="r+")
+    assert topics(run(path, state)) == {"fitness": 1, "nutrition": 2, "stress": 3}
+
+
+def test_state_for_another_bucket_width_is_rejected(log):
+    path, state = log
+    write(path, line("Generated health response for topic: nutrition"))
+    run(path, state)
+    with pytest.raises(ValueError, match="1h buckets"):
+        load_state(state, "15min")
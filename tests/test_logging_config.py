@@ -0,0 +1,84 @@
+import io
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+from logging.handlers import QueueListener
+
+from app.core.logging_config import LOG_FORMAT, DroppingQueueHandler, JsonFormatter, SamplingFilter
+
+
+def _pipeline(formatter: logging.Formatter, maxsize: int = 100):
+    log_queue: queue.Queue = queue.Queue(maxsize=maxsize)
+    handler = DroppingQueueHandler(log_queue)
+    output = io.StringIO()
+    target = logging.StreamHandler(output)
+    target.setFormatter(formatter)
+    logger = logging.getLogger(f"tests.logging.{id(output)}")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger, handler, QueueListener(log_queue, target), output
+
+
+def _log_exception(logger: logging.Logger) -> None:
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed for %s", "alice")
+
+
+def test_json_records_keep_exc_info_and_extra_fields():
+    logger, _, listener, output = _pipeline(JsonFormatter())
+    _log_exception(logger)
+    logger.info("done", extra={"conversation_id": "c1"})
+    listener.start()
+    listener.stop()
+
+    failed, done = (json.loads(line) for line in output.getvalue().splitlines())
+    assert failed["message"] == "failed for alice" and failed["level"] == "ERROR"
+    assert "ValueError: boom" in failed["exc_info"]
+    assert done["conversation_id"] == "c1" and "exc_info" not in done
+
+
+def test_text_records_show_the_traceback_once():
+    logger, _, listener, output = _pipeline(logging.Formatter(LOG_FORMAT))
+    _log_exception(logger)
+    listener.start()
+    listener.stop()
+    assert output.getvalue().count("ValueError: boom") == 1
+    assert "failed for alice" in output.getvalue()
+
+
+def test_full_queue_drops_instead_of_blocking():
+    logger, handler, _, _ = _pipeline(JsonFormatter(), maxsize=2)
+    for i in range(5):
+        logger.warning("record %s", i)
+    assert handler.dropped == 3
+
+
+def test_sampling_keeps_warnings_and_exempt_records():
+    sampler = SamplingFilter(rate=0.0)
+    make = lambda level, **extra: logging.makeLogRecord({"levelno": level, **extra})  # noqa: E731
+    assert not sampler.filter(make(logging.INFO))
+    assert sampler.filter(make(logging.INFO, sample=False))
+    assert sampler.filter(make(logging.WARNING))
+    assert sampler.sampled_out == 1
+
+
+def test_import_does_not_start_the_writer_thread():
+    code = "import threading, app.core.logging_config as l; print(l._listener is None, threading.active_count())"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["True", "1"]
+
+
+def test_command_line_tools_write_their_records(tmp_path):
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "app.js").write_text("console.log('hello');\n")
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+    command = [sys.executable, "-m", "app.core.static_assets", "--src", "static", "--out", "static"]
+    result = subprocess.run(command, cwd=tmp_path, env=env, capture_output=True, text=True, check=True)
+    assert "Built 1 static assets" in result.stdout
+    assert "Built 1 static assets" in (tmp_path / "logs" / "app.log").read_text()
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+
+import pytest
+from fastapi import FastAPI
+
+from app.core.metrics import Metrics, _read_aggregate
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="workers are forked children of the test process")
+
+app = FastAPI()
+
+
+@app.get("/items")
+async def items():
+    return []
+
+
+def requests_total(totals, status="200"):
+    return totals.get(("http_requests_total", (("method", "GET"), ("route", "/items"), ("status", status))), 0.0)
+
+
+def worker(directory, requests, left_in_flight, results):
+    # A gunicorn worker: records into its own file, whose name carries the master's pid
+    store = Metrics(directory)
+    store.open(app.routes)
+    for _ in range(requests):
+        store.request_started()
+        store.request_finished(items, "GET", 200, 0.01)
+    for _ in range(left_in_flight):
+        store.request_started()
+    store.count_topic("nutrition")
+    results.put(store.collect())
+
+
+def run_worker(directory, requests, left_in_flight=0):
+    """Run a worker to completion; returns its pid and what its /metrics would have reported."""
+    fork = multiprocessing.get_context("fork")
+    results = fork.Queue()
+    process = fork.Process(target=worker, args=(directory, requests, left_in_flight, results))
+    process.start()
+    totals = results.get(timeout=10)
+    process.join()
+    return process.pid, totals
+
+
+def test_exited_workers_are_folded_into_the_aggregate(tmp_path):
+    directory = str(tmp_path)
+    master = Metrics(directory)
+    for requests in (3, 4):
+        pid, _ = run_worker(directory, requests, left_in_flight=1)
+        master.fold(pid)
+        assert not os.path.exists(os.path.join(directory, f"metrics-{os.getpid()}-{pid}.bin"))
+    assert sorted(os.listdir(directory)) == [f"metrics-{os.getpid()}-0.bin"]
+
+    _, totals = run_worker(directory, 2)
+    assert requests_total(totals) == 3 + 4 + 2
+    assert totals[("health_chat_topic_total", (("topic", "nutrition"),))] == 3
+    assert totals[("http_requests_in_flight", ())] == 0  # Exited workers had nothing in flight
+    count = totals[("http_request_duration_seconds_bucket", (("method", "GET"), ("route", "/items"), ("le", "0.01")))]
+    assert count == 9
+
+
+def test_folded_worker_is_not_counted_twice(tmp_path):
+    directory = str(tmp_path)
+    pid, _ = run_worker(directory, 5)
+    path = os.path.join(directory, f"metrics-{os.getpid()}-{pid}.bin")
+    with open(path, "rb") as f:
+        data = f.read()
+    Metrics(directory).fold(pid)
+    # A scrape that listed the directory before the file was removed
+    with open(path, "wb") as f:
+        f.write(data)
+
+    _, totals = run_worker(directory, 1)
+    assert requests_total(totals) == 6
+
+
+def test_earlier_folded_worker_stays_listed(tmp_path):
+    directory = str(tmp_path)
+    first, _ = run_worker(directory, 5)
+    second, _ = run_worker(directory, 3)
+    path = os.path.join(directory, f"metrics-{os.getpid()}-{first}.bin")
+    with open(path, "rb") as f:
+        data = f.read()
+    master = Metrics(directory)
+    master.fold(first)
+    # Still there for a scrape that listed the directory, while the second worker is folded
+    with open(path, "wb") as f:
+        f.write(data)
+    master.fold(second)
+
+    _, totals = run_worker(directory, 1)
+    assert requests_total(totals) == 5 + 3 + 1
+
+    # Pids whose files are gone are dropped from the list
+    os.remove(path)
+    third, _ = run_worker(directory, 2)
+    master.fold(third)
+    _, folded = _read_aggregate(os.path.join(directory, f"metrics-{os.getpid()}-0.bin"))
+    assert folded == [third]
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+
+from app.models.ai_models import HealthChatResponse, HealthTopic
+from app.services.response_cache import ResponseCache
+from app.services.shared_state import SharedStore
+
+ANSWER = HealthChatResponse(response="Drink water.", conversation_id="", topic=HealthTopic.NUTRITION)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    # Two processes' views of one file: each has its own origin in the change log
+    path = str(tmp_path / "shared.db")
+    stores = [SharedStore(path, poll_interval=0.0) for _ in range(2)]
+    for store in stores:
+        store.open()
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def written(store):
+    # set() writes to the shared store in the background; wait for it
+    store.close()
+
+
+def test_key_ignores_case_spacing_and_end_punctuation():
+    assert ResponseCache.make_key("m", "How much  WATER?") == ResponseCache.make_key("m", "how much water")
+
+
+async def test_entries_expire_after_ttl():
+    cache = ResponseCache(maxsize=8, ttl=0.05)
+    key = cache.make_key("m", "water")
+    cache.set(key, ANSWER)
+    assert await cache.get(key) == ANSWER
+    await asyncio.sleep(0.06)
+    assert await cache.get(key) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["expirations"] == 1
+
+
+async def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    keys = [cache.make_key("m", f"question {i}") for i in range(3)]
+    cache.set(keys[0], ANSWER)
+    cache.set(keys[1], ANSWER)
+    await cache.get(keys[0])
+    cache.set(keys[2], ANSWER)
+    assert await cache.get(keys[1]) is None and await cache.get(keys[0]) == ANSWER
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_invalidate_drops_everything():
+    cache = ResponseCache(maxsize=8, ttl=60)
+    key = cache.make_key("m", "water")
+    cache.set(key, ANSWER)
+    cache.invalidate("test")
+    assert await cache.get(key) is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["size"] == 0
+
+
+async def test_other_workers_answers_are_shared(stores):
+    first, second = ResponseCache(ttl=60, shared=stores[0]), ResponseCache(ttl=60, shared=stores[1])
+    key = first.make_key("m", "water")
+    first.set(key, ANSWER)
+    written(stores[0])
+    assert await second.get(key) == ANSWER
+    assert second.stats()["shared_hits"] == 1
+
+
+async def test_shared_hit_keeps_the_remaining_expiry(stores):
+    cache = ResponseCache(ttl=600, shared=stores[1])
+    key = cache.make_key("m", "water")
+    stores[0].set("response", "\x1f".join(key), ANSWER.model_dump_json().encode(), ttl=0.1)
+    assert await cache.get(key) == ANSWER
+    assert cache._cache[key].expires - time.monotonic() <= 0.1
+    await asyncio.sleep(0.11)
+    assert await cache.get(key) is None
+
+
+async def test_invalidation_reaches_other_workers(stores):
+    first, second = ResponseCache(ttl=60, shared=stores[0]), ResponseCache(ttl=60, shared=stores[1])
+    key = first.make_key("m", "water")
+    first.set(key, ANSWER)
+    written(stores[0])
+    assert await second.get(key) == ANSWER
+    received = stores[1].invalidations_received
+    first.invalidate("rules changed")
+    written(stores[0])
+    assert await second.get(key) is None
+    assert stores[1].invalidations_received == received + 1
+
+
+async def test_invalidation_is_not_undone_by_earlier_writes(stores):
+    cache = ResponseCache(ttl=60, shared=stores[0])
+    key = cache.make_key("m", "water")
+    cache.set(key, ANSWER)
+    # Returns before the shared store is touched; the clear runs after the queued write
+    cache.invalidate("rules changed")
+    written(stores[0])
+    assert stores[0].get("response", "\x1f".join(key)) is None
+
+
+async def test_housekeeping_runs_in_the_background(stores):
+    stores[0].set("response", "old", b"{}", ttl=-1)
+    await stores[1].start()
+    try:
+        while stores[1].writes == 0:
+            await asyncio.sleep(0.001)
+        assert stores[0]._connection().execute("SELECT COUNT(*) FROM kv").fetchone()[0] == 0
+    finally:
+        await stores[1].stop()
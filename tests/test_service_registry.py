@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services import service_registry as registry_module
+from app.services.ai_services import HealthChatService
+from app.services.service_registry import HealthChatServiceRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A registry whose services are plain keyword-answer services; records the threads that built them."""
+    registry = HealthChatServiceRegistry()
+    registry.created_on = []
+
+    def create(model_name):
+        registry.created_on.append(threading.current_thread())
+        service = HealthChatService(model_name)
+        registry._services[model_name] = service
+        return service
+
+    monkeypatch.setattr(registry, "_create", create)
+    monkeypatch.setattr(registry_module.settings, "CONVERSATION_STORE_ENABLED", False)
+    monkeypatch.setattr(registry_module, "shared_state", None)
+    return registry
+
+
+async def test_services_are_created_once_off_the_event_loop(registry):
+    services = await asyncio.gather(*(registry.get("test-model") for _ in range(5)))
+    assert all(service is services[0] for service in services)
+    assert len(registry.created_on) == 1 and registry.created_on[0] is not threading.main_thread()
+
+
+async def test_warm_up_makes_the_registry_ready(registry):
+    await registry.start_in_background(["test-model"])
+    assert registry.ready and await registry.get("test-model") is registry._services["test-model"]
+
+
+async def test_failed_warm_up_still_becomes_ready(registry, monkeypatch):
+    async def fail():
+        raise RuntimeError("index missing")
+
+    service = await registry.get("test-model")
+    monkeypatch.setattr(service, "warm_up", fail)
+    await registry.start_in_background(["test-model"])
+    # Requests fall back to services created on demand, so the readiness probe must pass
+    assert registry.ready
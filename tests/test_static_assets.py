@@ -0,0 +1,95 @@
+import gzip
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core import static_assets
+from app.core.static_assets import (
+    IMMUTABLE_CACHE_CONTROL, MANIFEST_NAME, PrecompressedStaticFiles, build_assets, load_manifest
+)
+
+CSS = b"body { margin: 0; }\n" * 40  # Large enough to be worth compressing
+ICON = b"\x89PNG\r\n" + bytes(range(256))
+
+
+@pytest.fixture
+def built(tmp_path):
+    src = tmp_path / "static"
+    (src / "css").mkdir(parents=True)
+    (src / "css" / "style.css").write_bytes(CSS)
+    (src / "icon.png").write_bytes(ICON)
+    (src / "tiny.js").write_bytes(b"1;")
+    build_assets(str(src), str(src))
+    return src
+
+
+@pytest.fixture
+async def client(built):
+    app = FastAPI()
+    files = PrecompressedStaticFiles(directory=str(built))
+    app.mount("/static", files, name="static")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        client.files = files
+        yield client
+
+
+def test_build_fingerprints_and_precompresses(built):
+    manifest = load_manifest(str(built))
+    style = manifest["css/style.css"]
+    assert style["path"].startswith("css/style.") and style["path"].endswith(".css")
+    assert (built / style["path"]).read_bytes() == CSS
+    assert gzip.decompress((built / (style["path"] + ".gz")).read_bytes()) == CSS
+    if static_assets.brotli is not None:
+        assert style["encodings"] == ["br", "gzip"]
+        assert static_assets.brotli.decompress((built / (style["path"] + ".br")).read_bytes()) == CSS
+    # Images are already compressed and tiny files gain nothing
+    assert manifest["icon.png"]["encodings"] == [] and manifest["tiny.js"]["encodings"] == []
+
+
+def test_rebuild_replaces_outputs_of_the_earlier_build(built):
+    old = load_manifest(str(built))["css/style.css"]["path"]
+    (built / "css" / "style.css").write_bytes(CSS + b"a { color: red; }\n")
+    build_assets(str(built), str(built))
+    new = load_manifest(str(built))["css/style.css"]["path"]
+    assert new != old
+    assert not any(name.startswith(os.path.basename(old)) for name in os.listdir(built / "css"))
+    # The fingerprinted copies of the first build were not taken for new source files
+    assert set(load_manifest(str(built))) == {"css/style.css", "icon.png", "tiny.js"}
+    assert MANIFEST_NAME in os.listdir(built)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("identity", None),
+    ("*", "br"),
+])
+async def test_encoding_follows_accept_encoding(client, accept, expected):
+    if expected == "br" and static_assets.brotli is None:
+        pytest.skip("brotli is not installed")
+    path = client.files.asset_path("css/style.css")
+    response = await client.get(f"/static/{path}", headers={"Accept-Encoding": accept})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == expected
+    assert response.content == CSS  # httpx decodes the chosen encoding
+    assert response.headers["content-type"] == "text/css; charset=utf-8"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+
+async def test_uncompressed_assets_have_no_vary(client):
+    response = await client.get(f"/static/{client.files.asset_path('icon.png')}", headers={"Accept-Encoding": "gzip"})
+    assert response.content == ICON and "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+
+async def test_plain_names_must_be_revalidated(client):
+    response = await client.get("/static/css/style.css", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and "content-encoding" not in response.headers
+    assert response.headers["cache-control"] == "no-cache"
+    assert client.files.asset_path("missing.css") == "missing.css"
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core import templating
+from app.core.templating import PageCache, get_templates
+
+
+def write(path, text):
+    path.write_text(text)
+    # Make sure the change is visible to mtime checks with a coarse clock
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    """Templates under a scratch app directory, with their own bytecode cache."""
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    write(templates / "base.html", "<title>{% block title %}{% endblock %}</title>{% include 'footer.html' %}")
+    write(templates / "footer.html", "<footer>v1</footer>")
+    write(templates / "page.html", "{% extends 'base.html' %}{% block title %}{{ title }}{% endblock %}")
+    monkeypatch.setattr(templating, "_APP_DIR", str(tmp_path))
+    monkeypatch.setattr(templating.settings, "TEMPLATE_BYTECODE_CACHE_DIR", str(tmp_path / "bytecode"))
+    get_templates.cache_clear()
+    yield templates
+    get_templates.cache_clear()
+
+
+@pytest.fixture
+def cache(template_dir):
+    return PageCache(check_interval=0.0)  # Stat the template files on every request
+
+
+@pytest.fixture
+def client(cache):
+    app = FastAPI()
+
+    @app.get("/page")
+    async def page(request: Request):
+        return cache.response(request, "page.html", {"title": "Health"})
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_first_response_has_a_strong_etag(client):
+    response = client.get("/page")
+    assert response.status_code == 200
+    assert response.text == "<title>Health</title><footer>v1</footer>"
+    assert response.headers["etag"].startswith('"') and response.headers["cache-control"] == "no-cache"
+
+
+def test_matching_if_none_match_gets_304(client, cache):
+    etag = client.get("/page").headers["etag"]
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/page", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["etag"] == etag
+    assert client.get("/page", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert cache.stats() == {"pages": 1, "hits": 5, "renders": 1}
+
+
+@pytest.mark.parametrize("changed, old, new", [
+    ("page.html", "{{ title }}", "{{ title }} tips"),  # The page itself
+    ("base.html", "<title>", "<title lang=en>"),  # A template it extends
+    ("footer.html", "v1", "v2"),  # A template included by that one
+])
+def test_changed_template_gets_a_new_etag(client, cache, template_dir, changed, old, new):
+    etag = client.get("/page").headers["etag"]
+    path = template_dir / changed
+    write(path, path.read_text().replace(old, new))
+
+    response = client.get("/page", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert cache.stats()["renders"] == 2
+
+
+def test_unchanged_templates_are_only_checked_once_per_interval(client, cache, template_dir):
+    cache.check_interval = 60.0
+    etag = client.get("/page").headers["etag"]
+    write(template_dir / "footer.html", "<footer>v2</footer>")
+    assert client.get("/page").headers["etag"] == etag
+    cache.check_interval = 0.0
+    assert client.get("/page").headers["etag"] != etag
+
+
+def test_compiled_templates_are_reused_across_environments(client, template_dir):
+    client.get("/page")
+    cache_dir = template_dir.parent / "bytecode"
+    assert len(os.listdir(cache_dir)) == 3  # page, base and footer
+
+    # A new process starts with an empty environment but finds the bytecode on disk
+    get_templates.cache_clear()
+    bytecode_cache = get_templates().env.bytecode_cache
+    loaded = []
+    load_bytecode = bytecode_cache.load_bytecode
+
+    def spy(bucket):
+        load_bytecode(bucket)
+        loaded.append(bucket.code is not None)
+
+    bytecode_cache.load_bytecode = spy
+    get_templates().get_template("page.html").render(title="Health")
+    assert loaded and all(loaded)
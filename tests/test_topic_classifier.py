@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from app.models.ai_models import HealthTopic
+from app.services.topic_classifier import TopicClassifier, default_rules_path
+
+
+@pytest.fixture(scope="module")
+def rules():
+    with open(default_rules_path(), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {HealthTopic(entry["topic"]): entry["keywords"] for entry in data["topics"]}, float(data["min_score"])
+
+
+@pytest.fixture(scope="module")
+def exact(rules):
+    return TopicClassifier(rules[0], min_score=rules[1])
+
+
+@pytest.fixture(scope="module")
+def fuzzy(rules):
+    return TopicClassifier(rules[0], min_score=rules[1], max_edit_distance=2, fuzzy_min_length=6)
+
+
+@pytest.mark.parametrize("message, topic", [
+    ("What should I eat for breakfast?", HealthTopic.NUTRITION),
+    ("Any good exercises for my back?", HealthTopic.FITNESS),
+    ("I feel stressed and anxious all the time", HealthTopic.MENTAL_HEALTH),
+    ("He is injured and bleeding", HealthTopic.FIRST_AID),
+    ("Tell me about the weather", HealthTopic.GENERAL),
+])
+def test_classifies_shipped_rules(exact, message, topic):
+    assert exact.classify(message).topic is topic
+
+
+@pytest.mark.parametrize("message", [
+    "my puppy is so cute",
+    "my stepson visited",
+    "carbon monoxide detectors",
+    "I saw a cardiologist",
+    "strokes of genius",
+])
+def test_keywords_match_whole_words_only(exact, message):
+    result = exact.classify(message)
+    assert result.topic is HealthTopic.GENERAL
+    assert result.matches == ()
+
+
+@pytest.mark.parametrize("message, keyword", [
+    ("Any excercise for my back?", "exercise"),
+    ("nutrtional advice please", "nutritional"),
+    ("I feel anxeity at night", "anxiety"),
+    ("Where do I learn frist aid?", "first aid"),
+    ("signs of a hart attack", "heart attack"),
+])
+def test_typos_match_their_keywords(fuzzy, message, keyword):
+    assert keyword in fuzzy.classify(message).matches
+
+
+@pytest.mark.parametrize("message", ["I saw a cardiologist", "dental checkup", "my puppy is so cute"])
+def test_typo_lookup_matches_whole_words_only(fuzzy, message):
+    assert fuzzy.classify(message).topic is HealthTopic.GENERAL
+
+
+def test_stop_words_are_not_typos():
+    classifier = TopicClassifier({HealthTopic.FITNESS: {"theree": 1.0}}, max_edit_distance=2)
+    assert classifier.classify("is there a theere").matches == ("theree",)
+
+
+def test_typo_lookup_stops_after_max_tokens():
+    classifier = TopicClassifier({HealthTopic.FITNESS: {"exercise": 1.0}}, max_edit_distance=2, fuzzy_max_tokens=5)
+    assert classifier.classify("one two excercise").topic is HealthTopic.FITNESS
+    assert classifier.classify("one two three four five six excercise").topic is HealthTopic.GENERAL
+    assert classifier.classify("one two three four five six exercise").topic is HealthTopic.FITNESS
+
+
+def test_multi_word_keyword_and_longest_match():
+    classifier = TopicClassifier({
+        HealthTopic.FITNESS: {"strength": 1.0, "strength training": 3.0},
+        HealthTopic.MENTAL_HEALTH: {"mental health": 2.0},
+    })
+    result = classifier.classify("Strength training helps mental health")
+    assert result.matches == ("strength training", "mental health")
+    assert result.scores == {HealthTopic.FITNESS: 3.0, HealthTopic.MENTAL_HEALTH: 2.0}
+    assert result.topic is HealthTopic.FITNESS
+
+
+def test_ties_go_to_the_first_topic_and_min_score_applies():
+    rules = {HealthTopic.FITNESS: {"gym": 1.0}, HealthTopic.NUTRITION: {"food": 1.0}}
+    assert TopicClassifier(rules).classify("gym food").topic is HealthTopic.FITNESS
+    assert TopicClassifier(rules, min_score=2.0).classify("gym food").topic is HealthTopic.GENERAL
+
+
+def test_fingerprint_follows_the_rules():
+    a = TopicClassifier({HealthTopic.FITNESS: {"gym": 1.0}})
+    b = TopicClassifier({HealthTopic.FITNESS: {"gym": 1.0}})
+    c = TopicClassifier({HealthTopic.FITNESS: {"gym": 2.0}})
+    assert a.fingerprint == b.fingerprint != c.fingerprint